@@ -0,0 +1,169 @@
+# 和牌判定（查表法）
+# 预先生成所有“完整”的单花色计数模式（能恰好拆成若干面子，外加至多一个
+# 雀头），以紧凑的二进制格式保存到磁盘，启动时直接加载（比重新生成快约三倍）。
+# 判定一手牌是否和牌时，只需把计数数组按花色切成四段，分别查表，再确认雀头
+# 恰好只有一个即可。
+#
+# 表文件先写入同一目录下的临时文件再用os.replace替换，多个进程同时生成时读到的
+# 总是完整的文件；目录不可写时只在内存中使用。
+
+import os
+import struct
+import tempfile
+
+from tiles import NUM_TILE_TYPES
+
+TABLE_VERSION = 2
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agari_table.bin')
+
+# 文件格式：头部（魔数、版本、数牌和字牌的模式数），之后每个模式一条记录：
+# 每种牌的张数各占一个字节，最后一个字节为是否含雀头
+_HEADER = struct.Struct('<4sBII')
+_MAGIC = b'AGRI'
+_SUIT_SIZE = 9
+_HONOR_SIZE = NUM_TILE_TYPES - 27
+
+# 计数模式 -> 是否含雀头
+_suit_table = {}
+_honor_table = {}
+
+
+def _generate(size, allow_runs):
+    """枚举一个花色内所有由至多4个面子和至多1个雀头组成的计数模式"""
+    melds = []
+    for i in range(size):
+        triplet = [0] * size
+        triplet[i] = 3
+        melds.append(triplet)
+    if allow_runs:
+        for i in range(size - 2):
+            run = [0] * size
+            run[i] = run[i+1] = run[i+2] = 1
+            melds.append(run)
+
+    patterns = {}
+
+    def add_melds(counts, start, left, has_pair):
+        patterns[tuple(counts)] = has_pair
+        if not left:
+            return
+        for k in range(start, len(melds)):
+            meld = melds[k]
+            new_counts = [a + b for a, b in zip(counts, meld)]
+            if max(new_counts) <= 4:
+                add_melds(new_counts, k, left - 1, has_pair)
+
+    add_melds([0] * size, 0, 4, False)
+    for i in range(size):
+        counts = [0] * size
+        counts[i] = 2
+        add_melds(counts, 0, 4, True)
+    return patterns
+
+
+def _pack(table):
+    return b''.join(bytes(pattern) + bytes((has_pair,)) for pattern, has_pair in table.items())
+
+
+def _unpack(data, size):
+    step = size + 1
+    return {tuple(data[i:i + size]): bool(data[i + size]) for i in range(0, len(data), step)}
+
+
+def build_tables():
+    """重新生成和牌表并尝试保存到磁盘"""
+    _suit_table.clear()
+    _honor_table.clear()
+    _suit_table.update(_generate(_SUIT_SIZE, True))
+    _honor_table.update(_generate(_HONOR_SIZE, False))
+    data = (_HEADER.pack(_MAGIC, TABLE_VERSION, len(_suit_table), len(_honor_table))
+            + _pack(_suit_table) + _pack(_honor_table))
+    directory = os.path.dirname(TABLE_PATH)
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix='.agari_table.', dir=directory)
+    except OSError:
+        # 目录不可写时只在内存中使用
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)  # mkstemp创建的文件只有所有者可读
+        os.replace(temp_path, TABLE_PATH)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def load_tables():
+    """从磁盘加载和牌表，文件不存在、不完整或版本不符时重新生成"""
+    try:
+        with open(TABLE_PATH, 'rb') as f:
+            data = f.read()
+        magic, version, suit_count, honor_count = _HEADER.unpack_from(data)
+        suit_end = _HEADER.size + suit_count * (_SUIT_SIZE + 1)
+        if magic != _MAGIC or version != TABLE_VERSION or \
+                len(data) != suit_end + honor_count * (_HONOR_SIZE + 1):
+            raise ValueError('和牌表格式不符')
+    except (OSError, ValueError, struct.error):
+        build_tables()
+        return
+    _suit_table.clear()
+    _honor_table.clear()
+    _suit_table.update(_unpack(data[_HEADER.size:suit_end], _SUIT_SIZE))
+    _honor_table.update(_unpack(data[suit_end:], _HONOR_SIZE))
+
+
+def is_agari(counts, meld_count=0):
+    """判断暗手牌（34格计数数组）加上meld_count个已亮出的面子是否和牌"""
+    if sum(counts) != 3 * (4 - meld_count) + 2:
+        return False
+
+    # 七对子只有在没有亮出面子的情况下才可能成立
+    if meld_count == 0 and counts.count(2) == 7:
+        return True
+
+    suit_table = _suit_table
+    pairs = 0
+    for start in (0, 9, 18):
+        has_pair = suit_table.get(tuple(counts[start:start+9]))
+        if has_pair is None:
+            return False
+        pairs += has_pair
+    has_pair = _honor_table.get(tuple(counts[27:NUM_TILE_TYPES]))
+    if has_pair is None:
+        return False
+    return pairs + has_pair == 1
+
+
+# 每种牌可能影响的牌（同花色相差2以内的数牌，字牌只有自己）
+_NEIGHBORS = tuple(
+    tuple(range(max(t - 2, t - t % 9), min(t + 2, t - t % 9 + 8) + 1)) if t < 27 else (t,)
+    for t in range(NUM_TILE_TYPES)
+)
+
+
+def winning_tiles(counts, meld_count=0):
+    """返回听牌时能和的牌（编号集合），未听牌或张数不对时返回空集合"""
+    if sum(counts) != 3 * (4 - meld_count) + 1:
+        return frozenset()
+
+    candidates = set()
+    for t in range(NUM_TILE_TYPES):
+        if counts[t]:
+            candidates.update(_NEIGHBORS[t])
+
+    waits = []
+    for t in candidates:
+        # 手里已有四张的牌不可能再摸到
+        if counts[t] >= 4:
+            continue
+        counts[t] += 1
+        if is_agari(counts, meld_count):
+            waits.append(t)
+        counts[t] -= 1
+    return frozenset(waits)
+
+
+load_tables()
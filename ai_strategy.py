@@ -1,126 +1,126 @@
 import random
 
+from tiles import NUM_TILE_TYPES, HONOR_START, counts_of, is_suited
+from shanten import calculate_shanten
+from ukeire import analyze_discards, batch_analyze_discards
+
 # 麻将牌型评估
 class MahjongEvaluator:
     @staticmethod
     def count_tiles(hand):
-        """统计手牌中每种牌的数量"""
-        count = {}
-        for tile in hand:
-            count[tile] = count.get(tile, 0) + 1
-        return count
+        """统计手牌中每种牌的数量（返回34格计数数组）"""
+        return counts_of(hand)
     
     @staticmethod
     def find_pairs(hand_count):
         """找出所有对子"""
-        return [tile for tile, count in hand_count.items() if count >= 2]
-    
-    @staticmethod
-    def find_potential_melds(hand, hand_count):
-        """找出潜在的面子（顺子或刻子）"""
-        potential_melds = []
-        
-        # 寻找刻子
-        for tile, count in hand_count.items():
-            if count >= 3:
-                potential_melds.append((tile, tile, tile))
-        
-        # 寻找顺子（仅适用于数牌）
-        for tile in hand:
-            if tile[-1] in ['m', 't', 'p']:
-                suit = tile[-1]
-                num = int(tile[:-1])
-                
-                # 检查是否可以形成顺子
-                if num <= 7:  # 确保不会超出9
-                    next_tile = f"{num+1}{suit}"
-                    next_next_tile = f"{num+2}{suit}"
-                    
-                    if next_tile in hand and next_next_tile in hand:
-                        potential_melds.append((tile, next_tile, next_next_tile))
-        
-        return potential_melds
+        return [tile for tile in range(NUM_TILE_TYPES) if hand_count[tile] >= 2]
     
     @staticmethod
-    def calculate_shanten(hand):
-        """计算向听数（简化版）
+    def calculate_shanten(hand_count, meld_count=0):
+        """计算向听数
         向听数是达到听牌状态还需要的最少步数
         0表示已经听牌，-1表示已经和牌
         """
-        # 这是一个简化版的向听数计算，实际麻将中更复杂
-        hand_count = MahjongEvaluator.count_tiles(hand)
-        pairs = MahjongEvaluator.find_pairs(hand_count)
-        potential_melds = MahjongEvaluator.find_potential_melds(hand, hand_count)
-        
-        # 简单估算：需要4组面子和1对雀头
-        # 每个已有的面子贡献1分，每个对子贡献0.5分
-        score = len(potential_melds) + (0.5 * min(1, len(pairs)))  # 最多计算一个对子
-        
-        # 向听数 = 5(总共需要的组合) - 已有的组合数
-        shanten = 5 - score
-        
-        # 调整为整数
-        return max(0, int(shanten))
+        # 查表计算一般形和七对子的精确向听数，已亮出的面子数由meld_count给出
+        return calculate_shanten(hand_count, meld_count)
     
     @staticmethod
-    def evaluate_tile_value(tile, hand):
-        """评估一张牌的价值"""
-        # 复制手牌并移除要评估的牌
-        test_hand = hand.copy()
-        test_hand.remove(tile)
-        
-        # 计算移除该牌后的向听数
-        shanten_after = MahjongEvaluator.calculate_shanten(test_hand)
-        
-        # 基础分数：向听数越低越好
-        score = 100 - (shanten_after * 20)
-        
-        # 额外评估
-        hand_count = MahjongEvaluator.count_tiles(hand)
+    def shape_score(tile, hand_count):
+        """不考虑向听数时一张牌的形状价值（孤张、幺九、字牌价值低）"""
+        count = hand_count[tile]
+        score = 0
         
         # 孤张牌价值低
-        if hand_count.get(tile, 0) == 1:
+        if count == 1:
             score -= 10
         
         # 对子和刻子有价值
-        if hand_count.get(tile, 0) >= 2:
+        if count >= 2:
             score += 15
         
         # 边张（1和9）价值较低
-        if tile[-1] in ['m', 't', 'p']:
-            num = int(tile[:-1])
-            if num == 1 or num == 9:
-                score -= 5
+        if is_suited(tile) and tile % 9 in (0, 8):
+            score -= 5
         
         # 字牌单张价值低
-        if tile in ['e', 's', 'w', 'n', 'z', 'f', 'b'] and hand_count.get(tile, 0) == 1:
+        if tile >= HONOR_START and count == 1:
             score -= 8
         
         return score
+    
+    @staticmethod
+    def evaluate_tile_value(tile, hand_count, meld_count=0):
+        """评估一张牌的价值"""
+        # 临时移除要评估的牌，计算移除该牌后的向听数
+        hand_count[tile] -= 1
+        try:
+            shanten_after = MahjongEvaluator.calculate_shanten(hand_count, meld_count)
+        finally:
+            hand_count[tile] += 1
+        
+        # 基础分数：向听数越低越好，再加上形状价值
+        return 100 - (shanten_after * 20) + MahjongEvaluator.shape_score(tile, hand_count)
 
 class AdvancedAI:
     @staticmethod
-    def select_discard_tile(hand):
-        """选择要打出的牌"""
+    def select_discard_tile(hand_count, meld_count=0, visible=None):
+        """选择要打出的牌
+        
+        Args:
+            hand_count: 暗手牌的34格计数数组
+            meld_count: 已亮出的面子数
+            visible: 场上看得见的牌的34格计数数组，用于计算剩余进张
+        
+        Returns:
+            打出后向听数最小、有效进张最多的牌，再按形状价值从低到高选择
+        """
         # 如果手牌为空，返回None
-        if not hand:
+        if not any(hand_count):
             return None
         
-        # 评估每张牌的价值
-        tile_values = {}
-        for tile in hand:
-            tile_values[tile] = MahjongEvaluator.evaluate_tile_value(tile, hand)
-        
-        # 选择价值最低的牌打出
-        return min(tile_values, key=tile_values.get)
+        # 一次批量计算所有打法的向听数和进张数
+        return AdvancedAI._best_discard(analyze_discards(hand_count, meld_count, visible), hand_count)
+
+    @staticmethod
+    def select_discard_tiles(hand_counts, meld_counts, visibles=None):
+        """对多手牌（可以来自不同的对局）一次选择要打出的牌，结果与逐个调用select_discard_tile相同"""
+        analyses = batch_analyze_discards(hand_counts, meld_counts, visibles)
+        return [AdvancedAI._best_discard(analysis, hand_count) if any(hand_count) else None
+                for analysis, hand_count in zip(analyses, hand_counts)]
+
+    @staticmethod
+    def rank_discards(hand_count, meld_count=0, visible=None):
+        """按select_discard_tile的标准从好到坏排列所有可以打出的牌"""
+        analysis = analyze_discards(hand_count, meld_count, visible)
+        keys = AdvancedAI._discard_keys(analysis, hand_count)
+        return [tile for _, tile in sorted((key, tile) for tile, key in keys)]
+
+    @staticmethod
+    def _discard_keys(analysis, hand_count):
+        """逐个产出(牌, 排序键)，排序键越小越好"""
+        for tile, shanten, ukeire in zip(analysis.tiles.tolist(), analysis.shanten.tolist(), analysis.ukeire.tolist()):
+            yield tile, (shanten, -ukeire, MahjongEvaluator.shape_score(tile, hand_count))
+
+    @staticmethod
+    def _best_discard(analysis, hand_count):
+        """打出后向听数最小、有效进张最多的牌，再按形状价值从低到高选择"""
+        best_tile = None
+        best_key = None
+        for tile, key in AdvancedAI._discard_keys(analysis, hand_count):
+            if best_key is None or key < best_key:
+                best_tile, best_key = tile, key
+        return best_tile
     
     @staticmethod
-    def decide_action(player, game_state):
+    def decide_action(player, game_state, rng=random):
         """决定AI的行动
         
         Args:
             player: 玩家对象
-            game_state: 游戏状态信息
+            game_state: 游戏状态信息（claim为True时是对别人打出的牌的响应，不吃碰杠就跳过，
+                不计算打哪张牌；否则需要visible计算要打的牌）
+            rng: 随机数生成器（传入对局的rng以保证可复现）
             
         Returns:
             action: 行动类型 ('discard', 'chi', 'peng', 'gang', 'hu')
@@ -136,25 +136,29 @@ class AdvancedAI:
         # 检查是否可以杠
         if game_state.get('can_gang', False):
             # 简单策略：有80%概率选择杠
-            if random.random() < 0.8:
+            if rng.random() < 0.8:
                 return 'gang', game_state.get('gang_tile')
         
         # 检查是否可以碰
         if game_state.get('can_peng', False):
             # 简单策略：有60%概率选择碰
-            if random.random() < 0.6:
+            if rng.random() < 0.6:
                 return 'peng', game_state.get('peng_tile')
         
         # 检查是否可以吃
         if game_state.get('can_chi', False):
             # 简单策略：有40%概率选择吃
-            if random.random() < 0.4:
+            if rng.random() < 0.4:
                 chi_options = game_state.get('chi_options', [])
                 if chi_options:  # 确保有可用的吃牌选项
                     return 'chi', chi_options[0]  # 选择第一个吃牌选项
                 else:
                     return 'pass', None  # 如果没有可用的吃牌选项，则跳过
         
+        # 响应别人的牌时不鸣就跳过，只有自己的回合才需要选择打哪张牌
+        if game_state.get('claim', False):
+            return 'pass', None
+
         # 默认打牌
-        discard_tile = AdvancedAI.select_discard_tile(player.hand)
+        discard_tile = AdvancedAI.select_discard_tile(player.counts, len(player.melds), game_state.get('visible'))
         return action, discard_tile
\ No newline at end of file
@@ -0,0 +1,275 @@
+# 引擎热点函数的性能基准
+# 使用固定种子生成的几类手牌语料（随机、接近听牌、七对子型、多副露），
+# 测量各热点函数的每秒调用次数和单次调用延迟分位数，以及电脑对局的每秒局数。
+# 结果可以保存为基线文件，之后与基线比较，吞吐量下降超过阈值时报告回退。
+#
+# 用法：
+#   python benchmark.py --save bench_baseline.json
+#   python benchmark.py --compare bench_baseline.json --threshold 0.1
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from tiles import NUM_TILE_TYPES, full_set
+from player_class import MahjongGame, Player, Meld
+from ai_strategy import MahjongEvaluator, AdvancedAI
+from agari import is_agari
+
+CORPUS_SIZE = 300
+CORPUS_SEED = 20250312
+
+
+def _random_meld(rng, counts):
+    """随机生成一个不超过4张限制的面子，返回牌列表"""
+    while True:
+        if rng.random() < 0.5:
+            t = rng.randrange(NUM_TILE_TYPES)
+            tiles = [t, t, t]
+        else:
+            t = rng.choice([x for x in range(27) if x % 9 <= 6])
+            tiles = [t, t + 1, t + 2]
+        if all(counts[x] + tiles.count(x) <= 4 for x in tiles):
+            for x in tiles:
+                counts[x] += 1
+            return tiles
+
+
+def _fill(rng, counts, hand, n):
+    """从剩余的牌中随机补n张"""
+    pool = [t for t in range(NUM_TILE_TYPES) for _ in range(4 - counts[t])]
+    for t in rng.sample(pool, n):
+        counts[t] += 1
+        hand.append(t)
+
+
+def _make_player(hand, melds=()):
+    player = Player("基准", is_computer=True)
+    for t in hand:
+        player.draw_tile(t)
+    player.melds = tuple(Meld(meld_type, tuple(tiles)) for meld_type, tiles in melds)
+    return player
+
+
+def build_corpora(size=CORPUS_SIZE, seed=CORPUS_SEED):
+    """生成固定种子的手牌语料，每条为14张（或副露后的3n+2张）手牌对应的Player"""
+    rng = random.Random(seed)
+    corpora = {'random': [], 'near_tenpai': [], 'seven_pairs': [], 'heavy_meld': []}
+
+    for _ in range(size):
+        # 随机手牌
+        wall = full_set()
+        rng.shuffle(wall)
+        corpora['random'].append(_make_player(wall[:14]))
+
+        # 接近听牌：完整和牌型中换掉两张
+        counts = [0] * NUM_TILE_TYPES
+        hand = []
+        for _ in range(4):
+            hand.extend(_random_meld(rng, counts))
+        pair = rng.choice([t for t in range(NUM_TILE_TYPES) if counts[t] <= 2])
+        counts[pair] += 2
+        hand.extend([pair, pair])
+        for _ in range(2):
+            t = hand.pop(rng.randrange(len(hand)))
+            counts[t] -= 1
+        _fill(rng, counts, hand, 2)
+        corpora['near_tenpai'].append(_make_player(hand))
+
+        # 七对子型：5-6个对子加单张
+        kinds = rng.sample(range(NUM_TILE_TYPES), 9)
+        pairs = rng.choice([5, 6])
+        hand = [t for t in kinds[:pairs] for _ in range(2)]
+        hand.extend(kinds[pairs:pairs + 14 - len(hand)])
+        corpora['seven_pairs'].append(_make_player(hand))
+
+        # 多副露：2-3个面子已亮出
+        counts = [0] * NUM_TILE_TYPES
+        melds = []
+        for _ in range(rng.choice([2, 3])):
+            tiles = _random_meld(rng, counts)
+            melds.append(('peng' if tiles[0] == tiles[1] else 'chi', tiles))
+        hand = []
+        _fill(rng, counts, hand, 14 - 3 * len(melds))
+        corpora['heavy_meld'].append(_make_player(hand, melds))
+    return corpora
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def measure(func, items, min_time=0.3):
+    """对语料中的每一项计时调用func，至少运行min_time秒，返回统计结果"""
+    timer = time.perf_counter_ns
+    samples = []
+    start = time.perf_counter()
+    while True:
+        for item in items:
+            t0 = timer()
+            func(item)
+            samples.append(timer() - t0)
+        if time.perf_counter() - start >= min_time:
+            break
+    samples.sort()
+    total = sum(samples)
+    return {
+        'calls': len(samples),
+        'ops_per_sec': len(samples) / (total / 1e9) if total else 0.0,
+        'p50_us': _percentile(samples, 0.50) / 1000,
+        'p90_us': _percentile(samples, 0.90) / 1000,
+        'p99_us': _percentile(samples, 0.99) / 1000,
+    }
+
+
+def _hot_functions(game):
+    """各热点函数的调用方式（参数为语料中的Player）"""
+
+    def check_win(p):
+        return game.check_win(p.hand, p)
+
+    def table_agari(p):
+        return is_agari(p.counts, len(p.melds))
+
+    def calculate_shanten(p):
+        return MahjongEvaluator.calculate_shanten(p.counts, len(p.melds))
+
+    def evaluate_tile_value(p):
+        return MahjongEvaluator.evaluate_tile_value(p.hand[0], p.counts, len(p.melds))
+
+    def select_discard_tile(p):
+        return AdvancedAI.select_discard_tile(p.counts, len(p.melds))
+
+    def can_chi(p):
+        return p.can_chi(p.hand[0], 0, 1)
+
+    def can_self_gang(p):
+        return p.can_self_gang()
+
+    return {
+        'check_win': check_win,
+        'is_agari': table_agari,
+        'calculate_shanten': calculate_shanten,
+        'evaluate_tile_value': evaluate_tile_value,
+        'select_discard_tile': select_discard_tile,
+        'can_chi': can_chi,
+        'can_self_gang': can_self_gang,
+    }
+
+
+def measure_batch(players, batch=64, min_time=0.3):
+    """批量选牌（AdvancedAI.select_discard_tiles）每次处理batch手牌，结果换算为每手牌"""
+    chunks = [players[i:i + batch] for i in range(0, len(players), batch)]
+
+    def select(chunk):
+        return AdvancedAI.select_discard_tiles([p.counts for p in chunk], [len(p.melds) for p in chunk])
+
+    r = measure(select, chunks, min_time)
+    per_chunk = len(players) / len(chunks)
+    return {
+        'calls': r['calls'],
+        'ops_per_sec': r['ops_per_sec'] * per_chunk,
+        'p50_us': r['p50_us'] / per_chunk,
+        'p90_us': r['p90_us'] / per_chunk,
+        'p99_us': r['p99_us'] / per_chunk,
+    }
+
+
+def measure_hands(num_hands, seed=CORPUS_SEED):
+    """电脑对局端到端速度（固定种子序列）"""
+    durations = []
+    for i in range(num_hands):
+        start = time.perf_counter_ns()
+        MahjongGame(human_players=0, ai_players=4, seed=seed + i).play(save_log=False)
+        durations.append(time.perf_counter_ns() - start)
+    durations.sort()
+    total = sum(durations)
+    return {
+        'calls': num_hands,
+        'ops_per_sec': num_hands / (total / 1e9),
+        'p50_us': _percentile(durations, 0.50) / 1000,
+        'p90_us': _percentile(durations, 0.90) / 1000,
+        'p99_us': _percentile(durations, 0.99) / 1000,
+    }
+
+
+def run_benchmarks(corpus_size=CORPUS_SIZE, min_time=0.3, hands=20, only=None):
+    """运行全部基准，返回 {'函数名/语料名': 统计结果}"""
+    corpora = build_corpora(corpus_size)
+    game = MahjongGame(human_players=0, ai_players=4, seed=CORPUS_SEED)
+    results = {}
+    for name, func in _hot_functions(game).items():
+        if only and name not in only:
+            continue
+        for corpus_name, players in corpora.items():
+            # 先完整跑一遍预热查表缓存
+            for p in players:
+                func(p)
+            results[f"{name}/{corpus_name}"] = measure(func, players, min_time)
+    if not only or 'select_discard_tiles' in only:
+        for corpus_name, players in corpora.items():
+            results[f"select_discard_tiles/{corpus_name}"] = measure_batch(players, min_time=min_time)
+    if hands and (not only or 'hand' in only):
+        results['hand/ai_only'] = measure_hands(hands)
+    return results
+
+
+def format_report(results, baseline=None):
+    lines = [f"{'基准':<36}{'ops/s':>12}{'p50(us)':>10}{'p90(us)':>10}{'p99(us)':>10}{'对比基线':>10}"]
+    for name, r in results.items():
+        change = ""
+        if baseline and name in baseline:
+            change = f"{r['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1:+.1%}"
+        lines.append(
+            f"{name:<36}{r['ops_per_sec']:>12.1f}{r['p50_us']:>10.1f}{r['p90_us']:>10.1f}{r['p99_us']:>10.1f}{change:>10}"
+        )
+    return "\n".join(lines)
+
+
+def find_regressions(results, baseline, threshold):
+    """返回吞吐量比基线下降超过threshold（比例）的基准名列表"""
+    regressions = []
+    for name, r in results.items():
+        if name in baseline and r['ops_per_sec'] < baseline[name]['ops_per_sec'] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='引擎热点函数性能基准')
+    parser.add_argument('--corpus-size', type=int, default=CORPUS_SIZE, help='每类语料的手牌数')
+    parser.add_argument('--min-time', type=float, default=0.3, help='每项基准最少运行秒数')
+    parser.add_argument('--hands', type=int, default=20, help='端到端测量的电脑对局数（0为不测）')
+    parser.add_argument('--only', nargs='*', help='只运行指定的函数（如 check_win hand）')
+    parser.add_argument('--save', help='把结果保存为基线文件')
+    parser.add_argument('--compare', help='与基线文件比较')
+    parser.add_argument('--threshold', type=float, default=0.10, help='判定为性能回退的吞吐量下降比例')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.corpus_size, args.min_time, args.hands, args.only)
+    print(format_report(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"基线已保存至：{args.save}")
+
+    if baseline:
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n性能回退（下降超过{args.threshold:.0%}）：" + ", ".join(regressions))
+            return 1
+        print("\n没有发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
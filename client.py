@@ -0,0 +1,185 @@
+# 对局服务器的脚本客户端与压力测试
+# ScriptedClient 通过server.py的协议加入对局，用简单的规则自动应答决策点
+# （能和就和，其他鸣牌一律跳过，打牌打刚摸到的牌或手中最孤立的牌）。
+# load_test 同时启动很多个客户端连接同一个服务器，统计完成的局数、决策数、
+# 每秒决策数、从回复决策点到收到下一帧的往返延迟，以及每个决策平均收到的
+# 帧数和字节数（协议只发送增量，这两个数不应随对局变长而增加）。
+#
+# 用法：python client.py --clients 200 --games 2                （在本进程中启动服务器）
+#       python client.py --clients 200 --connect 127.0.0.1:8765  （连接已有的服务器）
+#       python client.py --clients 40 --drop-every 15             （定期断线重连）
+
+import argparse
+import asyncio
+import time
+
+import protocol
+from tiles import counts_of, neighbor_count
+from server import GameServer, NUM_SEATS
+
+
+class ScriptedClient:
+    """按脚本自动打牌的客户端，play()打完games局后返回完成的局数
+
+    局面由开局快照加事件在客户端维护（protocol.SeatView）。drop_every大于0时
+    每回复这么多个决策点就断开一次连接，再用令牌重连（测试重连和局面快照）。
+    """
+
+    def __init__(self, host, port, name, games=1, drop_every=0):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.games = games
+        self.drop_every = drop_every
+        self.view = None
+        self.decisions = 0
+        self.frames = 0
+        self.bytes_received = 0
+        self.resyncs = 0
+        self.latencies = []  # 回复决策点到收到下一帧的秒数
+
+    def answer(self, kind, tile, options):
+        if kind == 'discard':
+            hand = self.view.hand
+            if tile is None or tile not in hand:
+                counts = counts_of(hand)
+                tile = min(hand, key=lambda t: (counts[t] >= 2, neighbor_count(counts, t)))
+            return 'discard', tile
+        return ('hu', None) if ('hu', None) in options else ('pass', None)
+
+    async def play(self):
+        finished = 0
+        token = None
+        while finished < self.games:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+
+            def send(*messages):
+                writer.write(protocol.encode_frame(list(messages)))
+
+            resuming = token is not None
+            send([protocol.MSG_RESUME, token] if resuming else [protocol.MSG_JOIN, self.name])
+            dropped = False
+            sent_at = None
+            try:
+                async for line in reader:
+                    if sent_at is not None:
+                        self.latencies.append(time.perf_counter() - sent_at)
+                        sent_at = None
+                    self.frames += 1
+                    self.bytes_received += len(line)
+                    for message in protocol.decode_frame(line):
+                        code = message[0]
+                        if code < protocol.MSG_DECIDE:
+                            event = protocol.decode_event(message)
+                            if event.kind == 'end':
+                                finished += 1
+                                token = None
+                                if finished < self.games:
+                                    send([protocol.MSG_JOIN, self.name])
+                            elif self.view is None:
+                                raise RuntimeError(f"{self.name}: 收到局面快照之前的事件")
+                            else:
+                                self.view.apply(event)
+                        elif code == protocol.MSG_DECIDE:
+                            action, arg = self.answer(*protocol.decode_decision(message))
+                            send([protocol.MSG_ACT] + protocol.encode_action(action, arg))
+                            sent_at = time.perf_counter()
+                            self.decisions += 1
+                            if self.drop_every and self.decisions % self.drop_every == 0:
+                                dropped = True
+                        elif code == protocol.MSG_JOINED:
+                            token = message[3]
+                        elif code == protocol.MSG_SYNC:
+                            if resuming:
+                                self.resyncs += 1
+                                resuming = False
+                            self.view = protocol.SeatView(message)
+                        elif code == protocol.MSG_ERROR:
+                            if not resuming:
+                                raise RuntimeError(f"{self.name}: {message[1]}")
+                            # 断线期间这一局已经（由电脑代打）结束
+                            resuming = False
+                            finished += 1
+                            token = None
+                            if finished < self.games:
+                                send([protocol.MSG_JOIN, self.name])
+                    if dropped or finished >= self.games:
+                        break
+            finally:
+                writer.close()
+        return finished
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def load_test(clients, games=1, host='127.0.0.1', port=None, humans=NUM_SEATS, strategy='simple', seed=0,
+                    drop_every=0):
+    """启动clients个脚本客户端，各打games局，返回统计结果（字典）
+
+    port为None时在本进程中启动一个服务器（每桌humans个人类座位），否则连接已有的服务器。
+    """
+    server = listener = None
+    if port is None:
+        server = GameServer(humans=humans, strategy=strategy, turn_timeout=None, seed=seed)
+        listener = await server.serve(host, 0)
+        port = listener.sockets[0].getsockname()[1]
+    started = time.perf_counter()
+    try:
+        players = [ScriptedClient(host, port, f"客户端{i + 1}", games, drop_every) for i in range(clients)]
+        finished = await asyncio.gather(*(player.play() for player in players))
+    finally:
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    elapsed = time.perf_counter() - started
+    decisions = sum(player.decisions for player in players)
+    latencies = [t for player in players for t in player.latencies]
+    result = {
+        'clients': clients,
+        'games': sum(finished),
+        'decisions': decisions,
+        'seconds': elapsed,
+        'decisions_per_second': decisions / elapsed if elapsed else 0.0,
+        'latency_p50_ms': _percentile(latencies, 0.5) * 1000,
+        'latency_p99_ms': _percentile(latencies, 0.99) * 1000,
+        'frames_per_decision': sum(player.frames for player in players) / decisions if decisions else 0.0,
+        'bytes_per_decision': sum(player.bytes_received for player in players) / decisions if decisions else 0.0,
+        'resyncs': sum(player.resyncs for player in players),
+    }
+    if server is not None:
+        result['ai_decisions'] = server.ai_decisions
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对局服务器压力测试')
+    parser.add_argument('--clients', type=int, default=100, help='同时连接的客户端数')
+    parser.add_argument('--games', type=int, default=1, help='每个客户端打的局数')
+    parser.add_argument('--connect', default=None, metavar='HOST:PORT', help='连接已有的服务器（默认在本进程中启动）')
+    parser.add_argument('--humans', type=int, default=NUM_SEATS, help='本进程服务器每桌的人类座位数')
+    parser.add_argument('--strategy', default='simple', help='本进程服务器电脑座位的策略')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop-every', type=int, default=0, help='每回复N个决策点断线重连一次')
+    args = parser.parse_args(argv)
+
+    host, port = '127.0.0.1', None
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        port = int(port)
+    result = asyncio.run(load_test(args.clients, args.games, host, port, args.humans, args.strategy, args.seed,
+                                  args.drop_every))
+    print(f"{result['clients']} 个客户端，完成 {result['games']} 局，用时 {result['seconds']:.2f} 秒")
+    print(f"人类决策 {result['decisions']} 次（{result['decisions_per_second']:.0f} 次/秒），"
+          f"往返延迟 p50 {result['latency_p50_ms']:.2f} 毫秒，p99 {result['latency_p99_ms']:.2f} 毫秒")
+    print(f"每个决策平均收到 {result['frames_per_decision']:.2f} 帧、{result['bytes_per_decision']:.0f} 字节，"
+          f"重连 {result['resyncs']} 次")
+    if 'ai_decisions' in result:
+        print(f"电脑决策 {result['ai_decisions']} 次")
+
+
+if __name__ == "__main__":
+    main()
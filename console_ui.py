@@ -0,0 +1,181 @@
+# 命令行界面
+# ConsoleEventSink 把引擎事件打印到终端，console_decide 通过 input() 让人类
+# 玩家做选择。两者都只是引擎（MahjongGame.run）的使用方。
+
+from player_class import display_hand
+from tiles import TILE_NAMES, parse_tile
+
+MELD_LABELS = {'chi': '吃', 'peng': '碰', 'gang': '杠'}
+GANG_VERBS = {'open': '杠了', 'closed': '暗杠了', 'added': '加杠了'}
+
+
+def format_melds(melds):
+    """把面子列表格式化为“吃: 1条 2条 3条; 碰: ...”"""
+    meld_strs = []
+    for meld_type, tiles in melds:
+        # 根据面子类型使用不同的显示格式
+        label = MELD_LABELS.get(meld_type, meld_type)
+        meld_strs.append(f"{label}: " + ' '.join(TILE_NAMES[t] for t in tiles))
+    return "; ".join(meld_strs)
+
+
+# 显示所有玩家的丢弃牌
+def display_discards(game):
+    print("===公共信息： ===")
+    for p in game.players:
+        discard_str = " ".join(TILE_NAMES[t] for t in p.discards)
+        print(f"{p.name} 丢弃手牌：{discard_str}")
+    print()
+
+    # 显示所有玩家的面子
+    for p in game.players:
+        print(f"{p.name}的面子：{format_melds(p.melds)}")
+
+    print(f"\n牌山剩余: {len(game.wall)}张牌\n")
+
+
+def display_own(player, drawn=None):
+    """显示自己摸到的牌、手牌和面子"""
+    if drawn is not None:
+        print(f"你摸到了: {TILE_NAMES[drawn]}")
+    display_hand(player.hand, "你的")
+    if player.melds:
+        print("\n你的面子：" + format_melds(player.melds))
+
+
+class ConsoleEventSink:
+    """把引擎事件打印到终端"""
+
+    def __call__(self, game, event):
+        kind = event.kind
+        if kind == 'start':
+            print("游戏开始！")
+            return
+        if kind == 'end':
+            if event.info is not None:
+                print(f"\n恭喜 {game.players[event.info].name} 胡牌！")
+            else:
+                print("\n牌山已空，流局！")
+            return
+
+        player = game.players[event.seat]
+        name = player.name
+        visible = not player.is_computer or game.show_ai_cards
+        tile_name = TILE_NAMES[event.tile] if event.tile is not None else None
+
+        if kind == 'draw':
+            if event.info == 'rinshan':
+                # 杠后摸岭上牌
+                print(f"{name} 摸了一张牌: {tile_name}" if visible else f"{name} 摸了一张牌")
+                if visible:
+                    display_own(player)
+                return
+            print(f"\n=== {name}的回合 ===")
+            # 显示公共信息
+            display_discards(game)
+            print(" ===你的信息： ===")
+            if visible:
+                display_own(player, event.tile)
+            else:
+                print("你摸到了: *")
+                print("你的手牌：")
+                print("万: *")
+                print("条: *")
+                print("筒: *")
+                print("字牌: *")
+                print("\n你的面子：*")
+        elif kind == 'discard':
+            print(f"{name} 打出了: {tile_name}")
+        elif kind in ('chi', 'peng'):
+            print(f"{name} {MELD_LABELS[kind]}了 {tile_name}")
+            if visible:
+                display_own(player)
+        elif kind == 'gang':
+            print(f"{name} {GANG_VERBS[event.info]} {tile_name}")
+        elif kind == 'ron':
+            print(f"{name} 和牌！")
+        elif kind == 'tsumo':
+            print(f"{name} 自摸和牌！")
+        elif kind == 'skip_tsumo':
+            print(f"{name} 选择不胡牌，继续游戏")
+
+
+def _choose(prompt, count):
+    """让玩家输入1-count之间的数字"""
+    while True:
+        try:
+            choice = int(input(prompt))
+            if 1 <= choice <= count:
+                return choice
+            print("无效的选择，请重新输入！")
+        except ValueError:
+            print("请输入有效的数字！")
+
+
+def console_decide(game, decision):
+    """人类玩家的策略回调：通过命令行输入做选择"""
+    player = game.players[decision.seat]
+
+    if decision.kind == 'discard':
+        # 要求玩家打出一张牌
+        while True:
+            tile = parse_tile(input("请选择要打出的牌（输入牌代号）: "))
+            if tile is not None and player.counts[tile]:
+                return 'discard', tile
+            print("无效的牌，请重新输入！")
+
+    options = decision.options
+    if decision.kind == 'self':
+        if ('hu', None) in options:
+            # 人类玩家选择是否胡牌
+            print("\n恭喜！你可以自摸和牌！")
+            while True:
+                choice = input("是否胡牌？(y/n): ").strip().lower()
+                if choice in ['y', 'n']:
+                    break
+                print("无效的输入，请输入y或n")
+            if choice == 'y':
+                return 'hu', None
+
+        gang_tiles = [arg for action, arg in options if action == 'gang']
+        if not gang_tiles:
+            return 'pass', None
+        print("\n你可以进行以下杠牌操作：")
+        for i, tile in enumerate(gang_tiles):
+            # 检查是否为加杠
+            is_add_gang = any(meld_type == 'peng' and tiles[0] == tile for meld_type, tiles in player.melds)
+            gang_type = '加杠' if is_add_gang else '暗杠'
+            print(f"{i+1}. {gang_type} {TILE_NAMES[tile]}")
+        print(f"{len(gang_tiles)+1}. 不杠")
+        choice = _choose("请选择（输入数字）: ", len(gang_tiles) + 1)
+        if choice <= len(gang_tiles):
+            return 'gang', gang_tiles[choice-1]
+        return 'pass', None
+
+    # 对别人打出的牌的响应
+    # 显示当前手牌
+    print(f"\n{player.name}的当前手牌：")
+    display_hand(player.hand, "你的")
+
+    # 显示可选操作
+    print(f"\n{player.name}，你可以对 {TILE_NAMES[decision.tile]} 进行以下操作：")
+    labels = {'hu': '和牌', 'gang': '杠', 'peng': '碰', 'chi': '吃', 'pass': '跳过'}
+    actions = []
+    for action, _ in options:
+        if action not in actions:
+            actions.append(action)
+    for i, action in enumerate(actions):
+        print(f"{i+1}. {labels[action]}")
+    action = actions[_choose("请选择操作（输入数字）: ", len(actions)) - 1]
+
+    if action != 'chi':
+        return next(option for option in options if option[0] == action)
+
+    chi_options = [arg for act, arg in options if act == 'chi']
+    if len(chi_options) > 1:
+        print("\n请选择吃牌组合：")
+        for i, option in enumerate(chi_options):
+            option_str = ' '.join(TILE_NAMES[t] for t in option)
+            print(f"{i+1}. {option_str}")
+        return 'chi', chi_options[_choose("请选择吃牌组合（输入数字）: ", len(chi_options)) - 1]
+    return 'chi', chi_options[0]
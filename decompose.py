@@ -0,0 +1,38 @@
+# 手牌拆解的共享缓存
+# 一手牌按花色拆成四组（条、筒、万、字牌），每组的计数模式单独拆解，结果按计数
+# 模式缓存。同一种计数模式会在不同回合、不同对局中反复出现，缓存是有大小上限的
+# LRU（memoize），cache_stats() 返回每个缓存的命中/未命中次数。
+# 目前登记的是向听数用的拆解概要（shanten.suit_vector / honor_vector，每种面子数、
+# 雀头数下最多的搭子数）；和牌判断直接查agari.py的和牌表，不经过这里。
+
+import functools
+
+_CACHES = {}
+
+
+def memoize(name, maxsize):
+    """函数装饰器：以name登记一个最多保存maxsize个结果的LRU缓存"""
+    def decorator(func):
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+        _CACHES[name] = cached
+        return cached
+    return decorator
+
+
+def cache_stats():
+    """各缓存的统计 {名字: (命中, 未命中, 上限, 当前大小)}"""
+    return {name: func.cache_info() for name, func in _CACHES.items()}
+
+
+def clear_caches():
+    for func in _CACHES.values():
+        func.cache_clear()
+
+
+def format_cache_stats():
+    lines = [f"{'缓存':<16}{'命中':>12}{'未命中':>10}{'命中率':>9}{'大小':>9}{'上限':>9}"]
+    for name, info in cache_stats().items():
+        total = info.hits + info.misses
+        rate = f"{info.hits / total:.1%}" if total else "-"
+        lines.append(f"{name:<16}{info.hits:>12}{info.misses:>10}{rate:>9}{info.currsize:>9}{info.maxsize:>9}")
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+# 对局事件流（牌谱）
+# 对局开始时写一行头部（种子、玩家及其策略、配牌），之后每个引擎事件写一行紧凑的
+# JSON数组 [事件, 座位, 牌, 附加信息]（末尾的空值省略），文件按行缓冲，
+# 每个事件写完即落盘。内存占用与对局长度无关，程序中途崩溃也只会丢失
+# 最后一行。任意时刻的手牌都可以由配牌加上事件流重新推算出来。
+#
+# 用法：python game_log.py log/game_log_20250312_141445_123.jsonl
+#       把事件流转换成文字牌谱输出
+
+import json
+import sys
+
+from tiles import TILE_NAMES
+
+LOG_VERSION = 1
+
+# 牌谱中各事件的中文名
+ACTION_LABELS = {
+    'draw': '摸牌', 'chi': '吃', 'peng': '碰', 'tsumo': '自摸和牌', 'ron': '和牌',
+    'skip_tsumo': '放弃自摸',
+}
+GANG_LABELS = {'open': '杠', 'closed': '暗杠', 'added': '加杠'}
+
+
+class GameLogWriter:
+    """把一局的事件逐行追加写入JSONL文件"""
+
+    def __init__(self, path):
+        self.path = path
+        # 行缓冲：每个事件写完即落盘
+        self.file = open(path, 'w', encoding='utf-8', buffering=1)
+
+    def write_header(self, game):
+        header = {
+            'version': LOG_VERSION,
+            'seed': game.seed,
+            'players': [
+                {'name': p.name, 'computer': p.is_computer, 'strategy': getattr(strategy, 'name', None)}
+                for p, strategy in zip(game.players, game.strategies)
+            ],
+            'deal': [list(p.hand) for p in game.players],
+        }
+        self.file.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    def write_event(self, kind, seat=None, tile=None, info=None):
+        record = [kind, seat, tile, info]
+        while record[-1] is None:
+            record.pop()
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def read_log(path):
+    """读取事件流，返回(头部, 事件列表)，事件为GameEvent"""
+    from player_class import GameEvent
+
+    events = []
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中途崩溃时可能留下不完整的最后一行
+                break
+            record += [None] * (4 - len(record))
+            kind, seat, tile, info = record
+            if kind == 'chi':
+                info = tuple(info)
+            events.append(GameEvent(kind, seat, tile, info))
+    return header, events
+
+
+def replay_players(header, events):
+    """按事件流推算各玩家的状态，逐个产出(事件, 玩家列表)
+
+    玩家列表是player_class.Player对象（手牌、面子、牌河），每次产出的是
+    同一组对象，事件已经应用在上面。
+    """
+    from player_class import Player
+
+    players = []
+    for info, deal in zip(header['players'], header['deal']):
+        player = Player(info['name'], is_computer=info['computer'])
+        for tile in deal:
+            player.draw_tile(tile)
+        players.append(player)
+
+    for event in events:
+        kind, seat, tile, info = event
+        if kind == 'draw':
+            players[seat].draw_tile(tile)
+        elif kind == 'discard':
+            players[seat].discard_tile(tile)
+        elif kind == 'chi':
+            players[seat].perform_chi(tile, info)
+        elif kind == 'peng':
+            players[seat].perform_peng(tile)
+        elif kind == 'gang':
+            players[seat].perform_gang(tile, is_self_gang=info != 'open', is_add_gang=info == 'added')
+        yield event, players
+
+
+def format_text(header, events):
+    """把事件流转换成文字牌谱（每行一个事件，附带事件后的手牌）"""
+    lines = ["=== 麻将牌谱 ===", f"种子: {header['seed']}"]
+    num_players = len(header['players'])
+    discards = 0
+    winner = None
+    for event, players in replay_players(header, events):
+        kind, seat, tile, info = event
+        if kind == 'end':
+            winner = info
+            continue
+        if seat is None:
+            continue
+        player = players[seat]
+        if kind == 'discard':
+            label = '弃牌' if player.is_computer else '手动弃牌'
+        elif kind == 'gang':
+            label = GANG_LABELS[info]
+        else:
+            label = ACTION_LABELS[kind]
+        line = f"[第{discards // num_players + 1}轮] {player.name} {label}"
+        if tile is not None:
+            line += f": {TILE_NAMES[tile]}"
+        line += " (手牌: " + " ".join(TILE_NAMES[t] for t in sorted(player.hand)) + ")"
+        lines.append(line)
+        if kind == 'discard':
+            discards += 1
+
+    if winner is not None:
+        lines.append(f"\n游戏结束！胜利者：{header['players'][winner]['name']}")
+    elif events and events[-1].kind == 'end':
+        lines.append("\n游戏结束！流局")
+    else:
+        lines.append("\n（牌谱不完整）")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(format_text(*read_log(path)))
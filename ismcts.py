@@ -0,0 +1,415 @@
+# 信息集蒙特卡洛树搜索（ISMCTS）
+# 搜索树只包含做决策的玩家自己的决策（打牌、吃碰杠和/过、自摸杠）。每次迭代先把
+# 看不见的牌随机分配给对手手牌和牌山（确定化），然后从当前局面开始模拟：自己的
+# 决策在树内按UCB1选择，离开树后和对手一样用快速策略（rollout.fast_discard）
+# 打完，结果（自己和牌+1、放铳-1、其他0）沿路径回传。
+#
+# 树的节点按自己看到的信息区分：动作之后的子节点以下一个决策点的(类型, 打牌者, 牌)
+# 为键。同一个玩家的下一个决策如果正好是上次搜索中展开过的子节点，就直接以它为根
+# 继续搜索，保留已有的统计。
+#
+# 模拟中对手只摸打、自摸和荣和，不吃碰杠。
+
+import math
+import random
+import time
+from collections import namedtuple
+
+from agari import is_agari
+from ai_strategy import AdvancedAI
+from tiles import NUM_TILE_TYPES, is_suited
+from wall import MAX_REPLACEMENT_DRAWS
+from rollout import RolloutState, WIN_SCORE, DEAL_IN_SCORE, determinize, fast_discard
+
+Observation = namedtuple('Observation', RolloutState._fields + ('pengs', 'replacement_draws', 'current', 'kind', 'tile'))
+Observation.__doc__ = """做决策的玩家在一个决策点看到的局面
+
+除RolloutState的字段外：
+pengs:             自己碰过的牌（可以加杠）
+replacement_draws: 已经摸过的岭上牌数
+current:           当前回合的玩家（claim时为打牌者）
+kind, tile:        决策点的类型和牌（同Decision）
+"""
+
+EXPLORATION = 0.7  # UCB1的探索系数（得分范围为[-1, 1]）
+
+
+def observe(game, decision):
+    """从决策点decision的座位的视角构造Observation"""
+    seat = decision.seat
+    player = game.players[seat]
+    return Observation(
+        seat=seat,
+        hand=list(player.counts),
+        meld_counts=[len(p.melds) for p in game.players],
+        hand_sizes=[len(p.hand) for p in game.players],
+        unseen=list(game.table.unseen[seat]),
+        wall_size=len(game.wall),
+        pengs=[tiles[0] for meld_type, tiles in player.melds if meld_type == 'peng'],
+        replacement_draws=game.wall.replacement_draws,
+        current=game.last_discarder if decision.kind == 'claim' else seat,
+        kind=decision.kind,
+        tile=decision.tile,
+    )
+
+
+class SimState:
+    """模拟用的紧凑局面：每个座位的手牌计数数组、面子数和牌山
+
+    clone() 只复制会被修改的列表，做一次确定化或者一次模拟的成本都很低。
+    """
+
+    __slots__ = ('seat', 'hands', 'melds', 'shanten', 'pengs', 'wall', 'position', 'live_end',
+                 'replacement_draws', 'current', 'pending')
+
+    @classmethod
+    def from_observation(cls, observation):
+        """由Observation构造只含已知信息的局面，对手手牌和牌山在deal_hidden中填入"""
+        state = cls()
+        num_players = len(observation.hand_sizes)
+        state.seat = observation.seat
+        state.hands = [[0] * NUM_TILE_TYPES for _ in range(num_players)]
+        state.hands[observation.seat] = list(observation.hand)
+        state.melds = list(observation.meld_counts)
+        state.shanten = [None] * num_players
+        state.pengs = list(observation.pengs)
+        state.wall = []
+        state.position = 0
+        state.live_end = observation.wall_size
+        state.replacement_draws = observation.replacement_draws
+        state.current = observation.current
+        state.pending = None
+        return state
+
+    def clone(self):
+        state = SimState.__new__(SimState)
+        state.seat = self.seat
+        state.hands = [list(counts) for counts in self.hands]
+        state.melds = list(self.melds)
+        state.shanten = list(self.shanten)
+        state.pengs = list(self.pengs)
+        state.wall = self.wall  # 牌山只读，共享
+        state.position = self.position
+        state.live_end = self.live_end
+        state.replacement_draws = self.replacement_draws
+        state.current = self.current
+        state.pending = self.pending
+        return state
+
+    def deal_hidden(self, observation, rng):
+        """随机分配看不见的牌（确定化）"""
+        hands, self.wall = determinize(observation, rng)
+        for seat, counts in enumerate(hands):
+            if seat != self.seat:
+                self.hands[seat] = counts
+
+    def draw(self, kind):
+        """摸一张牌（kind为'rinshan'时摸岭上牌），不能再摸时返回None"""
+        if self.position >= self.live_end:
+            return None
+        if kind == 'rinshan':
+            if self.replacement_draws >= MAX_REPLACEMENT_DRAWS:
+                return None
+            tile = self.wall[-1 - self.replacement_draws]
+            self.replacement_draws += 1
+            self.live_end -= 1
+        else:
+            tile = self.wall[self.position]
+            self.position += 1
+        self.hands[self.current][tile] += 1
+        return tile
+
+    def self_options(self, drawn):
+        """自己摸牌后可以进行的操作（同MahjongGame.self_options）"""
+        counts = self.hands[self.seat]
+        options = []
+        if is_agari(counts, self.melds[self.seat]):
+            options.append(('hu', None))
+        for tile in range(NUM_TILE_TYPES):
+            if counts[tile] == 4:
+                options.append(('gang', tile))
+        for tile in self.pengs:
+            if counts[tile]:
+                options.append(('gang', tile))
+        if options:
+            options.append(('pass', None))
+        return options
+
+    def claim_options(self, tile, discarder):
+        """自己对别人打出的牌可以进行的操作（同MahjongGame.claim_options）"""
+        counts = self.hands[self.seat]
+        options = []
+        counts[tile] += 1
+        if is_agari(counts, self.melds[self.seat]):
+            options.append(('hu', None))
+        counts[tile] -= 1
+        if counts[tile] >= 3:
+            options.append(('gang', tile))
+        if counts[tile] >= 2:
+            options.append(('peng', tile))
+        if is_suited(tile) and (discarder + 1) % len(self.hands) == self.seat:
+            num = tile % 9
+            if num >= 2 and counts[tile - 2] and counts[tile - 1]:
+                options.append(('chi', (tile - 2, tile - 1, tile)))
+            if 1 <= num <= 7 and counts[tile - 1] and counts[tile + 1]:
+                options.append(('chi', (tile - 1, tile, tile + 1)))
+            if num <= 6 and counts[tile + 1] and counts[tile + 2]:
+                options.append(('chi', (tile, tile + 1, tile + 2)))
+        if options:
+            options.append(('pass', None))
+        return options
+
+
+def _turn(state, drawn=None, ask_self=True):
+    """模拟当前玩家的一个回合（生成器）
+
+    自己的决策点产出(类型, 打牌者, 牌, 选项)，接收(动作, 参数)；打牌时参数为None
+    表示用快速策略打牌。
+
+    Returns:
+        这一局结束时返回得分，否则返回None（state.current和state.pending已更新）
+    """
+    seat = state.current
+    counts = state.hands[seat]
+    if state.pending:
+        drawn = state.draw(state.pending)
+        if drawn is None:
+            return 0.0
+    while ask_self and drawn is not None:
+        if seat == state.seat:
+            options = state.self_options(drawn)
+            if not options:
+                break
+            action, tile = yield 'self', None, drawn, options
+        else:
+            action = 'hu' if is_agari(counts, state.melds[seat]) else 'pass'
+        if action == 'hu':
+            return WIN_SCORE if seat == state.seat else 0.0
+        if action != 'gang':
+            break
+        # 暗杠（手中四张）或加杠（碰过的牌）
+        if tile in state.pengs and counts[tile] == 1:
+            state.pengs.remove(tile)
+            counts[tile] -= 1
+        else:
+            counts[tile] -= 4
+            state.melds[seat] += 1
+        state.shanten[seat] = None
+        drawn = state.draw('rinshan')
+        if drawn is None:
+            return 0.0
+
+    tile = None
+    if seat == state.seat:
+        _, tile = yield 'discard', None, drawn, None
+        state.shanten[seat] = None
+    if tile is None:
+        tile, state.shanten[seat] = _fast_discard(state, drawn)
+    counts[tile] -= 1
+    return (yield from _respond(state, seat, tile, 1))
+
+
+def _fast_discard(state, drawn):
+    seat = state.current
+    counts = state.hands[seat]
+    shanten = state.shanten[seat]
+    if shanten is None:
+        drawn = None  # 向听数未知时不能直接打掉摸到的牌
+    return fast_discard(counts, state.melds[seat], drawn, shanten)
+
+
+def _respond(state, discarder, tile, first):
+    """从(discarder + first)开始的玩家对打出的牌鸣牌（生成器），裁定规则同MahjongGame.arbitrate_claims"""
+    num_players = len(state.hands)
+    me = state.seat
+    seats = [(discarder + i) % num_players for i in range(first, num_players)]
+    # 对手只会荣和，靠前的优先（截和）
+    ron = None
+    for other in seats:
+        if other != me:
+            counts = state.hands[other]
+            counts[tile] += 1
+            won = is_agari(counts, state.melds[other])
+            counts[tile] -= 1
+            if won:
+                ron = other
+                break
+
+    # 自己在荣和的对手之前才会被问到；和牌以外的鸣牌在有人荣和时不生效
+    if me in seats and (ron is None or seats.index(me) < seats.index(ron)):
+        options = state.claim_options(tile, discarder)
+        if options:
+            action, arg = yield 'claim', discarder, tile, options
+            if action == 'hu':
+                return WIN_SCORE
+            if action != 'pass' and ron is None:
+                counts = state.hands[me]
+                if action == 'chi':
+                    for t in arg:
+                        if t != tile:
+                            counts[t] -= 1
+                elif action == 'peng':
+                    counts[tile] -= 2
+                    state.pengs.append(tile)
+                else:
+                    counts[tile] -= 3
+                state.melds[me] += 1
+                state.shanten[me] = None
+                state.current = me
+                state.pending = 'rinshan' if action == 'gang' else None
+                return None
+    if ron is not None:
+        return DEAL_IN_SCORE if discarder == me else 0.0
+    state.current = (discarder + 1) % num_players
+    state.pending = 'draw'
+    return None
+
+
+def _simulate(state, kind, tile):
+    """从Observation对应的决策点开始把这一局模拟到底（生成器），返回得分"""
+    if kind == 'claim':
+        first = (state.seat - state.current) % len(state.hands)
+        score = yield from _respond(state, state.current, tile, first)
+    else:
+        # discard决策点之前的自摸/杠已经问过了
+        score = yield from _turn(state, tile, ask_self=kind == 'self')
+    while score is None:
+        score = yield from _turn(state)
+    return score
+
+
+class Node:
+    """搜索树节点：自己的一个信息集，edges为 {动作: Edge}，moves为参与搜索的动作"""
+
+    __slots__ = ('visits', 'edges', 'moves')
+
+    def __init__(self):
+        self.visits = 0
+        self.edges = {}
+        self.moves = None
+
+
+class Edge:
+    """节点下的一个动作：累计得分、次数和按下一个决策点区分的子节点"""
+
+    __slots__ = ('total', 'visits', 'children')
+
+    def __init__(self):
+        self.total = 0.0
+        self.visits = 0
+        self.children = {}
+
+
+def _action_key(action, arg):
+    # 吃的选项在引擎中是列表，作为字典键时转换成元组
+    return action, tuple(arg) if isinstance(arg, list) else arg
+
+
+class ISMCTS:
+    """一个座位的搜索器，跨决策保留搜索树
+
+    Args:
+        iterations: 每个决策的最大迭代次数（None表示不限）
+        budget: 每个决策的最长搜索时间（秒，None表示不限）
+        rng: 确定化和选择未尝试动作用的random.Random
+        candidates: 打牌时只搜索牌效最好的几种打法
+    """
+
+    def __init__(self, iterations=None, budget=0.1, rng=None, candidates=4):
+        if iterations is None and budget is None:
+            raise ValueError("iterations和budget至少要指定一个")
+        self.iterations = iterations
+        self.budget = budget
+        self.candidates = candidates
+        self.rng = rng or random.Random()
+        self.root = None
+        self.last_edge = None  # 上一个决策选择的动作，用于复用子树
+        self.reused = 0  # 复用子树的次数
+
+    def search(self, observation, options=None):
+        """在observation对应的决策点搜索，返回选择的(动作, 参数)（参数形式与options中相同）"""
+        key = (observation.kind, observation.current if observation.kind == 'claim' else None, observation.tile)
+        root = self.last_edge.children.get(key) if self.last_edge is not None else None
+        if root is None:
+            root = Node()
+        else:
+            self.reused += 1
+        self.root = root
+        if root.moves is None:
+            # 根节点的打法按真实的场况（看得见的牌）排序
+            visible = [4 - h - u for h, u in zip(observation.hand, observation.unseen)]
+            self._moves(root, observation.kind, observation.hand, observation.meld_counts[observation.seat],
+                        options, visible)
+
+        base = SimState.from_observation(observation)
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        count = 0
+        while self.iterations is None or count < self.iterations:
+            if deadline is not None and time.perf_counter() >= deadline and count:
+                break
+            state = base.clone()
+            state.deal_hidden(observation, self.rng)
+            self._iterate(state, observation)
+            count += 1
+
+        best = max(root.moves, key=lambda move: root.edges[move].visits if move in root.edges else -1)
+        self.last_edge = root.edges.get(best)
+        if observation.kind == 'discard':
+            return best
+        # 换回引擎给出的参数形式（吃的选项是列表）
+        return next(option for option in options if _action_key(*option) == best)
+
+    def _iterate(self, state, observation):
+        """一次迭代：树内选择、扩展一个节点、快速模拟、回传得分"""
+        path = []
+        node = self.root
+        expanded = False
+        simulation = _simulate(state, observation.kind, observation.tile)
+        try:
+            request = next(simulation)
+            while True:
+                kind, discarder, tile, options = request
+                if path and node is not None:
+                    edge = path[-1][1]
+                    child = edge.children.get((kind, discarder, tile))
+                    if child is None and not expanded:
+                        child = edge.children[(kind, discarder, tile)] = Node()
+                        expanded = True
+                    node = child
+                answer = self._select(node, state, kind, options, path)
+                request = simulation.send(answer)
+        except StopIteration as stop:
+            score = stop.value
+        for node, edge in path:
+            node.visits += 1
+            edge.visits += 1
+            edge.total += score
+
+    def _select(self, node, state, kind, options, path):
+        """在树内按UCB1选择动作（树外返回默认策略），返回送回模拟的答复"""
+        if options is not None and ('hu', None) in options:
+            # 和牌总是最好的结果，不需要搜索
+            return 'hu', None
+        if node is None:
+            return ('discard', None) if kind == 'discard' else ('pass', None)
+        moves = self._moves(node, kind, state.hands[state.seat], state.melds[state.seat], options)
+        untried = [move for move in moves if move not in node.edges]
+        if untried:
+            move = self.rng.choice(untried)
+            node.edges[move] = Edge()
+        else:
+            log_visits = math.log(node.visits)
+            move = max(moves, key=lambda m: node.edges[m].total / node.edges[m].visits
+                       + EXPLORATION * math.sqrt(log_visits / node.edges[m].visits))
+        path.append((node, node.edges[move]))
+        return move
+
+    def _moves(self, node, kind, counts, meld_count, options, visible=None):
+        """节点参与搜索的动作（第一次访问时确定）"""
+        if node.moves is None:
+            if kind == 'discard':
+                ranked = AdvancedAI.rank_discards(counts, meld_count, visible)
+                node.moves = [('discard', tile) for tile in ranked[:self.candidates]]
+            else:
+                node.moves = [_action_key(action, arg) for action, arg in options]
+        return node.moves
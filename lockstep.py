@@ -0,0 +1,63 @@
+# 多桌同步推进
+# 同时运行多局对局的引擎（MahjongGame.run），每一步收集所有桌子当前的决策点，
+# 按策略类型分组，每组只调用一次 Strategy.decide_batch（'advanced' 把所有打牌
+# 决策合并成一次NumPy批量牌效计算），再把结果分别送回各桌的引擎。每局自己的
+# 随机数生成器不受影响，所以结果与逐局调用 play() 完全相同。
+
+from strategies import Strategy
+
+
+def _decide_all(running):
+    """对所有桌子当前的决策点做决策，返回与running一一对应的(动作, 参数)"""
+    answers = [None] * len(running)
+    groups = {}
+    for i, (game, _, decision) in enumerate(running):
+        strategy = game.strategies[decision.seat]
+        if isinstance(strategy, Strategy):
+            groups.setdefault(type(strategy), []).append(i)
+        else:
+            # 不是Strategy对象的回调逐个调用
+            answers[i] = strategy(game, decision)
+    for cls, indices in groups.items():
+        requests = []
+        for i in indices:
+            game, _, decision = running[i]
+            requests.append((game.strategies[decision.seat], game, decision))
+        for i, answer in zip(indices, cls.decide_batch(requests)):
+            answers[i] = answer
+    return answers
+
+
+def run_lockstep(games, tables=64):
+    """同步推进多局对局，逐个产出打完的对局（按完成顺序）
+
+    Args:
+        games: MahjongGame的可迭代对象（可以是惰性生成的），同时最多进行tables局
+        tables: 同时进行的桌数
+    """
+    games = iter(games)
+    running = []  # [(game, 引擎, 当前的决策点)]
+    exhausted = False
+    while True:
+        # 补满桌子
+        while not exhausted and len(running) < tables:
+            game = next(games, None)
+            if game is None:
+                exhausted = True
+                break
+            engine = game.run()
+            try:
+                running.append((game, engine, next(engine)))
+            except StopIteration:
+                yield game
+        if not running:
+            return
+
+        answers = _decide_all(running)
+        still_running = []
+        for (game, engine, _), answer in zip(running, answers):
+            try:
+                still_running.append((game, engine, engine.send(answer)))
+            except StopIteration:
+                yield game
+        running = still_running
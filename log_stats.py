@@ -0,0 +1,320 @@
+# 牌谱统计
+# 扫描牌谱目录中的所有对局记录（旧版文字牌谱 .txt、JSONL事件流 .jsonl、
+# 二进制记录分片 .mjr），用进程池逐个文件并行统计，再合并为总的统计结果：
+# 各座位和各策略的胜率与放铳率、平均巡数、吃碰杠频率、流局时的听牌率。
+# 每个文件的统计结果按(修改时间, 大小)缓存，新增对局后重新运行只处理变化的文件。
+#
+# 用法：python log_stats.py [目录或文件...] [--workers 8] [--json]
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from agari import winning_tiles
+from tiles import NUM_TILE_TYPES, TILE_NAMES
+from tournament import wilson_interval
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log")
+CACHE_NAME = ".log_stats_cache.json"
+CACHE_VERSION = 1
+LOG_SUFFIXES = ('.txt', '.jsonl', '.mjr')
+CLAIM_KINDS = ('chi', 'peng', 'gang')
+
+# 旧版文字牌谱中的动作名
+TEXT_ACTIONS = {
+    '摸牌': ('draw', 'draw'), '弃牌': ('discard', None), '手动弃牌': ('discard', None),
+    '吃': ('chi', None), '碰': ('peng', None), '杠': ('gang', 'open'), '暗杠': ('gang', 'closed'),
+    '加杠': ('gang', 'added'), '自摸和牌': ('tsumo', None), '和牌': ('ron', None), '放弃自摸': ('skip_tsumo', None),
+}
+NAME_TO_TILE = {name: tile for tile, name in enumerate(TILE_NAMES)}
+
+
+def new_stats():
+    """一组可以合并的统计计数（可JSON序列化）"""
+    return {
+        'games': 0, 'turns': 0, 'tsumo': 0, 'ron': 0, 'draws': 0,
+        'claims': dict.fromkeys(CLAIM_KINDS, 0),
+        'draw_players': 0, 'draw_tenpai': 0,
+        'seats': {},       # 座位 -> {'games', 'wins', 'deal_ins'}
+        'strategies': {},  # 策略名 -> {'games', 'wins', 'deal_ins'}
+    }
+
+
+def merge_stats(total, part):
+    for key in ('games', 'turns', 'tsumo', 'ron', 'draws', 'draw_players', 'draw_tenpai'):
+        total[key] += part[key]
+    for kind in CLAIM_KINDS:
+        total['claims'][kind] += part['claims'][kind]
+    for group in ('seats', 'strategies'):
+        for name, counts in part[group].items():
+            target = total[group].setdefault(name, {'games': 0, 'wins': 0, 'deal_ins': 0})
+            for key in target:
+                target[key] += counts[key]
+    return total
+
+
+def _strategy_label(player):
+    """玩家使用的策略名，牌谱中没有记录时按人类/电脑区分"""
+    return player.get('strategy') or ('电脑' if player.get('computer') else '人类')
+
+
+def add_game(stats, labels, events, final_hands=None):
+    """把一局计入统计
+
+    Args:
+        labels: 每个座位的策略名
+        events: 这一局的事件（GameEvent或同样结构的元组），最后一个为end
+        final_hands: 流局时每个座位最后的(计数数组, 面子数)，用于统计听牌率
+    """
+    stats['games'] += 1
+    winner = None
+    discarder = None
+    for kind, seat, tile, info in events:
+        if kind == 'discard':
+            stats['turns'] += 1
+        elif kind in ('chi', 'peng') or (kind == 'gang' and info == 'open'):
+            stats['claims'][kind] += 1
+        elif kind == 'tsumo':
+            winner = seat
+        elif kind == 'ron':
+            winner, discarder = seat, info
+    if winner is None:
+        stats['draws'] += 1
+        if final_hands is not None:
+            for counts, meld_count in final_hands:
+                stats['draw_players'] += 1
+                if winning_tiles(counts, meld_count):
+                    stats['draw_tenpai'] += 1
+    elif discarder is None:
+        stats['tsumo'] += 1
+    else:
+        stats['ron'] += 1
+
+    for seat, label in enumerate(labels):
+        for group, name in (('seats', str(seat)), ('strategies', label)):
+            counts = stats[group].setdefault(name, {'games': 0, 'wins': 0, 'deal_ins': 0})
+            counts['games'] += 1
+            counts['wins'] += seat == winner
+            counts['deal_ins'] += seat == discarder
+
+
+def _final_hands(header, events):
+    from game_log import replay_players
+
+    players = None
+    for _, players in replay_players(header, events):
+        pass
+    if players is None:
+        return None
+    return [(p.counts, len(p.melds)) for p in players]
+
+
+def _add_recorded_game(stats, header, events):
+    """JSONL牌谱和二进制记录：流局时由配牌加事件推算最后的手牌"""
+    if not events or events[-1].kind != 'end':
+        return
+    final_hands = _final_hands(header, events) if events[-1].info is None else None
+    add_game(stats, [_strategy_label(p) for p in header['players']], events, final_hands)
+
+
+def _analyze_text(path, stats):
+    """旧版文字牌谱：每行一个动作，附带动作后的手牌"""
+    seats = {}
+    events = []
+    hands = {}
+    melds = {}
+    last_discarder = None
+    ended = False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('游戏结束！'):
+                ended = True
+                continue
+            if not line.startswith('[第'):
+                continue
+            _, _, rest = line.partition('] ')
+            rest, _, hand = rest.partition(' (手牌: ')
+            name, _, action = rest.partition(' ')
+            action, _, tile_name = action.partition(': ')
+            if action not in TEXT_ACTIONS:
+                continue
+            seat = seats.setdefault(name, len(seats))
+            kind, info = TEXT_ACTIONS[action]
+            tile = NAME_TO_TILE.get(tile_name)
+            if kind == 'discard':
+                last_discarder = seat
+            elif kind == 'ron':
+                info = last_discarder
+            if kind in ('chi', 'peng') or (kind == 'gang' and info != 'added'):
+                melds[seat] = melds.get(seat, 0) + 1
+            counts = [0] * NUM_TILE_TYPES
+            for t in hand.rstrip(')').split():
+                counts[NAME_TO_TILE[t]] += 1
+            hands[seat] = counts
+            events.append((kind, seat, tile, info))
+    if not ended:
+        return
+    events.append(('end', None, None, None))
+    labels = ['电脑' if name.startswith('电脑') else '人类' for name in seats]
+    final_hands = [(hands[seat], melds.get(seat, 0)) for seat in range(len(seats))]
+    add_game(stats, labels, events, final_hands)
+
+
+def analyze_file(path):
+    """统计一个牌谱文件，返回(路径, 统计结果)"""
+    stats = new_stats()
+    if path.endswith('.txt'):
+        _analyze_text(path, stats)
+    elif path.endswith('.jsonl'):
+        from game_log import read_log
+
+        header, events = read_log(path)
+        _add_recorded_game(stats, header, events)
+    elif path.endswith('.mjr'):
+        from records import ShardReader
+
+        with ShardReader(path) as reader:
+            for record in reader:
+                _add_recorded_game(stats, record.header(), record.events())
+    return path, stats
+
+
+def find_logs(paths):
+    """列出目录中的所有牌谱文件"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(LOG_SUFFIXES))
+        elif path.endswith(LOG_SUFFIXES):
+            found.append(path)
+    return found
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_cache(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except ValueError:
+        return {}
+    return cache['files'] if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(path, files):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'files': files}, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def collect_stats(paths=(LOG_DIR,), workers=None, cache_path=None):
+    """统计所有牌谱，返回(统计结果, 本次实际处理的文件数)
+
+    cache_path为None时不使用缓存。
+    """
+    files = find_logs(paths)
+    cache = load_cache(cache_path)
+    fresh = {}
+    todo = []
+    for path in files:
+        key = os.path.abspath(path)
+        entry = cache.get(key)
+        if entry is not None and entry['key'] == _file_key(path):
+            fresh[key] = entry
+        else:
+            todo.append(path)
+
+    if todo:
+        with multiprocessing.Pool(workers) as pool:
+            for path, stats in pool.imap_unordered(analyze_file, todo):
+                fresh[os.path.abspath(path)] = {'key': _file_key(path), 'stats': stats}
+
+    if cache_path:
+        save_cache(cache_path, fresh)
+    total = new_stats()
+    for entry in fresh.values():
+        merge_stats(total, entry['stats'])
+    return total, len(todo)
+
+
+def summarize(stats):
+    """由统计计数计算各项比率"""
+    games = stats['games'] or 1
+
+    def rates(counts):
+        n = counts['games']
+        low, high = wilson_interval(counts['wins'], n)
+        return {
+            'games': n,
+            'win_rate': counts['wins'] / n if n else 0.0,
+            'win_rate_ci95': (low, high),
+            'deal_in_rate': counts['deal_ins'] / n if n else 0.0,
+        }
+
+    return {
+        'games': stats['games'],
+        'seats': {seat: rates(c) for seat, c in sorted(stats['seats'].items(), key=lambda x: int(x[0]))},
+        'strategies': {name: rates(c) for name, c in sorted(stats['strategies'].items())},
+        'avg_turns': stats['turns'] / games,
+        'tsumo_rate': stats['tsumo'] / games,
+        'ron_rate': stats['ron'] / games,
+        'draw_rate': stats['draws'] / games,
+        'claims_per_hand': {kind: stats['claims'][kind] / games for kind in CLAIM_KINDS},
+        'draw_tenpai_rate': stats['draw_tenpai'] / stats['draw_players'] if stats['draw_players'] else 0.0,
+    }
+
+
+def format_report(stats):
+    data = summarize(stats)
+    lines = [f"对局数: {data['games']}"]
+    for title, group in (('座位', data['seats']), ('策略', data['strategies'])):
+        for name, r in group.items():
+            low, high = r['win_rate_ci95']
+            lines.append(
+                f"{title}{name}: {r['games']}局, 胜率 {r['win_rate']:.2%} (95%CI {low:.2%}-{high:.2%}), "
+                f"放铳率 {r['deal_in_rate']:.2%}"
+            )
+    lines.append(
+        f"自摸 {data['tsumo_rate']:.2%}, 荣和 {data['ron_rate']:.2%}, 流局 {data['draw_rate']:.2%}, "
+        f"平均巡数 {data['avg_turns']:.1f}"
+    )
+    claims = data['claims_per_hand']
+    lines.append(f"每局鸣牌: 吃 {claims['chi']:.2f}, 碰 {claims['peng']:.2f}, 杠 {claims['gang']:.2f}")
+    lines.append(f"流局时听牌率: {data['draw_tenpai_rate']:.2%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='牌谱统计')
+    parser.add_argument('paths', nargs='*', default=[LOG_DIR], help='牌谱目录或文件（默认log/）')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认CPU核数）')
+    parser.add_argument('--cache', default=None, help=f'缓存文件（默认为第一个目录下的{CACHE_NAME}）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用缓存')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+    args = parser.parse_args(argv)
+
+    cache_path = None
+    if not args.no_cache:
+        cache_path = args.cache
+        if cache_path is None:
+            directory = next((p for p in args.paths if os.path.isdir(p)), None)
+            cache_path = os.path.join(directory, CACHE_NAME) if directory else None
+
+    stats, processed = collect_stats(args.paths, args.workers, cache_path)
+    print(f"处理了 {processed} 个新的或有变化的文件", file=sys.stderr)
+    if args.json:
+        print(json.dumps(summarize(stats), ensure_ascii=False, indent=2))
+    else:
+        print(format_report(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,166 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGridLayout
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPainter, QColor, QPen
+# 图形界面
+# 牌面按牌和尺寸绘制一次后缓存（tile_pixmap）。手牌和面子是一排按钮，按钮放在池中
+# 重复使用，每次只改变内容变化的位置；四家的牌河是一个自绘部件，新打出的牌只
+# 重绘它所在的格子。电脑的定时器只在轮到电脑决策时运行，等待玩家操作或旁观的
+# 窗口不刷新时不占CPU。
+#
+# 用法：python mahjong_gui.py            （玩家对三个电脑）
+#       python mahjong_gui.py --spectate （旁观四个电脑对局）
+
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+from PyQt5.QtCore import Qt, QTimer, QRect, QSize
+from PyQt5.QtGui import QFont, QPainter, QColor, QPen, QPixmap, QIcon
 import sys
-from player_class import MahjongGame, Player
+from player_class import MahjongGame
+from tiles import tile_name, TILE_GROUP
+
+HAND_TILE_SIZE = (40, 60)
+DISCARD_TILE_SIZE = (30, 45)
+TILE_COLORS = ('#1B7F3B', '#1F4E9E', '#B22222', '#222222')  # 条、筒、万、字牌的文字颜色
+
+_pixmaps = {}
+_icons = {}
+
+
+def tile_pixmap(tile, width, height):
+    """牌面图，按(牌, 尺寸)缓存，每种只绘制一次"""
+    key = (tile, width, height)
+    pixmap = _pixmaps.get(key)
+    if pixmap is None:
+        pixmap = QPixmap(width, height)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor('#4A4A4A'), 1))
+        painter.setBrush(QColor('white'))
+        painter.drawRoundedRect(0, 0, width - 1, height - 1, 4, 4)
+        font = QFont()
+        font.setPixelSize(max(10, width * 2 // 5))
+        painter.setFont(font)
+        painter.setPen(QColor(TILE_COLORS[TILE_GROUP[tile]]))
+        painter.drawText(pixmap.rect(), Qt.AlignCenter | Qt.TextWordWrap, tile_name(tile))
+        painter.end()
+        _pixmaps[key] = pixmap
+    return pixmap
+
+
+def tile_icon(tile, width, height):
+    key = (tile, width, height)
+    icon = _icons.get(key)
+    if icon is None:
+        icon = _icons[key] = QIcon(tile_pixmap(tile, width, height))
+    return icon
+
+
+class TileRow(QWidget):
+    """一排牌（手牌或面子）：按钮池中的按钮重复使用，只更新内容变化的位置"""
+
+    def __init__(self, size, on_click=None):
+        super().__init__()
+        self.tile_size = size
+        self.on_click = on_click
+        self.buttons = []
+        self.tiles = []  # 每个按钮当前显示的牌，隐藏的按钮为None
+        self.row_layout = QHBoxLayout(self)
+        self.row_layout.setSpacing(2)
+        self.row_layout.addStretch()
+
+    def _new_button(self):
+        index = len(self.buttons)
+        width, height = self.tile_size
+        button = QPushButton()
+        button.setFixedSize(width, height)
+        button.setIconSize(QSize(width, height))
+        button.setStyleSheet('padding: 0px; min-width: 0px; border: none;')
+        if self.on_click is not None:
+            button.clicked.connect(lambda checked, i=index: self.on_click(self.tiles[i]))
+        else:
+            button.setEnabled(False)
+        self.row_layout.insertWidget(index, button)
+        self.buttons.append(button)
+        self.tiles.append(None)
+        return button
+
+    def set_tiles(self, tiles):
+        for i, tile in enumerate(tiles):
+            button = self.buttons[i] if i < len(self.buttons) else self._new_button()
+            if self.tiles[i] != tile:
+                button.setIcon(tile_icon(tile, *self.tile_size))
+                self.tiles[i] = tile
+            if button.isHidden():
+                button.show()
+        for i in range(len(tiles), len(self.buttons)):
+            if self.tiles[i] is not None:
+                self.buttons[i].hide()
+                self.tiles[i] = None
+
+
+class DiscardRiver(QWidget):
+    """四家的牌河（自绘）：每家占LINES行，新打出的牌只重绘它所在的格子"""
+
+    COLUMNS = 18
+    LINES = 2
+    GAP = 2
+
+    def __init__(self, seats):
+        super().__init__()
+        self.rows = [[] for _ in range(seats)]
+        width, height = DISCARD_TILE_SIZE
+        self.setMinimumSize(self.COLUMNS * (width + self.GAP),
+                            seats * self.LINES * (height + self.GAP) + seats * self.GAP * 3)
+
+    def _cell(self, seat, index):
+        width, height = DISCARD_TILE_SIZE
+        line = seat * self.LINES + index // self.COLUMNS
+        return QRect((index % self.COLUMNS) * (width + self.GAP),
+                     line * (height + self.GAP) + seat * self.GAP * 3, width, height)
+
+    def append(self, seat, tile):
+        self.rows[seat].append(tile)
+        self.update(self._cell(seat, len(self.rows[seat]) - 1))
+
+    def set_rows(self, rows):
+        """整体替换（开局、悔棋）"""
+        self.rows = [list(row) for row in rows]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        clip = event.rect()
+        for seat, row in enumerate(self.rows):
+            for index, tile in enumerate(row):
+                cell = self._cell(seat, index)
+                if cell.intersects(clip):
+                    painter.drawPixmap(cell.topLeft(), tile_pixmap(tile, *DISCARD_TILE_SIZE))
+        painter.end()
+
+
+def _set_text(label, text):
+    # 文字没变时不触发重绘
+    if label.text() != text:
+        label.setText(text)
+
 
 class MahjongUI(QMainWindow):
-    def __init__(self):
+    def __init__(self, spectator=False):
         super().__init__()
-        self.setWindowTitle('日本麻将')
+        self.setWindowTitle('日本麻将（旁观）' if spectator else '日本麻将')
         self.setGeometry(100, 100, 1200, 800)
         
-        # 创建游戏实例
-        self.game = MahjongGame(human_players=1, ai_players=3, show_ai_cards=True)
-        self.current_player = 0  # 当前玩家索引
+        # 创建游戏实例，界面作为引擎的事件接收方，并负责驱动引擎
+        # 旁观时四个座位都是电脑，下方显示座位0的手牌
+        self.human_seat = None if spectator else 0
+        if spectator:
+            self.game = MahjongGame(human_players=0, ai_players=4, show_ai_cards=True,
+                                    event_sink=self.on_game_event)
+        else:
+            self.game = MahjongGame(human_players=1, ai_players=3, show_ai_cards=True,
+                                    strategies=[None, 'advanced', 'advanced', 'advanced'],
+                                    event_sink=self.on_game_event)
+        self.engine = None  # 引擎生成器
+        self.decision = None  # 引擎当前等待的决策点
         self.selected_tile = None  # 当前选中的牌
-        self.waiting_action = None  # 等待的动作（吃/碰/杠/和）
-        self.last_discarded = None  # 最后打出的牌
-        self.last_discard_player = None  # 最后打出牌的玩家
+        self.undo_stack = []  # 玩家每次打牌决策点的对局快照，用于悔棋
         
         # 创建中央部件
         central_widget = QWidget()
@@ -40,7 +184,7 @@ class MahjongUI(QMainWindow):
             opponent_layout = QVBoxLayout(opponent_info)
             
             # AI玩家名称
-            name_label = QLabel(f'电脑{i}')
+            name_label = QLabel(self.game.players[i].name)
             name_label.setAlignment(Qt.AlignCenter)
             opponent_layout.addWidget(name_label)
             
@@ -61,14 +205,12 @@ class MahjongUI(QMainWindow):
         center_layout = QVBoxLayout(center_area)
         
         # 创建牌山显示区
-        self.tiles_remaining = QLabel(f'剩余牌数：{len(self.game.tiles)}张')
+        self.tiles_remaining = QLabel(f'剩余牌数：{len(self.game.wall)}张')
         self.tiles_remaining.setAlignment(Qt.AlignCenter)
         center_layout.addWidget(self.tiles_remaining)
         
         # 创建出牌区域
-        self.discard_area = QWidget()
-        self.discard_layout = QGridLayout(self.discard_area)
-        self.discard_layout.setSpacing(5)
+        self.discard_area = DiscardRiver(len(self.game.players))
         center_layout.addWidget(self.discard_area)
         
         # 创建操作按钮区域
@@ -81,6 +223,7 @@ class MahjongUI(QMainWindow):
         self.gang_btn = QPushButton('杠')
         self.hu_btn = QPushButton('和')
         self.pass_btn = QPushButton('过')
+        self.undo_btn = QPushButton('悔棋')
         
         # 连接按钮信号
         self.chi_btn.clicked.connect(self.on_chi_click)
@@ -88,11 +231,14 @@ class MahjongUI(QMainWindow):
         self.gang_btn.clicked.connect(self.on_gang_click)
         self.hu_btn.clicked.connect(self.on_hu_click)
         self.pass_btn.clicked.connect(self.on_pass_click)
+        self.undo_btn.clicked.connect(self.on_undo_click)
         
         # 添加按钮到布局
         for btn in [self.chi_btn, self.peng_btn, self.gang_btn, self.hu_btn, self.pass_btn]:
             action_layout.addWidget(btn)
             btn.setEnabled(False)  # 初始状态下禁用所有按钮
+        action_layout.addWidget(self.undo_btn)
+        self.undo_btn.setEnabled(False)
         
         center_layout.addWidget(action_area)
         game_layout.addWidget(center_area)
@@ -102,18 +248,14 @@ class MahjongUI(QMainWindow):
         player_layout = QVBoxLayout(player_area)
         
         # 玩家信息
-        self.player_info = QLabel('玩家')
+        self.player_info = QLabel(self.game.players[0].name)
         self.player_info.setAlignment(Qt.AlignCenter)
         player_layout.addWidget(self.player_info)
         
-        # 玩家手牌
-        self.hand_widget = QWidget()
-        self.hand_layout = QHBoxLayout(self.hand_widget)
-        self.hand_layout.setSpacing(2)
-        
-        # 更新手牌显示
-        self.update_hand_display()
-        
+        # 玩家的面子和手牌
+        self.meld_widget = TileRow(DISCARD_TILE_SIZE)
+        player_layout.addWidget(self.meld_widget)
+        self.hand_widget = TileRow(HAND_TILE_SIZE, None if spectator else self.on_tile_click)
         player_layout.addWidget(self.hand_widget)
         game_layout.addWidget(player_area)
         
@@ -149,229 +291,166 @@ class MahjongUI(QMainWindow):
             }
         """)
         
-        # 启动AI定时器
+        # AI定时器：只在轮到电脑决策时运行（见resume）
         self.ai_timer = QTimer()
+        self.ai_timer.setInterval(1000)  # 电脑每秒打一张牌
         self.ai_timer.timeout.connect(self.handle_ai_turn)
-        self.ai_timer.start(1000)  # 每秒检查一次
         
         # 开始游戏
         self.start_game()
     
     def update_hand_display(self):
-        # 清除现有手牌显示
-        while self.hand_layout.count():
-            item = self.hand_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # 添加新的手牌按钮
-        for tile in sorted(self.game.players[0].hand):
-            tile_btn = QPushButton(self.get_tile_display(tile))
-            tile_btn.setFixedSize(40, 60)
-            tile_btn.clicked.connect(lambda checked, t=tile: self.on_tile_click(t))
-            self.hand_layout.addWidget(tile_btn)
+        # 按钮池只更新变化的位置
+        player = self.game.players[0]
+        self.hand_widget.set_tiles(sorted(player.hand))
+        self.meld_widget.set_tiles([tile for _, tiles in player.melds for tile in tiles])
     
     def update_discard_area(self):
-        # 清除现有出牌区域
-        while self.discard_layout.count():
-            item = self.discard_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # 显示每个玩家的出牌
-        for player_idx in range(4):
-            discards = self.game.players[player_idx].discards
-            row = player_idx
-            for col, tile in enumerate(discards):
-                tile_btn = QPushButton(self.get_tile_display(tile))
-                tile_btn.setFixedSize(30, 45)
-                tile_btn.setEnabled(False)
-                self.discard_layout.addWidget(tile_btn, row, col)
+        # 整体重绘牌河（开局、悔棋时），平时由on_game_event逐张追加
+        self.discard_area.set_rows(p.discards for p in self.game.players)
+    
+    def update_labels(self):
+        # 更新对手手牌数量和牌山剩余数量
+        for i, label in enumerate(self.opponent_labels):
+            _set_text(label, f'手牌: {len(self.game.players[i+1].hand)}张')
+        _set_text(self.tiles_remaining, f'剩余牌数：{len(self.game.wall)}张')
+    
+    def on_game_event(self, game, event):
+        # 引擎事件：只刷新受影响的部分
+        if event.kind in ('draw', 'discard', 'chi', 'peng', 'gang'):
+            if event.seat == 0:
+                self.update_hand_display()
+            if event.kind == 'discard':
+                self.discard_area.append(event.seat, event.tile)
+            self.update_labels()
+        elif event.kind in ('ron', 'tsumo'):
+            verb = '自摸和牌' if event.kind == 'tsumo' else '和牌'
+            self.player_info.setText(f'{game.players[event.seat].name} {verb}！')
+        elif event.kind == 'end':
+            if event.info is None:
+                self.player_info.setText('牌山已空，流局！')
+            self.ai_timer.stop()
+    
+    def resume(self, answer):
+        # 把选择交给引擎，推进到下一个决策点
+        try:
+            self.decision = self.engine.send(answer)
+        except StopIteration:
+            self.decision = None
+        # 只在轮到电脑时运行定时器
+        if self.decision is not None and self.decision.seat != self.human_seat:
+            if not self.ai_timer.isActive():
+                self.ai_timer.start()
+        else:
+            self.ai_timer.stop()
+        self.set_action_buttons()
+    
+    def set_action_buttons(self):
+        # 根据当前决策点设置操作按钮
+        decision = self.decision
+        actions = set()
+        if decision is not None and decision.seat == self.human_seat and decision.options:
+            actions = {action for action, _ in decision.options}
+        self.chi_btn.setEnabled('chi' in actions)
+        self.peng_btn.setEnabled('peng' in actions)
+        self.gang_btn.setEnabled('gang' in actions)
+        self.hu_btn.setEnabled('hu' in actions)
+        self.pass_btn.setEnabled('pass' in actions)
+        at_discard = self._human_discard()
+        if at_discard:
+            self.player_info.setText('玩家：请出牌（再次点击同一张牌打出）')
+            # 记下这个决策点，悔棋时回到上一个
+            self.undo_stack.append(self.game.snapshot())
+        # 只在玩家自己打牌时可以悔棋
+        self.undo_btn.setEnabled(at_discard and len(self.undo_stack) >= 2)
+
+    def _human_discard(self):
+        # 引擎当前是否在等玩家打牌（undo_stack的栈顶就是这个决策点）
+        decision = self.decision
+        return decision is not None and decision.seat == self.human_seat and decision.kind == 'discard'
+    
+    def answer(self, action):
+        # 人类玩家选择一个操作（有多个同类选项时取第一个）
+        decision = self.decision
+        if decision is None or decision.seat != self.human_seat or not decision.options:
+            return
+        for option in decision.options:
+            if option[0] == action:
+                self.resume(option)
+                return
     
     def on_tile_click(self, tile):
-        if self.current_player != 0 or self.waiting_action:
-            return  # 不是玩家的回合或正在等待其他操作
+        decision = self.decision
+        if decision is None or decision.seat != self.human_seat or decision.kind != 'discard':
+            return  # 不是玩家出牌的时候
         
         if self.selected_tile == tile:
             # 再次点击同一张牌表示打出
-            self.game.players[0].discard_tile(tile)
             self.selected_tile = None
-            self.update_hand_display()
-            self.update_discard_area()
-            self.last_discarded = tile
-            self.last_discard_player = 0
-            self.current_player = 1  # 轮到下一个玩家
+            self.player_info.setText('玩家')
+            self.resume(('discard', tile))
         else:
             # 选中牌
             self.selected_tile = tile
     
     def handle_ai_turn(self):
-        if self.current_player == 0 or self.waiting_action:
-            return  # 不是AI的回合或正在等待操作
-        
-        # AI执行打牌
-        player = self.game.players[self.current_player]
-        discarded_tile = player.auto_discard()
-        
-        # 更新界面
-        self.opponent_labels[self.current_player-1].setText(f'手牌: {len(player.hand)}张')
-        self.update_discard_area()
-        
-        # 设置最后打出的牌信息
-        self.last_discarded = discarded_tile
-        self.last_discard_player = self.current_player
-        
-        # 检查其他玩家是否可以吃碰杠和
-        self.check_player_actions()
-        
-        # 如果没有等待操作，轮到下一个玩家
-        if not self.waiting_action:
-            self.current_player = (self.current_player + 1) % 4
+        # 电脑的吃碰杠和响应立即处理，电脑打牌每次定时器触发只处理一次
+        while self.decision is not None and self.decision.seat != self.human_seat:
+            decision = self.decision
+            self.resume(self.game.strategies[decision.seat](self.game, decision))
+            if decision.kind == 'discard':
+                break
     
-    def check_player_actions(self):
-        if self.last_discarded is None:
+    def undo(self):
+        # 回到玩家上一次打牌之前：恢复快照，从打牌这一步重新启动引擎
+        if self._human_discard():
+            if len(self.undo_stack) < 2:
+                return
+            self.undo_stack.pop()  # 栈顶是当前的决策点
+        elif not self.undo_stack:
             return
-        
-        # 检查玩家是否可以吃碰杠和
-        player = self.game.players[0]
-        can_chi = player.can_chi(self.last_discarded, self.last_discard_player, 0)
-        can_peng = player.can_peng(self.last_discarded)
-        can_gang = player.can_gang(self.last_discarded)
-        
-        # 更新按钮状态
-        self.chi_btn.setEnabled(bool(can_chi))
-        self.peng_btn.setEnabled(can_peng)
-        self.gang_btn.setEnabled(can_gang)
-        self.pass_btn.setEnabled(True)
-        
-        if can_chi or can_peng or can_gang:
-            self.waiting_action = True
-    
+        # 恢复后重新到达这个决策点时会再次入栈
+        self.game.restore(self.undo_stack.pop())
+        self.game.pending_draw = None  # 牌已经摸过了，重新启动后直接打牌
+        self.engine.close()
+        self.engine = self.game.run()
+        self.selected_tile = None
+        self.update_hand_display()
+        self.update_discard_area()
+        self.update_labels()
+        self.resume(None)
+
     def start_game(self):
-        # 初始化游戏状态
-        self.current_player = 0
+        # 初始化游戏状态并启动引擎
         self.selected_tile = None
-        self.waiting_action = None
-        self.last_discarded = None
-        self.last_discard_player = None
-        
-        # 更新界面
+        self.undo_stack = []
         self.update_hand_display()
         self.update_discard_area()
-        self.tiles_remaining.setText(f'剩余牌数：{len(self.game.tiles)}张')
+        self.update_labels()
+        self.engine = self.game.run()
+        self.resume(None)
     
-    def get_tile_display(self, tile):
-
-        # 转换牌代码为显示字符
-        if len(tile) != 2:
-            # 处理特殊字牌
-            zi_map = {'e':'东', 's':'南', 'w':'西', 'n':'北', 'z':'中', 'f':'发', 'b':'白'}
-            return zi_map.get(tile, tile)
-        
-        tile_type = tile[0]  # 获取牌的数字
-        tile_suit = tile[1]  # 获取牌的类型
-        
-        if tile_suit == 'm':
-            return f'{tile_type}万'
-        elif tile_suit == 't':
-            return f'{tile_type}条'
-        elif tile_suit == 'p':
-            return f'{tile_type}筒'
-        return tile
-
     def on_chi_click(self):
-        if not self.waiting_action or not self.last_discarded:
-            return
-        
-        # 获取吃牌选项
-        player = self.game.players[0]
-        chi_options = player.can_chi(self.last_discarded, self.last_discard_player, 0)
-        
-        if chi_options:
-            # 执行吃牌操作
-            player.perform_chi(self.last_discarded, chi_options[0])
-            
-            # 更新界面
-            self.update_hand_display()
-            self.update_discard_area()
-            
-            # 重置状态
-            self.waiting_action = None
-            self.last_discarded = None
-            self.last_discard_player = None
-            self.current_player = 0
-            
-            # 禁用所有操作按钮
-            for btn in [self.chi_btn, self.peng_btn, self.gang_btn, self.hu_btn, self.pass_btn]:
-                btn.setEnabled(False)
+        self.answer('chi')
     
     def on_peng_click(self):
-        if not self.waiting_action or not self.last_discarded:
-            return
-        
-        player = self.game.players[0]
-        if player.can_peng(self.last_discarded):
-            # 执行碰牌操作
-            player.perform_peng(self.last_discarded)
-            
-            # 更新界面
-            self.update_hand_display()
-            self.update_discard_area()
-            
-            # 重置状态
-            self.waiting_action = None
-            self.last_discarded = None
-            self.last_discard_player = None
-            self.current_player = 0
-            
-            # 禁用所有操作按钮
-            for btn in [self.chi_btn, self.peng_btn, self.gang_btn, self.hu_btn, self.pass_btn]:
-                btn.setEnabled(False)
+        self.answer('peng')
     
     def on_gang_click(self):
-        if not self.waiting_action or not self.last_discarded:
-            return
-        
-        player = self.game.players[0]
-        if player.can_gang(self.last_discarded):
-            # 执行杠牌操作
-            player.perform_gang(self.last_discarded)
-            
-            # 更新界面
-            self.update_hand_display()
-            self.update_discard_area()
-            
-            # 重置状态
-            self.waiting_action = None
-            self.last_discarded = None
-            self.last_discard_player = None
-            self.current_player = 0
-            
-            # 禁用所有操作按钮
-            for btn in [self.chi_btn, self.peng_btn, self.gang_btn, self.hu_btn, self.pass_btn]:
-                btn.setEnabled(False)
+        self.answer('gang')
     
     def on_hu_click(self):
-        # 和牌功能待实现
-        pass
+        self.answer('hu')
     
     def on_pass_click(self):
-        if not self.waiting_action:
-            return
-        
-        # 重置状态
-        self.waiting_action = None
-        
-        # 禁用所有操作按钮
-        for btn in [self.chi_btn, self.peng_btn, self.gang_btn, self.hu_btn, self.pass_btn]:
-            btn.setEnabled(False)
-        
-        # 轮到下一个玩家
-        self.current_player = (self.last_discard_player + 1) % 4
+        self.answer('pass')
+
+    def on_undo_click(self):
+        self.undo()
 
 def main():
     app = QApplication(sys.argv)
-    window = MahjongUI()
+    window = MahjongUI(spectator='--spectate' in sys.argv)
     window.show()
     sys.exit(app.exec_())
 
@@ -1,4 +1,5 @@
 import player_class
+from console_ui import ConsoleEventSink
 import sys
 import os
 
@@ -81,8 +82,11 @@ def main():
             print_game_title()
             print("\n开始新游戏...")
             human_players, ai_players, show_ai_cards = select_players()
-            game = player_class.MahjongGame(human_players=human_players, ai_players=ai_players, show_ai_cards=show_ai_cards)
-            game.play()
+            game = player_class.MahjongGame(human_players=human_players, ai_players=ai_players,
+                                            show_ai_cards=show_ai_cards, event_sink=ConsoleEventSink())
+            path = game.open_log()
+            game.play(save_log=True)
+            print(f"牌谱已保存至：{path}")
             input("\n按Enter键返回主菜单...")
             clear_screen()
             print_game_title()
@@ -1,29 +1,33 @@
 import random
 import os
+from array import array
+from collections import namedtuple
 from datetime import datetime
 
-# 生成麻将牌
-def generate_tiles():
-    tiles = []
-    for suit in ['m', 't', 'p']:
-        for num in range(1, 10):
-            tiles.extend([f"{num}{suit}"] * 4)
-    for zi in ['e', 's', 'w', 'n', 'z', 'f', 'b']:
-        tiles.extend([zi] * 4)
-    random.shuffle(tiles)
+from tiles import (
+    NUM_TILE_TYPES, HONOR_START, TILE_CODES, TILE_NAMES, TILE_GROUP, GROUP_NAMES,
+    full_set, is_suited, counts_of,
+)
+from agari import is_agari, winning_tiles
+from wall import Wall
+from table_info import TableInfo
+from game_log import GameLogWriter
+from ai_strategy import AdvancedAI
+from strategies import Strategy, create_strategy
+
+# 牌谱保存目录
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log")
+
+# 生成麻将牌（牌编号列表，见 tiles.py）
+def generate_tiles(rng=random):
+    tiles = full_set()
+    rng.shuffle(tiles)
     return tiles
 
 # 排序手牌
 def sort_hand(hand):
-    def sort_key(tile):
-        if tile[-1] in ['m', 't', 'p']:
-            suit_order = {'t':0, 'p':1, 'm':2}  # 调整为条、筒、万的顺序
-            num = int(tile[:-1])
-            return (suit_order[tile[-1]], num)
-        else:
-            zi_order = {'e':0, 's':1, 'w':2, 'n':3, 'z':4, 'f':5, 'b':6}
-            return (3, zi_order.get(tile, 7))
-    return sorted(hand, key=sort_key)
+    # 牌编号本身就是按条、筒、万、字牌的顺序排列的
+    return sorted(hand)
 
 # 显示手牌
 def display_hand(hand, player_name):
@@ -32,150 +36,213 @@ def display_hand(hand, player_name):
     display_lines = []
     
     for tile in sorted_hand:
-        if tile[-1] in ['m', 't', 'p']:
-            suit = tile[-1]
-            prefix = {'m': '万', 't': '条', 'p': '筒'}[suit]
-            name = f"{tile[:-1]}{prefix}"
-            tile_type = prefix
-        else:
-            zi_map = {'e':'东', 's':'南', 'w':'西', 'n':'北', 'z':'中', 'f':'发', 'b':'白'}
-            name = f"{zi_map[tile]}"
-            tile_type = '字牌'
+        tile_type = GROUP_NAMES[TILE_GROUP[tile]]
         
         if tile_type != current_type:
             current_type = tile_type
             display_lines.append(f"\n{current_type}: ")
         
-        display_lines[-1] += f"{name}({tile}) "
+        display_lines[-1] += f"{TILE_NAMES[tile]}({TILE_CODES[tile]}) "
     
     print(f"{player_name}手牌：" + "".join(display_lines).strip())
 
+# 别人打出某种牌时可以进行的操作（Player.claim_index中的位）
+CLAIM_HU = 1
+CLAIM_GANG = 2
+CLAIM_PENG = 4
+CLAIM_CHI_LOW = 8    # 这张牌是顺子中最小的一张
+CLAIM_CHI_MID = 16
+CLAIM_CHI_HIGH = 32
+CLAIM_CHI = CLAIM_CHI_LOW | CLAIM_CHI_MID | CLAIM_CHI_HIGH
+
+# 鸣牌的优先级：和 > 杠、碰 > 吃
+CLAIM_PRIORITY = {'hu': 3, 'gang': 2, 'peng': 2, 'chi': 1, 'pass': 0}
+
+# 亮出的面子（不可变）：kind为chi / peng / gang，tiles为从小到大排列的元组
+Meld = namedtuple('Meld', ['kind', 'tiles'])
+
+# 玩家状态的快照，各字段与Player的同名属性共享同一个对象
+PlayerSnapshot = namedtuple('PlayerSnapshot', ['hand', 'counts', 'discards', 'melds', 'waits'])
+
+
 class Player:
+    # 手牌和牌河是紧凑的字节数组，面子是Meld的元组（变化时整体替换）。
+    # snapshot()不复制任何东西，只是把当前的数组标记为共享，之后第一次修改
+    # 手牌或牌河时才复制（写时复制），所以快照的成本只与之后改变了的玩家有关。
+    __slots__ = ('name', 'is_computer', 'hand', 'counts', 'discards', 'melds', '_waits', '_claims', '_shared')
+
     def __init__(self, name, is_computer=False):
-        self.hand = []
+        self.hand = array('B')
+        self.counts = [0] * NUM_TILE_TYPES  # 手牌计数数组，与hand保持同步
         self.name = name
         self.is_computer = is_computer
-        self.discards = []
-        self.melds = []  # 吃、碰、杠的组合
+        self.discards = array('B')
+        self.melds = ()  # 吃、碰、杠的组合（Meld的元组）
+        self._waits = None  # 听牌集合缓存，手牌或面子变化时失效
+        self._claims = None  # 鸣牌索引缓存（claim_index），同上
+        self._shared = False  # hand、counts、discards是否被快照引用
+
+    def _own(self):
+        """修改手牌或牌河之前调用：数组被快照引用时先复制一份"""
+        if self._shared:
+            self.hand = array('B', self.hand)
+            self.counts = list(self.counts)
+            self.discards = array('B', self.discards)
+            self._shared = False
+
+    def snapshot(self):
+        """返回当前状态的快照（O(1)，之后的修改不会影响它）"""
+        self._shared = True
+        return PlayerSnapshot(self.hand, self.counts, self.discards, self.melds, self._waits)
+
+    def restore(self, snapshot):
+        """恢复到snapshot时的状态（O(1)，快照可以反复恢复）"""
+        self.hand, self.counts, self.discards, self.melds, self._waits = snapshot
+        self._claims = None
+        self._shared = True
+
+    def _take(self, tile, n=1):
+        """从手牌中移除n张指定的牌"""
+        self._own()
+        for _ in range(n):
+            self.hand.remove(tile)
+        self.counts[tile] -= n
+        self._waits = None
+        self._claims = None
 
     def draw_tile(self, tile):
+        self._own()
         self.hand.append(tile)
+        self.counts[tile] += 1
+        self._waits = None
+        self._claims = None
+
+    @property
+    def waits(self):
+        """当前听的牌（编号集合），未听牌时为空集合"""
+        if self._waits is None:
+            self._waits = winning_tiles(self.counts, len(self.melds))
+        return self._waits
+
+    @property
+    def claim_index(self):
+        """每种牌被别人打出时可以进行的操作（34格的CLAIM_*位掩码）
+
+        手牌变化后第一次使用时计算，之后其他玩家每次打牌都只需查一格。
+        吃是否可行还要看打牌者是不是上家，由调用方判断。
+        """
+        if self._claims is None:
+            counts = self.counts
+            index = [0] * NUM_TILE_TYPES
+            for tile in self.waits:
+                index[tile] |= CLAIM_HU
+            for tile in range(NUM_TILE_TYPES):
+                if counts[tile] >= 3:
+                    index[tile] |= CLAIM_GANG | CLAIM_PENG
+                elif counts[tile] == 2:
+                    index[tile] |= CLAIM_PENG
+            for tile in range(HONOR_START):
+                num = tile % 9
+                if num >= 2 and counts[tile-2] and counts[tile-1]:
+                    index[tile] |= CLAIM_CHI_HIGH
+                if 1 <= num <= 7 and counts[tile-1] and counts[tile+1]:
+                    index[tile] |= CLAIM_CHI_MID
+                if num <= 6 and counts[tile+1] and counts[tile+2]:
+                    index[tile] |= CLAIM_CHI_LOW
+            self._claims = index
+        return self._claims
+
+    def is_tenpai(self):
+        """是否听牌"""
+        return bool(self.waits)
+
+    def can_ron(self, tile):
+        """检查是否可以和别人打出的牌"""
+        return tile in self.waits
 
     def discard_tile(self, tile):
-        self.hand.remove(tile)
+        self._take(tile)
         self.discards.append(tile)
         return tile
 
-    def auto_discard(self):
-        # 使用高级AI策略选择要丢弃的牌
-        try:
-            from ai_strategy import AdvancedAI
-            discard_tile = AdvancedAI.select_discard_tile(self.hand)
-            return self.discard_tile(discard_tile)
-        except ImportError:
-            # 如果高级AI模块不可用，使用简单策略
-            sorted_hand = sort_hand(self.hand)
-            
-            # 统计各牌数量
-            count = {}
-            for tile in sorted_hand:
-                count[tile] = count.get(tile, 0) + 1
-            
-            # 寻找孤张字牌
-            for tile in sorted_hand:
-                if tile in ['e','s','w','n','z','f','b'] and count[tile] == 1:
-                    return self.discard_tile(tile)
-            
-            # 寻找边张（1和9）
-            for tile in sorted_hand:
-                if tile[-1] in ['m','t','p']:
-                    num = int(tile[:-1])
-                    if num == 1 or num == 9:
-                        return self.discard_tile(tile)
-            
-            # 随机丢弃
-            return self.discard_tile(random.choice(sorted_hand))
+    def choose_discard(self, visible=None):
+        """选择要丢弃的牌（不执行），visible为场上看得见的牌的计数数组"""
+        return AdvancedAI.select_discard_tile(self.counts, len(self.melds), visible)
+
+    def auto_discard(self, visible=None):
+        """自动选择并丢弃一张牌"""
+        return self.discard_tile(self.choose_discard(visible))
     
     def can_chi(self, tile, discarder_idx=None, current_idx=None):
         """检查是否可以吃牌"""
         # 只有数牌可以吃，且只能吃上家的牌
-        if tile[-1] not in ['m', 't', 'p'] or discarder_idx is None or current_idx is None:
+        if not is_suited(tile) or discarder_idx is None or current_idx is None:
             return []
         
         # 检查是否为上家关系
         if (discarder_idx + 1) % 4 != current_idx:
             return []
             
-        suit = tile[-1]
-        num = int(tile[:-1])
+        counts = self.counts
+        num = tile % 9  # 0-8
         options = []
         
         # 检查是否有连续的牌可以吃
         # 例如，对于5m，检查是否有3m+4m, 4m+6m, 或6m+7m
-        if num >= 3:
-            if f"{num-2}{suit}" in self.hand and f"{num-1}{suit}" in self.hand:
-                options.append([f"{num-2}{suit}", f"{num-1}{suit}", tile])
+        if num >= 2 and counts[tile-2] and counts[tile-1]:
+            options.append([tile-2, tile-1, tile])
         
-        if num >= 2 and num <= 8:
-            if f"{num-1}{suit}" in self.hand and f"{num+1}{suit}" in self.hand:
-                options.append([f"{num-1}{suit}", tile, f"{num+1}{suit}"])
+        if 1 <= num <= 7 and counts[tile-1] and counts[tile+1]:
+            options.append([tile-1, tile, tile+1])
         
-        if num <= 7:
-            if f"{num+1}{suit}" in self.hand and f"{num+2}{suit}" in self.hand:
-                options.append([tile, f"{num+1}{suit}", f"{num+2}{suit}"])
+        if num <= 6 and counts[tile+1] and counts[tile+2]:
+            options.append([tile, tile+1, tile+2])
         
         return options
     
     def can_peng(self, tile):
         """检查是否可以碰牌"""
-        return self.hand.count(tile) >= 2
+        return self.counts[tile] >= 2
     
     def can_gang(self, tile):
         """检查是否可以杠牌"""
-        return self.hand.count(tile) >= 3
+        return self.counts[tile] >= 3
     
     def can_self_gang(self):
         """检查是否可以自摸杠（包括暗杠和加杠）"""
         # 检查暗杠（手牌中有四张相同的牌）
-        counts = {}
-        for t in self.hand:
-            counts[t] = counts.get(t, 0) + 1
-        dark_gang = [t for t, count in counts.items() if count == 4]
+        counts = self.counts
+        dark_gang = [t for t in range(NUM_TILE_TYPES) if counts[t] == 4]
         
         # 检查加杠（已经碰过的牌，手上有第四张）
         add_gang = []
         for meld_type, tiles in self.melds:
             if meld_type == 'peng':
                 tile = tiles[0]  # 碰的三张牌都是相同的，取第一张
-                if tile in self.hand:
+                if counts[tile]:
                     add_gang.append(tile)
         
         return dark_gang + add_gang
 
     def perform_chi(self, tile, option):
         """执行吃牌操作"""
-        # 移除手牌中用于吃的两张牌
-        for t in option[:2]:  # 只移除前两张，第三张是被吃的牌
-            if t in self.hand:  # 确保牌在手牌中
-                self.hand.remove(t)
+        # 移除手牌中用于吃的两张牌（option中除被吃的牌以外的两张）
+        for t in option:
+            if t != tile:
+                self._take(t)
         
         # 添加吃的组合到玩家的面子中
-        # 确保不重复添加被吃的牌
-        if tile not in option:
-            self.melds.append(('chi', option + [tile]))
-        else:
-            self.melds.append(('chi', option))
+        self.melds += (Meld('chi', tuple(sorted(option))),)
         
         return True
     
     def perform_peng(self, tile):
         """执行碰牌操作"""
         # 移除手牌中的两张相同牌
-        for _ in range(2):
-            self.hand.remove(tile)
+        self._take(tile, 2)
         
         # 添加碰的组合到玩家的面子中
-        self.melds.append(('peng', [tile, tile, tile]))
+        self.melds += (Meld('peng', (tile, tile, tile)),)
         
         return True
     
@@ -183,26 +250,48 @@ class Player:
         """执行杠牌操作"""
         if is_add_gang:
             # 加杠，移除手牌中的一张牌，并将碰变成杠
-            self.hand.remove(tile)
-            for i, (meld_type, tiles) in enumerate(self.melds):
-                if meld_type == 'peng' and tiles[0] == tile:
-                    self.melds[i] = ('gang', [tile, tile, tile, tile])
-                    break
+            self._take(tile)
+            self.melds = tuple(Meld('gang', (tile,) * 4) if meld == ('peng', (tile,) * 3) else meld
+                               for meld in self.melds)
         elif is_self_gang:
             # 暗杠，移除手牌中的四张相同牌
-            for _ in range(4):
-                self.hand.remove(tile)
-            self.melds.append(('gang', [tile, tile, tile, tile]))
+            self._take(tile, 4)
+            self.melds += (Meld('gang', (tile,) * 4),)
         else:
             # 明杠，移除手牌中的三张相同牌
-            for _ in range(3):
-                self.hand.remove(tile)
-            self.melds.append(('gang', [tile, tile, tile, tile]))
+            self._take(tile, 3)
+            self.melds += (Meld('gang', (tile,) * 4),)
         
         return True
 
+# 引擎向外发出的事件，交给event_sink做显示（命令行、图形界面等）
+# kind: start / draw / discard / chi / peng / gang / tsumo / ron / skip_tsumo / end
+GameEvent = namedtuple('GameEvent', ['kind', 'seat', 'tile', 'info'])
+
+# 引擎需要玩家做出选择时产出的决策点
+# kind: self（摸牌后的自摸/杠）/ discard（打牌）/ claim（对别人打出的牌吃碰杠和）
+# options为可选的(动作, 参数)列表，discard时为None（手牌中任意一张）
+Decision = namedtuple('Decision', ['kind', 'seat', 'tile', 'options'])
+
+# 对局状态的快照（MahjongGame.snapshot），winner为座位号
+GameSnapshot = namedtuple('GameSnapshot', ['players', 'wall', 'current_player', 'pending_draw', 'last_discarded',
+                                           'last_discarder', 'claimed_counts', 'winner', 'table'])
+
+
 class MahjongGame:
-    def __init__(self, human_players=1, ai_players=3, show_ai_cards=False):
+    def __init__(self, human_players=1, ai_players=3, show_ai_cards=False, strategies=None, event_sink=None,
+                 seed=None):
+        """
+        Args:
+            human_players: 人类玩家数量
+            ai_players: 电脑玩家数量
+            show_ai_cards: 命令行界面是否显示电脑的手牌
+            strategies: 每个座位的策略：注册的策略名（见strategies.py）、Strategy对象，
+                或者回调 strategy(game, decision) -> (动作, 参数)。默认电脑使用
+                'advanced'，人类使用命令行输入
+            event_sink: 事件回调 event_sink(game, event)，为None时不产生任何输出
+            seed: 随机种子，相同的种子（和相同的策略）得到完全相同的对局，默认随机生成
+        """
         # 确保总玩家数不超过4
         total_players = human_players + ai_players
         if total_players > 4:
@@ -216,8 +305,12 @@ class MahjongGame:
         
         # 是否显示电脑牌的信息
         self.show_ai_cards = show_ai_cards
+        self.event_sink = event_sink
         
-        self.tiles = generate_tiles()
+        # 每局独立的随机数生成器：洗牌和电脑的随机决策都使用它
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.wall = Wall(self.rng)
         self.players = []
         
         # 创建人类玩家
@@ -229,613 +322,321 @@ class MahjongGame:
         for i in range(ai_players):
             self.players.append(Player(f"电脑{i+1}", is_computer=True))
         
+        if strategies is None:
+            strategies = ['advanced'] * len(self.players)
+            if human_players:
+                from console_ui import console_decide
+                for i in range(human_players):
+                    strategies[i] = console_decide
+        # 每个座位在这里绑定一次策略对象，之后直接调用
+        self.strategies = []
+        for seat, strategy in enumerate(strategies):
+            if isinstance(strategy, str):
+                strategy = create_strategy(strategy)
+            if isinstance(strategy, Strategy):
+                strategy.bind(self, seat)
+            self.strategies.append(strategy)
+        
         self.current_player = 0
+        self.pending_draw = 'draw'  # 当前玩家回合开始时是否需要摸牌（draw / rinshan / None）
         self.winner = None
-        self.log = []
+        self.log = None  # 牌谱写入器（GameLogWriter），open_log()后才记录
         self.last_discarded = None
         self.last_discarder = None
+        self.claimed_counts = [0] * NUM_TILE_TYPES  # 被吃、碰、杠拿走的弃牌
         
         # 初始发牌
         for _ in range(13):
             for p in self.players:
-                p.draw_tile(self.tiles.pop(0))
-
-    def record_action(self, action_type, player, tile=None):
-        entry = {
-            'time': datetime.now().strftime("%H:%M:%S"),
-            'player': player.name,
-            'player_tiles': player.hand.copy(),  # 保存玩家当前手牌的副本
-            'action': action_type,
-            'tile': self.get_tile_name(tile) if tile else None
-        }
-        self.log.append(entry)
+                p.draw_tile(self.wall.draw())
+        # 场况统计（看不见的牌、危险度），之后随每个事件增量更新
+        self.table = TableInfo([p.counts for p in self.players])
+
+    def open_log(self, path=None):
+        """开始把牌谱以事件流写入文件（默认 log/game_log_时间_种子.jsonl），返回文件路径"""
+        if path is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            filename = f"game_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.seed}.jsonl"
+            path = os.path.join(LOG_DIR, filename)
+        self.log = GameLogWriter(path)
+        self.log.write_header(self)
+        return path
+
+    def close_log(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def record_action(self, kind, seat=None, tile=None, info=None):
+        """把一个事件追加到牌谱"""
+        self.log.write_event(kind, seat, tile, info)
+
+    def _emit(self, kind, seat=None, tile=None, info=None):
+        """更新场况统计、记录牌谱并把事件交给event_sink"""
+        event = GameEvent(kind, seat, tile, info)
+        self.table.apply(event)
+        if self.log is not None:
+            self.record_action(kind, seat, tile, info)
+        if self.event_sink is not None:
+            self.event_sink(self, event)
+
+    def snapshot(self):
+        """对局状态的快照（手牌、面子、牌河、牌山位置和回合状态）
+
+        快照与当前状态共享数据，成本只与之后改变的部分有关，可以反复restore，
+        用于搜索、复盘检查点和界面的悔棋。不包括策略对象和牌谱。
+        """
+        return GameSnapshot(
+            players=tuple(p.snapshot() for p in self.players),
+            wall=self.wall.snapshot(),
+            current_player=self.current_player,
+            pending_draw=self.pending_draw,
+            last_discarded=self.last_discarded,
+            last_discarder=self.last_discarder,
+            claimed_counts=tuple(self.claimed_counts),
+            winner=self.players.index(self.winner) if self.winner is not None else None,
+            table=self.table.snapshot(),
+        )
+
+    def restore(self, snapshot):
+        """恢复到snapshot时的状态"""
+        for player, state in zip(self.players, snapshot.players):
+            player.restore(state)
+        self.wall.restore(snapshot.wall)
+        self.current_player = snapshot.current_player
+        self.pending_draw = snapshot.pending_draw
+        self.last_discarded = snapshot.last_discarded
+        self.last_discarder = snapshot.last_discarder
+        self.claimed_counts = list(snapshot.claimed_counts)
+        self.winner = self.players[snapshot.winner] if snapshot.winner is not None else None
+        self.table.restore(snapshot.table)
+
+    def visible_counts(self):
+        """场上公开的牌（所有人的牌河和亮出的面子）的34格计数数组"""
+        # 被吃碰杠的弃牌同时留在牌河和面子里，只计一次（见TableInfo）
+        return list(self.table.visible)
 
     def get_tile_name(self, tile):
-        if tile[-1] in ['m', 't', 'p']:
-            return f"{tile[:-1]}{'万' if tile[-1] == 'm' else '条' if tile[-1] == 't' else '筒'}"
-        return {'e':'东','s':'南','w':'西','n':'北','z':'中','f':'发','b':'白'}.get(tile, tile)
+        return TILE_NAMES[tile]
 
     def check_win(self, hand, player=None):
-        def is_meld(tiles):
-            if len(tiles) < 3: return False
-            if tiles[0] == tiles[1] == tiles[2]: return True
-            if all(tile[-1] in ['m', 't', 'p'] for tile in tiles[:3]):
-                nums = [int(t[:-1]) for t in tiles[:3]]
-                if nums == [nums[0], nums[0]+1, nums[0]+2]:
-                    return True
-            return False
+        """检查手牌是否和牌（查表判定，支持七对子和已亮出的面子）"""
+        # 获取玩家已亮出的面子数量
+        existing_melds_count = len(player.melds) if player is not None else 0
+        return is_agari(counts_of(hand), existing_melds_count)
 
-        def backtrack(tiles, melds, pair, needed_melds):
-            if not tiles:
-                return len(melds) == needed_melds and pair is not None
-            
-            for i in range(len(tiles)):
-                if not pair and i+1 < len(tiles) and tiles[i] == tiles[i+1]:
-                    if backtrack(tiles[:i]+tiles[i+2:], melds, tiles[i], needed_melds):
-                        return True
-                if i+2 < len(tiles) and is_meld(tiles[i:i+3]):
-                    if backtrack(tiles[:i]+tiles[i+3:], melds+[tiles[i:i+3]], pair, needed_melds):
-                        return True
-            return False
+    def _ask(self, kind, seat, tile, options):
+        """产出决策点并校验返回的(动作, 参数)"""
+        action, arg = yield Decision(kind, seat, tile, options)
+        if kind == 'discard':
+            if action != 'discard' or not self.players[seat].counts[arg]:
+                raise ValueError(f"非法的打牌: {action} {arg}")
+        elif (action, arg) not in options:
+            raise ValueError(f"非法的选择: {action} {arg}")
+        return action, arg
 
-        def qidui(tiles):
-            # 检查是否为七对子
-            from collections import Counter
-            count = Counter(tiles)
-            # 必须恰好有7对牌，每对牌数量必须是2
-            if len(count) != 7:
-                return False
-            for value in count.values():
-                if value != 2:
-                    return False
-            return True
+    def claim_options(self, player, discarded_tile, discarder_idx, current_idx):
+        """玩家对别人打出的牌可以进行的操作（不含跳过），查player.claim_index"""
+        mask = player.claim_index[discarded_tile]
+        if not mask:
+            return []
+        options = []
+        if mask & CLAIM_HU:
+            options.append(('hu', None))
+        if mask & CLAIM_GANG:
+            options.append(('gang', discarded_tile))
+        if mask & CLAIM_PENG:
+            options.append(('peng', discarded_tile))
+        # 只能吃上家的牌
+        if mask & CLAIM_CHI and (discarder_idx + 1) % len(self.players) == current_idx:
+            tile = discarded_tile
+            if mask & CLAIM_CHI_HIGH:
+                options.append(('chi', [tile-2, tile-1, tile]))
+            if mask & CLAIM_CHI_MID:
+                options.append(('chi', [tile-1, tile, tile+1]))
+            if mask & CLAIM_CHI_LOW:
+                options.append(('chi', [tile, tile+1, tile+2]))
+        return options
 
-        # 获取玩家已亮出的面子数量
-        existing_melds_count = 0
-        if player is not None:
-            existing_melds_count = len(player.melds)
+    def arbitrate_claims(self, discarded_tile, discarder_idx):
+        """打牌后一次收集其他玩家的鸣牌并按优先级裁定（生成器）
+
+        按打牌者之后的顺序询问有可选操作的玩家。和 > 杠、碰 > 吃，几个玩家同时
+        和牌时靠前的优先（截和）。已经有人选择了更高（或同样）优先级的操作时，
+        不再询问不可能胜过它的玩家。
+
+        Returns:
+            (鸣牌的座位, 动作)，动作为'hu' / 'gang' / 'peng' / 'chi'；没有人鸣牌时返回None
+        """
+        num_players = len(self.players)
+        best = None  # (优先级, 座位, 动作, 参数)
+        for i in range(1, num_players):
+            seat = (discarder_idx + i) % num_players
+            options = self.claim_options(self.players[seat], discarded_tile, discarder_idx, seat)
+            if not options:
+                continue
+            if best is not None and max(CLAIM_PRIORITY[action] for action, _ in options) <= best[0]:
+                continue
+            options.append(('pass', None))
+            action, arg = yield from self._ask('claim', seat, discarded_tile, options)
+            priority = CLAIM_PRIORITY[action]
+            if priority and (best is None or priority > best[0]):
+                best = (priority, seat, action, arg)
+        if best is None:
+            return None
+
+        _, seat, action, arg = best
+        player = self.players[seat]
+        if action == 'hu':
+            self.winner = player
+            self._emit('ron', seat, discarded_tile, discarder_idx)
+        elif action == 'gang':
+            player.perform_gang(discarded_tile)
+            self.claimed_counts[discarded_tile] += 1
+            self._emit('gang', seat, discarded_tile, 'open')
+        elif action == 'peng':
+            player.perform_peng(discarded_tile)
+            self.claimed_counts[discarded_tile] += 1
+            self._emit('peng', seat, discarded_tile)
         else:
-            # 如果没有提供player参数，尝试从self获取melds
-            if hasattr(self, 'melds'):
-                existing_melds_count = len(self.melds)
-        
-        # 计算还需要的面子数量
-        needed_melds = 4 - existing_melds_count
-        
-        sorted_tiles = sort_hand(hand.copy())
-        
-        # 如果已亮出的面子数量加上手牌数量不足以凑成4个面子和1对雀头，则不可能和牌
-        min_tiles_needed = needed_melds * 3 + 2
-        if len(sorted_tiles) < min_tiles_needed:
-            return False
-        
-        # 检查是否为七对子或者普通胡牌
-        # 七对子只有在没有亮出面子的情况下才可能成立
-        if existing_melds_count == 0 and qidui(sorted_tiles):
-            return True
-        
-        # 普通胡牌，需要考虑已亮出的面子数量
-        return backtrack(sorted_tiles, [], None, needed_melds)
-    
-    def handle_player_action(self, player, discarded_tile=None, discarder_idx=None, current_idx=None):
-        """处理玩家对其他玩家打出的牌的响应"""
-        if player.is_computer:
-            # AI决策
-            try:
-                from ai_strategy import AdvancedAI
-                
-                game_state = {
-                    'can_hu': self.check_win(player.hand + [discarded_tile], player),
-                    'can_gang': player.can_gang(discarded_tile),
-                    'can_peng': player.can_peng(discarded_tile),
-                    'can_chi': len(player.can_chi(discarded_tile, discarder_idx, current_idx)) > 0,
-                    'gang_tile': discarded_tile,
-                    'peng_tile': discarded_tile,
-                    'chi_options': player.can_chi(discarded_tile)
-                }
-                
-                action, tile = AdvancedAI.decide_action(player, game_state)
-                
-                if action == 'hu' and game_state['can_hu']:
-                    self.winner = player
-                    print(f"{player.name} 和牌！")
-                    self.record_action('和牌', player, discarded_tile)
-                    return True
-                
-                elif action == 'gang' and game_state['can_gang']:
-                    player.perform_gang(discarded_tile)
-                    print(f"{player.name} 杠了 {self.get_tile_name(discarded_tile)}")
-                    self.record_action('杠', player, discarded_tile)
-                    # 杠后摸牌
-                    if self.tiles:
-                        new_tile = self.tiles.pop(0)
-                        player.draw_tile(new_tile)
-                        print(f"{player.name} 摸了一张牌")
-                        self.record_action('摸牌', player, new_tile)
-                        # AI自动打出一张牌
-                        discard_tile = player.auto_discard()
-                        print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                        self.record_action('弃牌', player, discard_tile)
-                    return True
-                
-                elif action == 'peng' and game_state['can_peng']:
-                    player.perform_peng(discarded_tile)
-                    print(f"{player.name} 碰了 {self.get_tile_name(discarded_tile)}")
-                    self.record_action('碰', player, discarded_tile)
-                    # AI自动打出一张牌
-                    discard_tile = player.auto_discard()
-                    print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                    self.record_action('弃牌', player, discard_tile)
-                    return True
-                
-                elif action == 'chi' and game_state['can_chi']:
-                    chi_options = player.can_chi(discarded_tile, discarder_idx, current_idx)
-                    option = chi_options[0]  # 选择第一个吃牌选项
-                    player.perform_chi(discarded_tile, option)
-                    print(f"{player.name} 吃了 {self.get_tile_name(discarded_tile)}")
-                    self.record_action('吃', player, discarded_tile)
-                    # AI自动打出一张牌
-                    discard_tile = player.auto_discard()
-                    print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                    self.record_action('弃牌', player, discard_tile)
-                    return True
-            
-            except ImportError:
-                # 如果高级AI模块不可用，使用简单策略
-                # 简单策略：只检查和牌
-                if self.check_win(player.hand + [discarded_tile], player):
-                    self.winner = player
-                    print(f"{player.name} 和牌！")
-                    self.record_action('和牌', player, discarded_tile)
-                    return True
-        
-        else:  # 人类玩家
-            # 检查是否可以和牌
-            can_hu = self.check_win(player.hand + [discarded_tile], player)
-            can_gang = player.can_gang(discarded_tile)
-            can_peng = player.can_peng(discarded_tile)
-            can_chi = len(player.can_chi(discarded_tile, discarder_idx, current_idx)) > 0
-            
-            if not (can_hu or can_gang or can_peng or can_chi):
-                return False
-            
-            # 显示当前手牌
-            print(f"\n{player.name}的当前手牌：")
-            display_hand(player.hand, "你的")
-            
-            # 显示可选操作
-            # 显示可选操作
-            print(f"\n{player.name}，你可以对 {self.get_tile_name(discarded_tile)} 进行以下操作：")
-            options = []
-            option_index = 1
-            
-            if can_hu:
-                options.append("和牌")
-                print(f"{option_index}. 和牌")
-                option_index += 1
-            
-            if can_gang:
-                options.append("杠")
-                print(f"{option_index}. 杠")
-                option_index += 1
-            
-            if can_peng:
-                options.append("碰")
-                print(f"{option_index}. 碰")
-                option_index += 1
-            
-            if can_chi:
-                options.append("吃")
-                print(f"{option_index}. 吃")
-                option_index += 1
-            
-            options.append("跳过")
-            print(f"{option_index}. 跳过")
-            
-            while True:
-                try:
-                    choice = int(input("请选择操作（输入数字）: "))
-                    if 1 <= choice <= len(options):
-                        action = options[choice-1]
-                        break
-                    else:
-                        print("无效的选择，请重新输入！")
-                except ValueError:
-                    print("请输入有效的数字！")
-            
-            if action == "和牌":
-                self.winner = player
-                print(f"{player.name} 和牌！")
-                self.record_action('和牌', player, discarded_tile)
-                return True
-            
-            elif action == "杠":
-                player.perform_gang(discarded_tile)
-                print(f"{player.name} 杠了 {self.get_tile_name(discarded_tile)}")
-                self.record_action('杠', player, discarded_tile)
-                # 杠后摸牌
-                if self.tiles:
-                    new_tile = self.tiles.pop(0)
-                    player.draw_tile(new_tile)
-                    print(f"{player.name} 摸了一张牌: {self.get_tile_name(new_tile)}")
-                    self.record_action('摸牌', player, new_tile)
-                    
-                    # 显示手牌
-                    display_hand(player.hand, "你的")
-                    # 要求玩家打出一张牌
-                    while True:
-                        discard = input("请选择要打出的牌（输入牌代号）: ").strip()
-                        if discard in player.hand:
-                            break
-                        print("无效的牌，请重新输入！")
-                    discard_tile = player.discard_tile(discard)
-                    print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                    self.record_action('手动弃牌', player, discard_tile)
-                return True
-            
-            elif action == "碰":
-                player.perform_peng(discarded_tile)
-                print(f"{player.name} 碰了 {self.get_tile_name(discarded_tile)}")
-                self.record_action('碰', player, discarded_tile)
-                
-                # 显示手牌
-                display_hand(player.hand, "你的")
-                # 要求玩家打出一张牌
-                while True:
-                    discard = input("请选择要打出的牌（输入牌代号）: ").strip()
-                    if discard in player.hand:
-                        break
-                    print("无效的牌，请重新输入！")
-                discard_tile = player.discard_tile(discard)
-                print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                self.record_action('手动弃牌', player, discard_tile)
-                return True
-            
-            elif action == "吃":
-                chi_options = player.can_chi(discarded_tile, discarder_idx, current_idx)
-                if not chi_options:  # 检查chi_options是否为空
-                    print("没有可用的吃牌选项！")
-                    return False
-                    
-                if len(chi_options) > 1:
-                    print("\n请选择吃牌组合：")
-                    for i, option in enumerate(chi_options):
-                        option_str = ' '.join([self.get_tile_name(t) for t in option])
-                        print(f"{i+1}. {option_str}")
-                    
-                    while True:
-                        try:
-                            chi_choice = int(input("请选择吃牌组合（输入数字）: "))
-                            if 1 <= chi_choice <= len(chi_options):
-                                break
-                            else:
-                                print("无效的选择，请重新输入！")
-                        except ValueError:
-                            print("请输入有效的数字！")
-                    
-                    option = chi_options[chi_choice-1]
-                else:
-                    option = chi_options[0]
-                
-                player.perform_chi(discarded_tile, option)
-                print(f"{player.name} 吃了 {self.get_tile_name(discarded_tile)}")
-                self.record_action('吃', player, discarded_tile)
-                
-                # 显示手牌
-                display_hand(player.hand, "你的")
-                # 要求玩家打出一张牌
-                while True:
-                    discard = input("请选择要打出的牌（输入牌代号）: ").strip()
-                    if discard in player.hand:
-                        break
-                    print("无效的牌，请重新输入！")
-                discard_tile = player.discard_tile(discard)
-                print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                self.record_action('手动弃牌', player, discard_tile)
-                return True
-        
-        return False
+            player.perform_chi(discarded_tile, arg)
+            self.claimed_counts[discarded_tile] += 1
+            self._emit('chi', seat, discarded_tile, arg)
+        return seat, action
+
+    def self_options(self, player, can_tsumo=True):
+        """玩家摸牌后可以进行的操作（自摸、暗杠、加杠），没有可选操作时返回空列表"""
+        options = []
+        if can_tsumo and is_agari(player.counts, len(player.melds)):
+            options.append(('hu', None))
+        for tile in player.can_self_gang():
+            options.append(('gang', tile))
+        if options:
+            options.append(('pass', None))
+        return options
+
+    def _draw(self, seat, kind):
+        """当前玩家摸一张牌（杠后从王牌摸岭上牌），不能再摸时返回None"""
+        tile = self.wall.draw_replacement() if kind == 'rinshan' else self.wall.draw()
+        if tile is None:
+            return None
+        self.players[seat].draw_tile(tile)
+        self._emit('draw', seat, tile, kind)
+        return tile
 
-    # 显示所有玩家的丢弃牌
-    def display_discards(self):
-        print("===公共信息： ===")
-        for p in self.players:
-            discard_str = ""
-            for tile in p.discards:
-                discard_str += f"{self.get_tile_name(tile)} "
-            print(f"{p.name} 丢弃手牌：{discard_str}")
-        print()
-        
-        # 显示所有玩家的面子
-        for p in self.players:
-            if p.melds:
-                print(f"{p.name}的面子：", end="")
-                meld_strs = []
-                for meld_type, tiles in p.melds:
-                    # 根据面子类型使用不同的显示格式
-                    if meld_type == 'chi':
-                        meld_str = '吃: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    elif meld_type == 'peng':
-                        meld_str = '碰: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    elif meld_type == 'gang':
-                        meld_str = '杠: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    else:
-                        meld_str = f"{meld_type}: " + ' '.join([self.get_tile_name(t) for t in tiles])
-                    meld_strs.append(meld_str)
-                print("; ".join(meld_strs))
-            else:
-                print(f"{p.name}的面子：")
-        
-        print(f"\n牌山剩余: {len(self.tiles)}张牌\n")
-    
     def play_round(self):
-        player = self.players[self.current_player]
-        
-        # 检查是否可以自摸杠
-        if player.is_computer:
-            self_gang_tiles = player.can_self_gang()
-            if self_gang_tiles:
-                # AI简单策略：有80%概率选择自摸杠
-                if random.random() < 0.8:
-                    gang_tile = self_gang_tiles[0]
-                    # 检查是否为加杠
-                    is_add_gang = False
-                    for meld_type, tiles in player.melds:
-                        if meld_type == 'peng' and tiles[0] == gang_tile:
-                            is_add_gang = True
-                            break
-                    
-                    player.perform_gang(gang_tile, is_self_gang=True, is_add_gang=is_add_gang)
-                    gang_type = '加杠' if is_add_gang else '暗杠'
-                    print(f"{player.name} {gang_type}了 {self.get_tile_name(gang_tile)}")
-                    self.record_action(gang_type, player, gang_tile)
-                    # 杠后摸牌
-                    if self.tiles:
-                        new_tile = self.tiles.pop(0)
-                        player.draw_tile(new_tile)
-                        print(f"{player.name} 摸了一张牌")
-                        self.record_action('摸牌', player, new_tile)
-                        # AI自动打出一张牌
-                        discard_tile = player.auto_discard()
-                        print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                        self.record_action('弃牌', player, discard_tile)
-        else:  # 人类玩家
-            self_gang_tiles = player.can_self_gang()
-            if self_gang_tiles:
-                print("\n你可以进行以下杠牌操作：")
-                gang_options = []
-                for tile in self_gang_tiles:
-                    # 检查是否为加杠
-                    is_add_gang = False
-                    for meld_type, tiles in player.melds:
-                        if meld_type == 'peng' and tiles[0] == tile:
-                            is_add_gang = True
-                            break
-                    gang_type = '加杠' if is_add_gang else '暗杠'
-                    print(f"{len(gang_options)+1}. {gang_type} {self.get_tile_name(tile)}")
-                    gang_options.append((tile, is_add_gang))
-                print(f"{len(gang_options)+1}. 不杠")
-                
-                while True:
-                    try:
-                        choice = int(input("请选择（输入数字）: "))
-                        if 1 <= choice <= len(gang_options)+1:
-                            break
-                        else:
-                            print("无效的选择，请重新输入！")
-                    except ValueError:
-                        print("请输入有效的数字！")
-                
-                if choice <= len(gang_options):
-                    gang_tile, is_add_gang = gang_options[choice-1]
-                    player.perform_gang(gang_tile, is_self_gang=True, is_add_gang=is_add_gang)
-                    gang_type = '加杠' if is_add_gang else '暗杠'
-                    print(f"{player.name} {gang_type}了 {self.get_tile_name(gang_tile)}")
-                    self.record_action(gang_type, player, gang_tile)
-                    # 杠后摸牌
-                    if self.tiles:
-                        new_tile = self.tiles.pop(0)
-                        player.draw_tile(new_tile)
-                        print(f"{player.name} 摸了一张牌: {self.get_tile_name(new_tile)}")
-                        self.record_action('摸牌', player, new_tile)
-                        
-                        # 显示手牌
-                        display_hand(player.hand, "你的")
-                        # 要求玩家打出一张牌
-                        while True:
-                            discard = input("请选择要打出的牌（输入牌代号）: ").strip()
-                            if discard in player.hand:
-                                break
-                            print("无效的牌，请重新输入！")
-                        discard_tile = player.discard_tile(discard)
-                        print(f"{player.name} 打出了: {self.get_tile_name(discard_tile)}")
-                        self.record_action('手动弃牌', player, discard_tile)
-        
-        # 摸牌
-        if not self.tiles:
-            print("牌山已空，流局！")
-            return False
-        
-        new_tile = self.tiles.pop(0)
-        player.draw_tile(new_tile)
-        self.record_action('摸牌', player, new_tile)
-        
-        if not player.is_computer:
-            print(f"\n=== {player.name}的回合 ===")
-            # 显示公共信息
-            self.display_discards()
-            
-            print(f" ===你的信息： ===")
-            print(f"你摸到了: {self.get_tile_name(new_tile)}")
-            display_hand(player.hand, "你的")
-            
-            # 显示玩家的面子
-            if player.melds:
-                print("\n你的面子：", end="")
-                meld_strs = []
-                for meld_type, tiles in player.melds:
-                    # 根据面子类型使用不同的显示格式
-                    if meld_type == 'chi':
-                        meld_str = '吃: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    elif meld_type == 'peng':
-                        meld_str = '碰: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    elif meld_type == 'gang':
-                        meld_str = '杠: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                    else:
-                        meld_str = f"{meld_type}: " + ' '.join([self.get_tile_name(t) for t in tiles])
-                    meld_strs.append(meld_str)
-                print("; ".join(meld_strs))
-        else:
-            print(f"\n=== {player.name}的回合 ===")
-            # 显示公共信息
-            self.display_discards()
-            
-            print(f" ===你的信息： ===")
-            if self.show_ai_cards:
-                print(f"你摸到了: {self.get_tile_name(new_tile)}")
-                display_hand(player.hand, "你的")
-                if player.melds:
-                    print("\n你的面子：", end="")
-                    meld_strs = []
-                    for meld_type, tiles in player.melds:
-                        # 根据面子类型使用不同的显示格式
-                        if meld_type == 'chi':
-                            meld_str = '吃: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                        elif meld_type == 'peng':
-                            meld_str = '碰: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                        elif meld_type == 'gang':
-                            meld_str = '杠: ' + ' '.join([self.get_tile_name(t) for t in tiles])
-                        else:
-                            meld_str = f"{meld_type}: " + ' '.join([self.get_tile_name(t) for t in tiles])
-                        meld_strs.append(meld_str)
-                    print("; ".join(meld_strs))
-            else:
-                print("你摸到了: *")
-                print("你的手牌：")
-                print("万: *")
-                print("条: *")
-                print("筒: *")
-                print("字牌: *")
-                print("\n你的面子：*")
-
-        # 检查自摸和牌
-        if self.check_win(player.hand, player):
-            if player.is_computer:
-                # AI玩家自动胡牌
-                self.winner = player
-                print(f"{player.name} 自摸和牌！")
-                self.record_action('自摸和牌', player)
+        """进行当前玩家的一个回合（生成器）：摸牌、自摸/杠、打牌、其他玩家响应
+        
+        Returns:
+            本局是否结束
+        """
+        seat = self.current_player
+        player = self.players[seat]
+        
+        # 摸牌，之后可以自摸或者暗杠/加杠（杠后再摸一张岭上牌）
+        drawn = None
+        if self.pending_draw:
+            drawn = self._draw(seat, self.pending_draw)
+            if drawn is None:
                 return True
-            else:
-                # 人类玩家选择是否胡牌
-                print("\n恭喜！你可以自摸和牌！")
-                while True:
-                    choice = input("是否胡牌？(y/n): ").strip().lower()
-                    if choice in ['y', 'n']:
-                        break
-                    print("无效的输入，请输入y或n")
-                
-                if choice == 'y':
+            while True:
+                options = self.self_options(player)
+                if not options:
+                    break
+                action, gang_tile = yield from self._ask('self', seat, drawn, options)
+                if action == 'hu':
                     self.winner = player
-                    print(f"{player.name} 自摸和牌！")
-                    self.record_action('自摸和牌', player)
+                    self._emit('tsumo', seat, drawn)
                     return True
-                else:
-                    print(f"{player.name} 选择不胡牌，继续游戏")
-                    self.record_action('放弃自摸', player)
-
+                if action == 'gang':
+                    # 检查是否为加杠
+                    is_add_gang = any(meld_type == 'peng' and tiles[0] == gang_tile
+                                      for meld_type, tiles in player.melds)
+                    player.perform_gang(gang_tile, is_self_gang=True, is_add_gang=is_add_gang)
+                    self._emit('gang', seat, gang_tile, 'added' if is_add_gang else 'closed')
+                    drawn = self._draw(seat, 'rinshan')
+                    if drawn is None:
+                        return True
+                    continue
+                if ('hu', None) in options:
+                    self._emit('skip_tsumo', seat)
+                break
+        
         # 打牌
-        if player.is_computer:
-            discarded = player.auto_discard()
-            action_type = '弃牌'
-        else:
-            while True:
-                discarded = input("请选择要打出的牌（输入牌代号）: ").strip()
-                if discarded in player.hand:
-                    break
-                print("无效的牌，请重新输入！")
-            discarded = player.discard_tile(discarded)
-            action_type = '手动弃牌'
-
-        self.record_action(action_type, player, discarded)
-        print(f"{player.name} 打出了: {self.get_tile_name(discarded)}")
+        _, discarded = yield from self._ask('discard', seat, drawn, None)
+        player.discard_tile(discarded)
+        self._emit('discard', seat, discarded)
         
         # 记录最后打出的牌和打牌者
         self.last_discarded = discarded
-        self.last_discarder = self.current_player
+        self.last_discarder = seat
         
-        # 检查其他玩家是否可以对打出的牌进行操作
-        for i in range(1, len(self.players)):
-            next_player_idx = (self.current_player + i) % len(self.players)
-            next_player = self.players[next_player_idx]
-            
-            if self.handle_player_action(next_player, discarded, self.current_player, next_player_idx):
-                # 如果有玩家进行了操作，更新当前玩家为该玩家的下家
-                self.current_player = (next_player_idx + 1) % len(self.players)
-                return False
+        # 其他玩家对打出的牌鸣牌（按优先级裁定）
+        claim = yield from self.arbitrate_claims(discarded, seat)
+        if claim is not None:
+            claimer, action = claim
+            if action == 'hu':
+                return True
+            # 鸣牌的玩家接着打牌（杠需要先摸岭上牌）
+            self.current_player = claimer
+            self.pending_draw = 'rinshan' if action == 'gang' else None
+            return False
         
         # 如果没有玩家进行操作，轮到下一位玩家
-        self.current_player = (self.current_player + 1) % len(self.players)
+        self.current_player = (seat + 1) % len(self.players)
+        self.pending_draw = 'draw'
         return False
 
-    def save_log(self):
-        log_dir = os.path.dirname(os.path.abspath(__file__))
-        filename = "log\\poker_game_log_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".txt"
-        filepath = os.path.join(log_dir, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("=== 麻将牌谱 ===\n")
-            round_num = 1
-            current_round = 1
-            for i, entry in enumerate(self.log):
-                # 每四个玩家操作为一轮（假设4个玩家）
-                if i > 0 and i % len(self.players) == 0:
-                    current_round += 1
-                
-                # 获取玩家手牌的字符串表示
-                hand_str = ""
-                if 'player_tiles' in entry and entry['player_tiles']:
-                    hand_tiles = entry['player_tiles'].copy()
-                    hand_tiles = sort_hand(hand_tiles)
-                    hand_str = "手牌: "
-                    for tile in hand_tiles:
-                        if tile[-1] in ['m', 't', 'p']:
-                            hand_str += f"{tile[:-1]}{'万' if tile[-1] == 'm' else '条' if tile[-1] == 't' else '筒'} "
-                        else:
-                            hand_str += f"{'东' if tile == 'e' else '南' if tile == 's' else '西' if tile == 'w' else '北' if tile == 'n' else '中' if tile == 'z' else '发' if tile == 'f' else '白'} "
-                
-                # 构建新的日志行
-                line = f"[第{current_round}轮] {entry['player']} {entry['action']}"
-                if entry['tile']:
-                    line += f": {entry['tile']}"
-                
-                # 添加手牌信息（如果有）
-                if hand_str:
-                    line += f" ({hand_str.strip()})"
-                
-                f.write(line + "\n")
-            
-            if self.winner:
-                f.write(f"\n游戏结束！胜利者：{self.winner.name}")
-            else:
-                f.write("\n游戏结束！流局")
-        print(f"牌谱已保存至：{filepath}")
+    def run(self):
+        """对局引擎（生成器）
+        
+        每当需要玩家做选择时产出一个Decision，调用方用send()传回(动作, 参数)。
+        这样同一个引擎可以由命令行、图形界面或无界面的模拟器驱动。
+        """
+        self._emit('start')
+        while not (yield from self.play_round()):
+            pass
+        winner = self.players.index(self.winner) if self.winner else None
+        self._emit('end', info=winner)
+
+    def play(self, save_log=False):
+        """用每个座位的策略回调把一局打完，返回胜者（流局为None）
 
-    def play(self):
-        print("游戏开始！")
+        不做任何终端输出。save_log为True时边打边写牌谱（路径为open_log()的返回值，
+        也可以在调用前自己open_log()指定路径），打完后关闭。
+        """
+        if save_log and self.log is None:
+            self.open_log()
+        engine = self.run()
+        strategies = self.strategies
         try:
-            while self.tiles and not self.winner:
-                if self.play_round():
+            action = None
+            while True:
+                # 只有引擎结束才算打完；策略回调里漏出的StopIteration照常抛出
+                try:
+                    decision = engine.send(action)
+                except StopIteration:
                     break
-                # 每轮结束后显示剩余牌数
-                print(f"\n牌山剩余: {len(self.tiles)}张牌")
+                action = strategies[decision.seat](self, decision)
         finally:
-            self.save_log()
-        if self.winner:
-            print(f"\n恭喜 {self.winner.name} 胡牌！")
-        else:
-            print("\n牌山已空，流局！")
+            if save_log:
+                self.close_log()
+        return self.winner
 
 if __name__ == "__main__":
-    game = MahjongGame(players=1)
-    game.play()
\ No newline at end of file
+    import sys
+    import instrument
+    import player_class
+
+    # 无界面模式：四个电脑玩家自动打完一局，加 --profile 时输出热点计时报告
+    # （计时替换的是player_class模块中的类，所以这里不直接用__main__中的MahjongGame）
+    profile = '--profile' in sys.argv
+    if profile:
+        instrument.enable()
+    game = player_class.MahjongGame(human_players=0, ai_players=4)
+    winner = game.play()
+    print(f"胜利者：{winner.name}" if winner else "流局")
+    if profile:
+        import decompose
+        print(instrument.report())
+        print(decompose.format_cache_stats())
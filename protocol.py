@@ -0,0 +1,183 @@
+# 对局服务器的紧凑消息协议
+# 每条消息是一个JSON数组，第一个元素是整数消息码，其余字段按位置排列，末尾
+# 的null省略；牌一律用编号（0-33），动作、事件类型、杠的类型等也都编成小整数。
+# 一行是一帧，帧是若干条消息组成的数组：同一步里产生的事件（打牌、下家摸牌、
+# 决策点……）合在一帧里发送，客户端跟不上时积压的消息也合并成一帧。
+#
+# 对局中只发送事件（增量），每条事件的大小与对局进行到哪里无关。完整的局面
+# 快照（SYNC）只在开局和断线重连时发送一次，客户端用SeatView按事件自己维护局面。
+#
+#   服务器 -> 客户端
+#     [0-9, 座位, 牌, 附加]        事件，类型见EVENT_KINDS（别人摸到的牌省略）
+#     [10, 类型, 牌, 可选操作]      决策点，可选操作为[[动作, 参数], ...]
+#     [11, 桌号, 座位, 重连令牌]    已入座
+#     [12, ...]                     局面快照，字段见encode_sync
+#     [13, 错误信息]
+#   客户端 -> 服务器
+#     [20, 名字]                    加入一桌
+#     [21, 动作, 参数]              回复决策点
+#     [22, 重连令牌]                断线后回到原来的座位
+#
+# 附加字段：摸牌为DRAW_KINDS的序号，杠为GANG_KINDS的序号，吃为顺子最小的一张，
+# 荣和为放铳的座位，终局为和牌的座位。动作的参数：吃为顺子最小的一张，杠、碰
+# 为牌，打牌为牌，其他为null。
+
+import json
+
+from player_class import GameEvent, Meld
+
+EVENT_KINDS = ('start', 'draw', 'discard', 'chi', 'peng', 'gang', 'tsumo', 'ron', 'skip_tsumo', 'end')
+MSG_DECIDE = 10
+MSG_JOINED = 11
+MSG_SYNC = 12
+MSG_ERROR = 13
+MSG_JOIN = 20
+MSG_ACT = 21
+MSG_RESUME = 22
+
+DECISION_KINDS = ('self', 'discard', 'claim')
+ACTIONS = ('discard', 'hu', 'gang', 'peng', 'chi', 'pass')
+DRAW_KINDS = ('draw', 'rinshan')
+GANG_KINDS = ('open', 'closed', 'added')
+MELD_KINDS = ('chi', 'peng', 'gang')
+MELD_SIZES = {'chi': 3, 'peng': 3, 'gang': 4}
+
+_EVENT_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+_DECISION_CODES = {kind: code for code, kind in enumerate(DECISION_KINDS)}
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+
+def _trim(message):
+    while message[-1] is None:
+        message.pop()
+    return message
+
+
+def encode_frame(messages):
+    """若干条消息编码成一帧（一行）"""
+    return json.dumps(messages, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_frame(line):
+    return json.loads(line)
+
+
+def encode_event(event, viewer):
+    """座位viewer收到的事件消息（别人摸到的牌不公开）"""
+    kind, seat, tile, info = event
+    if kind == 'draw':
+        if seat != viewer:
+            tile = None
+        info = DRAW_KINDS.index(info)
+    elif kind == 'gang':
+        info = GANG_KINDS.index(info)
+    elif kind == 'chi':
+        info = min(info)
+    return _trim([_EVENT_CODES[kind], seat, tile, info])
+
+
+def decode_event(message):
+    """事件消息还原成GameEvent"""
+    code, seat, tile, info = message + [None] * (4 - len(message))
+    kind = EVENT_KINDS[code]
+    if kind == 'draw':
+        info = DRAW_KINDS[info]
+    elif kind == 'gang':
+        info = GANG_KINDS[info]
+    elif kind == 'chi':
+        info = (info, info + 1, info + 2)
+    return GameEvent(kind, seat, tile, info)
+
+
+def encode_action(action, arg):
+    return _trim([_ACTION_CODES[action], min(arg) if action == 'chi' else arg])
+
+
+def decode_action(code, arg=None):
+    """动作码还原成引擎使用的(动作, 参数)"""
+    action = ACTIONS[code]
+    if action == 'chi':
+        arg = [arg, arg + 1, arg + 2]
+    return action, arg
+
+
+def encode_decision(decision):
+    options = None
+    if decision.options is not None:
+        options = [encode_action(action, arg) for action, arg in decision.options]
+    return _trim([MSG_DECIDE, _DECISION_CODES[decision.kind], decision.tile, options])
+
+
+def decode_decision(message):
+    """决策点消息还原成(类型, 牌, [(动作, 参数), ...]或None)"""
+    _, kind, tile, options = message + [None] * (4 - len(message))
+    if options is not None:
+        options = [decode_action(*option) for option in options]
+    return DECISION_KINDS[kind], tile, options
+
+
+def encode_sync(game, viewer):
+    """座位viewer看到的完整局面：
+    [12, 座位, 名字列表, 自己的手牌, 各座位牌河, 各座位面子, 各座位手牌张数, 牌山剩余, 当前玩家]
+    面子编码为[面子类型, 最小的一张]
+    """
+    players = game.players
+    return [MSG_SYNC, viewer, [p.name for p in players], sorted(players[viewer].hand),
+            [list(p.discards) for p in players],
+            [[[MELD_KINDS.index(kind), tiles[0]] for kind, tiles in p.melds] for p in players],
+            [len(p.hand) for p in players], len(game.wall), game.current_player]
+
+
+def _meld(kind, tile):
+    return Meld(kind, (tile, tile + 1, tile + 2) if kind == 'chi' else (tile,) * MELD_SIZES[kind])
+
+
+class SeatView:
+    """客户端一侧的局面（一个座位的视角），由SYNC快照开始，按事件增量更新"""
+
+    def __init__(self, sync):
+        (_, self.seat, self.players, hand, self.discards, melds,
+         self.hand_sizes, self.wall, self.current) = sync
+        self.hand = list(hand)
+        self.melds = [[_meld(MELD_KINDS[kind], tile) for kind, tile in seat_melds] for seat_melds in melds]
+        self.winner = None
+
+    def _take(self, seat, tile, n):
+        self.hand_sizes[seat] -= n
+        if seat == self.seat:
+            for _ in range(n):
+                self.hand.remove(tile)
+
+    def apply(self, event):
+        """按一个事件（GameEvent）更新局面"""
+        kind, seat, tile, info = event
+        if kind == 'draw':
+            self.wall -= 1
+            self.hand_sizes[seat] += 1
+            self.current = seat
+            if seat == self.seat:
+                self.hand.append(tile)
+        elif kind == 'discard':
+            self._take(seat, tile, 1)
+            self.discards[seat].append(tile)
+        elif kind == 'chi':
+            for t in info:
+                if t != tile:
+                    self._take(seat, t, 1)
+            self.melds[seat].append(Meld('chi', info))
+            self.current = seat
+        elif kind == 'peng':
+            self._take(seat, tile, 2)
+            self.melds[seat].append(_meld('peng', tile))
+            self.current = seat
+        elif kind == 'gang':
+            if info == 'added':
+                self._take(seat, tile, 1)
+                self.melds[seat] = [_meld('gang', tile) if meld == ('peng', (tile,) * 3) else meld
+                                    for meld in self.melds[seat]]
+            else:
+                self._take(seat, tile, 3 if info == 'open' else 4)
+                self.melds[seat].append(_meld('gang', tile))
+                self.current = seat
+        elif kind in ('tsumo', 'ron'):
+            self.winner = seat
@@ -0,0 +1,282 @@
+# 二进制对局记录（分片文件）
+# 每局记录为紧凑的字节串：种子、胜者、配牌（每张1字节）和事件流（每个事件
+# 2字节），追加写入分片文件，一局约200字节。读取时用mmap映射整个分片，
+# 逐局惰性解析，不需要先把所有对局读成Python对象。
+#
+# 分片文件格式（小端序）：
+#   文件头  b'MJRS' + 版本(u16) + 保留(u16)
+#   每局    记录长度(u32，不含本字段) 种子(u64) 人数(u8) 胜者(u8，255为流局)
+#           电脑座位位图(u8) 事件数(u16) 配牌(人数*13字节) 事件(事件数*2字节)
+#   事件    第1字节 = 事件编码<<2 | 座位，第2字节 = 牌编号（荣和时高2位为放铳者）
+#
+# 用法：
+#   python records.py info records/*.mjr
+#   python records.py convert records/logs.mjr log/game_log_*.jsonl
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'MJRS'
+RECORD_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')
+RECORD_HEADER = struct.Struct('<IQBBBH')
+DEAL_SIZE = 13
+NO_WINNER = 255
+NO_TILE = 255
+
+# 事件编码，附加信息（摸牌种类、杠的种类、吃的位置）并入编码中
+EVENT_CODES = {
+    ('draw', 'draw'): 0, ('draw', 'rinshan'): 1, ('discard', None): 2,
+    ('chi', 0): 3, ('chi', 1): 4, ('chi', 2): 5, ('peng', None): 6,
+    ('gang', 'open'): 7, ('gang', 'closed'): 8, ('gang', 'added'): 9,
+    ('tsumo', None): 10, ('ron', None): 11, ('skip_tsumo', None): 12,
+}
+EVENT_KINDS = {code: key for key, code in EVENT_CODES.items()}
+
+
+def _encode_event(event, out):
+    """把一个GameEvent编码为2字节追加到out（array('B')），start/end不编码"""
+    kind, seat, tile, info = event
+    if kind == 'draw' or kind == 'gang':
+        key = (kind, info)
+    elif kind == 'chi':
+        # 被吃的牌在顺子中的位置
+        key = (kind, tile - min(info))
+    else:
+        key = (kind, None)
+    if kind == 'ron':
+        tile |= info << 6
+    out.append(EVENT_CODES[key] << 2 | seat)
+    out.append(NO_TILE if tile is None else tile)
+
+
+def _decode_events(data, winner):
+    """把事件字节串解码为GameEvent列表（与引擎产生的事件相同，含start/end）"""
+    from player_class import GameEvent
+
+    events = [GameEvent('start', None, None, None)]
+    for i in range(0, len(data), 2):
+        code, tile = data[i], data[i + 1]
+        (kind, info), seat = EVENT_KINDS[code >> 2], code & 3
+        if tile == NO_TILE:
+            tile = None
+        elif kind == 'chi':
+            info = (tile - info, tile - info + 1, tile - info + 2)
+        elif kind == 'ron':
+            tile, info = tile & 63, tile >> 6
+        events.append(GameEvent(kind, seat, tile, info))
+    events.append(GameEvent('end', None, None, None if winner == NO_WINNER else winner))
+    return events
+
+
+def encode_game(seed, deal, events, winner=None, computer=None):
+    """把一局编码为记录字节串
+
+    Args:
+        seed: 对局种子
+        deal: 每个座位的配牌（13张）
+        events: GameEvent序列
+        winner: 胜者座位，流局为None
+        computer: 每个座位是否为电脑，默认全部为电脑
+    """
+    body = array('B')
+    for hand in deal:
+        body.extend(hand)
+    for event in events:
+        if event.seat is not None:
+            _encode_event(event, body)
+    flags = 0
+    for seat, is_computer in enumerate(computer if computer is not None else [True] * len(deal)):
+        if is_computer:
+            flags |= 1 << seat
+    num_events = (len(body) - DEAL_SIZE * len(deal)) // 2
+    header = RECORD_HEADER.pack(RECORD_HEADER.size - 4 + len(body), seed, len(deal),
+                                NO_WINNER if winner is None else winner, flags, num_events)
+    return header + body.tobytes()
+
+
+class ShardWriter:
+    """追加写入分片文件，每局一次write，中断时最多留下一条不完整的记录"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab', buffering=0)
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, RECORD_VERSION, 0))
+
+    def add_game(self, seed, deal, events, winner=None, computer=None):
+        self.file.write(encode_game(seed, deal, events, winner, computer))
+
+    def close(self):
+        self.file.close()
+
+
+class RecordingSink:
+    """事件接收方：收集一局的事件，对局结束时写入分片，同时把事件转交给sink"""
+
+    def __init__(self, writer, sink=None):
+        self.writer = writer
+        self.sink = sink
+        self.events = []
+        self.deal = None
+
+    def __call__(self, game, event):
+        if event.kind == 'start':
+            self.events = []
+            self.deal = [list(p.hand) for p in game.players]
+        elif event.kind == 'end':
+            self.writer.add_game(game.seed, self.deal, self.events, event.info,
+                                 [p.is_computer for p in game.players])
+        else:
+            self.events.append(event)
+        if self.sink is not None:
+            self.sink(game, event)
+
+
+class GameRecord:
+    """分片中的一局（只保存位置，各字段用到时才解析）"""
+
+    __slots__ = ('_buf', '_offset', 'seed', 'num_players', 'winner', '_flags', 'num_events')
+
+    def __init__(self, buf, offset):
+        self._buf = buf
+        self._offset = offset
+        _, self.seed, self.num_players, winner, self._flags, self.num_events = \
+            RECORD_HEADER.unpack_from(buf, offset)
+        self.winner = None if winner == NO_WINNER else winner
+
+    def detach(self):
+        """复制出这一局的字节，返回不再依赖分片mmap的记录（分片关闭后仍可使用）"""
+        (length,) = struct.unpack_from('<I', self._buf, self._offset)
+        return GameRecord(bytes(self._buf[self._offset:self._offset + 4 + length]), 0)
+
+    @property
+    def deal(self):
+        start = self._offset + RECORD_HEADER.size
+        return [list(self._buf[start + i * DEAL_SIZE:start + (i + 1) * DEAL_SIZE])
+                for i in range(self.num_players)]
+
+    @property
+    def event_bytes(self):
+        start = self._offset + RECORD_HEADER.size + DEAL_SIZE * self.num_players
+        return self._buf[start:start + 2 * self.num_events]
+
+    def events(self):
+        """解码后的事件列表（GameEvent）"""
+        return _decode_events(self.event_bytes, NO_WINNER if self.winner is None else self.winner)
+
+    def header(self):
+        """与JSONL牌谱相同格式的头部，可以和events()一起交给game_log.replay_players"""
+        return {
+            'version': RECORD_VERSION,
+            'seed': self.seed,
+            'players': [{'name': f"座位{seat}", 'computer': bool(self._flags >> seat & 1)}
+                        for seat in range(self.num_players)],
+            'deal': self.deal,
+        }
+
+
+class ShardReader:
+    """用mmap读取分片文件，逐局惰性迭代
+
+    产出的记录直接引用mmap，只在读取器关闭之前有效，需要保留时用GameRecord.detach()。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        with open(path, 'rb') as f:
+            # 写入器刚创建文件就被中断时留下空文件（mmap不能映射空文件），当作没有对局
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是对局记录分片：{path}")
+        if version != RECORD_VERSION:
+            raise ValueError(f"不支持的记录版本 {version}：{path}")
+
+    def offsets(self):
+        """逐个产出每局记录的起始位置，忽略末尾不完整的记录"""
+        buf = self._mmap
+        if buf is None:
+            return
+        size = len(buf)
+        offset = FILE_HEADER.size
+        while offset + 4 <= size:
+            (length,) = struct.unpack_from('<I', buf, offset)
+            end = offset + 4 + length
+            if end > size:
+                break
+            yield offset
+            offset = end
+
+    def __iter__(self):
+        buf = self._mmap
+        for offset in self.offsets():
+            yield GameRecord(buf, offset)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(paths):
+    """依次迭代多个分片（或目录中所有 .mjr 文件）中的对局
+
+    每个分片读完即关闭，产出的记录已复制出来（GameRecord.detach()），可以保留使用。
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_records(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                           if name.endswith('.mjr')))
+            continue
+        with ShardReader(path) as reader:
+            for record in reader:
+                yield record.detach()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 2 and argv[0] == 'info':
+        games = events = draws = 0
+        wins = {}
+        for record in iter_records(argv[1:]):
+            games += 1
+            events += record.num_events
+            if record.winner is None:
+                draws += 1
+            else:
+                wins[record.winner] = wins.get(record.winner, 0) + 1
+        print(f"对局数: {games}, 事件数: {events}, 流局: {draws}")
+        for seat in sorted(wins):
+            print(f"座位{seat}: 和牌 {wins[seat]}")
+    elif len(argv) >= 3 and argv[0] == 'convert':
+        from game_log import read_log
+
+        writer = ShardWriter(argv[1])
+        for path in argv[2:]:
+            header, events = read_log(path)
+            if not events or events[-1].kind != 'end':
+                print(f"跳过不完整的牌谱：{path}")
+                continue
+            writer.add_game(header['seed'], header['deal'], events, events[-1].info,
+                            [p['computer'] for p in header['players']])
+        writer.close()
+    else:
+        print("用法: python records.py info 分片... | python records.py convert 输出分片 牌谱.jsonl...")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+# 复盘引擎
+# 用牌谱的种子重建一个MahjongGame（牌山、配牌完全相同），再把记录的事件
+# 逐个应用上去，得到任意事件处的完整对局状态（手牌、面子、牌河、牌山位置）。
+# 每隔CHECKPOINT_INTERVAL个事件保存一个状态检查点，JSONL牌谱的检查点索引
+# 保存在旁边的 .idx 文件中，跳转时从最近的检查点往后应用，不必每次从配牌开始。
+# 在任意打牌或鸣牌的决策点，可以用当前的电脑策略重新决策，和记录的选择对比。
+#
+# 用法：
+#   python replay.py log/game_log_xxx.jsonl --seek 40
+#   python replay.py log/game_log_xxx.jsonl --compare
+
+import argparse
+import json
+import os
+from array import array
+
+from game_log import read_log, GANG_LABELS, ACTION_LABELS
+from player_class import MahjongGame, Decision, GameSnapshot, PlayerSnapshot, Meld, display_hand
+from table_info import TableInfo
+from tiles import NUM_TILE_TYPES, TILE_NAMES
+
+CHECKPOINT_INTERVAL = 16
+INDEX_VERSION = 1
+
+
+def snapshot_to_dict(snapshot):
+    """把MahjongGame.snapshot()的快照转换成可JSON序列化的字典（检查点索引文件用）"""
+    return {
+        'players': [
+            {'hand': list(p.hand), 'melds': [[kind, list(tiles)] for kind, tiles in p.melds],
+             'discards': list(p.discards)}
+            for p in snapshot.players
+        ],
+        'wall': list(snapshot.wall),
+        'current_player': snapshot.current_player,
+        'pending_draw': snapshot.pending_draw,
+        'last_discarded': snapshot.last_discarded,
+        'last_discarder': snapshot.last_discarder,
+        'claimed_counts': list(snapshot.claimed_counts),
+        'winner': snapshot.winner,
+    }
+
+
+def snapshot_from_dict(data):
+    """snapshot_to_dict的逆变换"""
+    players = []
+    for p in data['players']:
+        counts = [0] * NUM_TILE_TYPES
+        for t in p['hand']:
+            counts[t] += 1
+        players.append(PlayerSnapshot(
+            hand=array('B', p['hand']),
+            counts=counts,
+            discards=array('B', p['discards']),
+            melds=tuple(Meld(kind, tuple(tiles)) for kind, tiles in p['melds']),
+            waits=None,
+        ))
+    table = TableInfo.from_state([p.counts for p in players], [p.discards for p in players],
+                                 [p.melds for p in players], data['claimed_counts'])
+    return GameSnapshot(
+        players=tuple(players),
+        wall=tuple(data['wall']),
+        current_player=data['current_player'],
+        pending_draw=data['pending_draw'],
+        last_discarded=data['last_discarded'],
+        last_discarder=data['last_discarder'],
+        claimed_counts=tuple(data['claimed_counts']),
+        winner=data['winner'],
+        table=table.snapshot(),
+    )
+
+
+def apply_event(game, event):
+    """把一个记录的事件应用到对局状态上（与引擎中的处理一致）"""
+    kind, seat, tile, info = event
+    if seat is None:
+        return
+    game.table.apply(event)
+    player = game.players[seat]
+    # 与引擎一致：current_player在回合内不变，直到有人鸣牌或下家摸牌；
+    # pending_draw是当前玩家这一回合开始时的摸牌方式
+    if kind == 'draw':
+        drawn = game.wall.draw_replacement() if info == 'rinshan' else game.wall.draw()
+        if drawn != tile:
+            raise ValueError(f"牌谱与牌山不一致：应摸到{TILE_NAMES[drawn]}，记录为{TILE_NAMES[tile]}")
+        player.draw_tile(tile)
+        game.current_player = seat
+        if info == 'draw':
+            game.pending_draw = 'draw'
+    elif kind == 'discard':
+        player.discard_tile(tile)
+        game.last_discarded = tile
+        game.last_discarder = seat
+        game.current_player = seat
+    elif kind in ('chi', 'peng'):
+        if kind == 'chi':
+            player.perform_chi(tile, info)
+        else:
+            player.perform_peng(tile)
+        game.claimed_counts[tile] += 1
+        game.current_player = seat
+        game.pending_draw = None
+    elif kind == 'gang':
+        player.perform_gang(tile, is_self_gang=info != 'open', is_add_gang=info == 'added')
+        if info == 'open':
+            game.claimed_counts[tile] += 1
+            game.current_player = seat
+            game.pending_draw = 'rinshan'
+    elif kind in ('tsumo', 'ron'):
+        game.winner = player
+
+
+class Replay:
+    """一局牌谱的复盘：seek(i)把对局状态设为第i个事件之前"""
+
+    def __init__(self, header, events, checkpoints=None):
+        self.header = header
+        self.events = events
+        players = header['players']
+        humans = sum(1 for p in players if not p['computer'])
+        self.game = MahjongGame(human_players=humans, ai_players=len(players) - humans,
+                                strategies=['advanced'] * len(players), seed=header['seed'])
+        for player, data in zip(self.game.players, players):
+            player.name = data['name']
+        if [sorted(p.hand) for p in self.game.players] != [sorted(d) for d in header['deal']]:
+            raise ValueError("用牌谱的种子重建的配牌与记录不一致")
+        self.position = 0
+        self.checkpoints = checkpoints if checkpoints is not None else self._build_checkpoints()
+        self.seek(0)
+
+    @classmethod
+    def from_log(cls, path):
+        """读取JSONL牌谱，有最新的检查点索引（.idx）时直接使用，否则生成并保存"""
+        header, events = read_log(path)
+        index_path = path + '.idx'
+        checkpoints = None
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path):
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION and index.get('events') == len(events):
+                checkpoints = {int(i): snapshot_from_dict(state) for i, state in index['checkpoints'].items()}
+        replay = cls(header, events, checkpoints)
+        if checkpoints is None:
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'events': len(events),
+                           'checkpoints': {i: snapshot_to_dict(snapshot) for i, snapshot in replay.checkpoints.items()}},
+                          f, separators=(',', ':'))
+        return replay
+
+    @classmethod
+    def from_record(cls, record):
+        """由二进制记录（records.GameRecord）复盘"""
+        return cls(record.header(), record.events())
+
+    def _build_checkpoints(self):
+        """从配牌开始应用全部事件，每CHECKPOINT_INTERVAL个事件保存一次状态"""
+        checkpoints = {0: self.game.snapshot()}
+        for i, event in enumerate(self.events, 1):
+            apply_event(self.game, event)
+            if i % CHECKPOINT_INTERVAL == 0:
+                checkpoints[i] = self.game.snapshot()
+        self.position = len(self.events)
+        return checkpoints
+
+    def seek(self, index):
+        """把对局状态设为第index个事件应用之前（index=len(events)为终局）"""
+        if not 0 <= index <= len(self.events):
+            raise IndexError(f"事件序号超出范围: {index}")
+        # 向前移动时直接接着应用，向后或跳得很远时从最近的检查点开始
+        base = index - index % CHECKPOINT_INTERVAL
+        if not self.position <= index or self.position < base:
+            self.game.restore(self.checkpoints[base])
+            self.position = base
+        while self.position < index:
+            apply_event(self.game, self.events[self.position])
+            self.position += 1
+        return self.game
+
+    def recorded_decision(self, index):
+        """第index个事件对应的决策点和记录的选择，不是决策结果的事件返回None
+
+        调用前对局状态需要在该事件之前（seek(index)）。跳过（没有鸣牌）的选择
+        不产生事件，所以无法复现。
+        """
+        kind, seat, tile, info = self.events[index]
+        game = self.game
+        player = game.players[seat] if seat is not None else None
+        if kind == 'discard':
+            drawn = None
+            for previous in reversed(self.events[max(0, index - 2):index]):
+                if previous.kind == 'draw':
+                    drawn = previous.tile
+                    break
+                if previous.kind != 'skip_tsumo':
+                    break
+            return Decision('discard', seat, drawn, None), ('discard', tile)
+        if kind in ('chi', 'peng', 'ron') or (kind == 'gang' and info == 'open'):
+            options = game.claim_options(player, tile, game.last_discarder, seat)
+            options.append(('pass', None))
+            action = 'hu' if kind == 'ron' else kind
+            arg = list(info) if kind == 'chi' else (None if kind == 'ron' else tile)
+            return Decision('claim', seat, tile, options), (action, arg)
+        if kind in ('tsumo', 'skip_tsumo', 'gang'):
+            options = game.self_options(player)
+            previous = self.events[index - 1]
+            answer = {'tsumo': ('hu', None), 'skip_tsumo': ('pass', None)}.get(kind, ('gang', tile))
+            return Decision('self', seat, previous.tile, options), answer
+        return None
+
+    def compare(self, index, strategy=None):
+        """在第index个事件处用strategy重新决策，返回(决策点, 记录的选择, 策略的选择)
+
+        strategy默认为复盘对局中该座位绑定的策略（'advanced'）。策略中的随机选择使用复盘对局自己的随机数生成器，不会复现记录时的结果。
+        """
+        self.seek(index)
+        found = self.recorded_decision(index)
+        if found is None:
+            return None
+        decision, recorded = found
+        if strategy is None:
+            strategy = self.game.strategies[decision.seat]
+        return decision, recorded, strategy(self.game, decision)
+
+    def compare_all(self, strategy=None):
+        """逐个比较所有决策点，产出(事件序号, 决策点, 记录的选择, 策略的选择)"""
+        for index in range(len(self.events)):
+            result = self.compare(index, strategy)
+            if result is not None:
+                yield (index,) + result
+
+
+def describe_event(header, event):
+    kind, seat, tile, info = event
+    if seat is None:
+        return kind
+    label = GANG_LABELS[info] if kind == 'gang' else ACTION_LABELS.get(kind, '弃牌')
+    text = f"{header['players'][seat]['name']} {label}"
+    return text + (f": {TILE_NAMES[tile]}" if tile is not None else "")
+
+
+def _format_answer(answer):
+    action, arg = answer
+    if action == 'chi':
+        return "吃 " + " ".join(TILE_NAMES[t] for t in arg)
+    labels = {'discard': '打', 'hu': '和', 'gang': '杠', 'peng': '碰', 'pass': '跳过'}
+    return labels[action] + (f" {TILE_NAMES[arg]}" if arg is not None and action != 'peng' else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='牌谱复盘')
+    parser.add_argument('log', help='JSONL牌谱文件')
+    parser.add_argument('--seek', type=int, default=None, help='显示第N个事件之前的对局状态')
+    parser.add_argument('--compare', action='store_true', help='用当前的电脑策略重新决策并列出不一致的地方')
+    args = parser.parse_args(argv)
+
+    replay = Replay.from_log(args.log)
+    if args.seek is not None:
+        game = replay.seek(args.seek)
+        if args.seek < len(replay.events):
+            print(f"下一个事件: {describe_event(replay.header, replay.events[args.seek])}")
+        print(f"牌山剩余: {len(game.wall)}张牌")
+        for player in game.players:
+            display_hand(player.hand, player.name)
+            melds = "; ".join(" ".join(TILE_NAMES[t] for t in tiles) for _, tiles in player.melds)
+            print(f"面子：{melds}")
+            print("牌河：" + " ".join(TILE_NAMES[t] for t in player.discards))
+            print()
+
+    if args.compare:
+        total = differ = 0
+        for index, decision, recorded, chosen in replay.compare_all():
+            total += 1
+            if chosen != recorded:
+                differ += 1
+                print(f"[{index}] {replay.header['players'][decision.seat]['name']}: "
+                      f"记录 {_format_answer(recorded)}，当前策略 {_format_answer(chosen)}")
+        print(f"决策点 {total} 个，不一致 {differ} 个")
+
+
+if __name__ == "__main__":
+    main()
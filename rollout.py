@@ -0,0 +1,208 @@
+# 蒙特卡洛模拟选牌
+# 对每个候选打法，把自己看不见的牌随机分成对手的手牌和牌山（确定化），
+# 然后用快速策略把这一局模拟打完，统计结果（自己和牌+1、放铳-1、其他0）。
+# 同一轮中所有候选打法使用同一个随机世界，减小比较的方差。模拟在给定的
+# 时间预算内尽量多做，可以分散到多个工作进程；时间到时用已经完成的模拟
+# 选出当前最好的打法。
+#
+# 快速模拟中不考虑吃碰杠，只有摸打、自摸和荣和。
+
+import atexit
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+
+from agari import is_agari
+from shanten import calculate_shanten
+from tiles import NUM_TILE_TYPES, HONOR_START, neighbor_count
+
+RolloutState = namedtuple('RolloutState', ['seat', 'hand', 'meld_counts', 'hand_sizes', 'unseen', 'wall_size'])
+RolloutState.__doc__ = """做决策的玩家看到的局面
+
+seat:        做决策的座位
+hand:        自己的暗手牌计数数组（打牌前）
+meld_counts: 每个座位已亮出的面子数
+hand_sizes:  每个座位暗手牌的张数
+unseen:      自己看不见的牌的计数数组（对手手牌、牌山、王牌）
+wall_size:   牌山剩余可摸的牌数
+"""
+
+
+def observe(game, seat):
+    """从game中座位seat的视角构造RolloutState（轮到seat打牌时调用）"""
+    player = game.players[seat]
+    return RolloutState(
+        seat=seat,
+        hand=list(player.counts),
+        meld_counts=[len(p.melds) for p in game.players],
+        hand_sizes=[len(p.hand) for p in game.players],
+        unseen=list(game.table.unseen[seat]),
+        wall_size=len(game.wall),
+    )
+
+
+WIN_SCORE = 1.0
+DEAL_IN_SCORE = -1.0
+
+
+def fast_discard(counts, meld_count, drawn, shanten):
+    """快速模拟用的打牌策略，返回(打出的牌, 打出后的向听数)
+
+    摸到的牌不能让向听数前进就直接打掉；否则按孤立程度从高到低尝试，
+    打出第一张不会让向听数后退的牌。吃碰之后没有摸到的牌，drawn为None。
+    """
+    improved = calculate_shanten(counts, meld_count)
+    if drawn is not None and improved >= shanten:
+        return drawn, shanten
+    candidates = sorted((t for t in range(NUM_TILE_TYPES) if counts[t]),
+                        key=lambda t: (counts[t] >= 2, neighbor_count(counts, t), t < HONOR_START))
+    for tile in candidates:
+        counts[tile] -= 1
+        after = calculate_shanten(counts, meld_count)
+        counts[tile] += 1
+        if after <= improved:
+            return tile, after
+    return drawn, shanten
+
+
+def determinize(state, rng):
+    """随机分配看不见的牌，返回(各座位手牌计数数组, 牌山)
+
+    牌山的前wall_size张是可以正常摸到的牌，剩下的是王牌。
+    """
+    pool = [t for t in range(NUM_TILE_TYPES) for _ in range(state.unseen[t])]
+    rng.shuffle(pool)
+    hands = []
+    position = 0
+    for seat, size in enumerate(state.hand_sizes):
+        counts = [0] * NUM_TILE_TYPES
+        if seat != state.seat:
+            for t in pool[position:position + size]:
+                counts[t] += 1
+            position += size
+        hands.append(counts)
+    return hands, pool[position:]
+
+
+def rollout(state, discard, hands, wall):
+    """在一个确定化的世界里打出discard后把这一局模拟打完，返回做决策的玩家的得分"""
+    num_players = len(hands)
+    me = state.seat
+    hands = [list(counts) for counts in hands]
+    hands[me] = list(state.hand)
+    hands[me][discard] -= 1
+    melds = state.meld_counts
+    shanten = [calculate_shanten(counts, melds[seat]) for seat, counts in enumerate(hands)]
+
+    seat, tile = me, discard
+    position = 0
+    while True:
+        # 其他玩家依次检查荣和
+        for i in range(1, num_players):
+            other = (seat + i) % num_players
+            counts = hands[other]
+            counts[tile] += 1
+            won = is_agari(counts, melds[other])
+            counts[tile] -= 1
+            if won:
+                if other == me:
+                    return WIN_SCORE
+                return DEAL_IN_SCORE if seat == me else 0.0
+        if position >= state.wall_size:
+            return 0.0
+
+        # 下家摸牌
+        seat = (seat + 1) % num_players
+        counts = hands[seat]
+        drawn = wall[position]
+        position += 1
+        counts[drawn] += 1
+        if is_agari(counts, melds[seat]):
+            return WIN_SCORE if seat == me else 0.0
+        tile, shanten[seat] = fast_discard(counts, melds[seat], drawn, shanten[seat])
+        counts[tile] -= 1
+
+
+def run_rollouts(state, candidates, budget, seed, max_rounds=None):
+    """在budget秒内对各候选打法做模拟，返回 {打法: [总得分, 模拟次数]}
+
+    每次模拟之前都检查时间，所以最多超出一次模拟；最后一轮可能只做了部分候选，
+    每轮从不同的候选开始，不会总是同一个候选少做。
+    """
+    deadline = time.monotonic() + budget
+    rng = random.Random(seed)
+    totals = {tile: [0.0, 0] for tile in candidates}
+    count = len(candidates)
+    rounds = 0
+    while time.monotonic() < deadline and (max_rounds is None or rounds < max_rounds):
+        hands, wall = determinize(state, rng)
+        for i in range(count):
+            if i and time.monotonic() >= deadline:
+                break
+            tile = candidates[(rounds + i) % count]
+            totals[tile][0] += rollout(state, tile, hands, wall)
+            totals[tile][1] += 1
+        rounds += 1
+    return totals
+
+
+# 模拟在预算的这个比例处停止，剩下的时间用来收回工作进程的结果
+SIMULATION_SHARE = 0.9
+
+# 工作进程池（第一次使用时创建，程序退出时关闭）
+_pool = None
+_pool_size = 0
+
+
+def _warm_up():
+    import agari  # noqa: F401
+
+
+def _get_pool(workers):
+    global _pool, _pool_size
+    if _pool is None or _pool_size != workers:
+        if _pool is not None:
+            _pool.terminate()
+        _pool = multiprocessing.Pool(workers, initializer=_warm_up)
+        _pool_size = workers
+    return _pool
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _pool.terminate()
+
+
+def evaluate_discards(state, candidates, budget=0.2, workers=0, seed=None):
+    """在时间预算内评估各候选打法，返回 {打法: 平均得分}，没有完成模拟的打法不在结果中
+
+    workers大于0时另外把模拟分给workers个工作进程，当前进程也同时做模拟。
+    所有进程在预算的SIMULATION_SHARE处停止模拟，剩下的时间用来收回工作进程
+    的结果，整个调用在预算内返回；仍然没有返回的工作进程的结果被丢弃。
+    在守护进程（例如tournament.py的工作进程）中不能再创建子进程，workers按0处理。
+    """
+    started = time.monotonic()
+    deadline = started + budget * SIMULATION_SHARE
+    rng = random.Random(seed)
+    if multiprocessing.current_process().daemon:
+        workers = 0
+    pending = []
+    if workers:
+        pool = _get_pool(workers)
+        # 工作进程的时钟与本进程无关，只传剩下的模拟时间
+        pending = [pool.apply_async(run_rollouts, (state, candidates, deadline - time.monotonic(),
+                                                   rng.getrandbits(64)))
+                   for _ in range(workers)]
+    totals = run_rollouts(state, candidates, deadline - time.monotonic(), rng.getrandbits(64))
+
+    for result in pending:
+        try:
+            part = result.get(timeout=max(0.0, started + budget - time.monotonic()))
+        except multiprocessing.TimeoutError:
+            continue
+        for tile, (score, count) in part.items():
+            totals[tile][0] += score
+            totals[tile][1] += count
+    return {tile: score / count for tile, (score, count) in totals.items() if count}
@@ -0,0 +1,385 @@
+# 多桌对局服务器（asyncio）
+# 一个进程里同时运行很多桌对局。每桌是一个协程，驱动该局的引擎（MahjongGame.run）：
+# 轮到电脑座位时把策略调用放到线程池里执行，不阻塞事件循环；轮到人类座位时
+# 把决策点发给该座位的连接，然后等待回复。等待中的桌子只是一个挂起的协程，
+# 没有轮询，不占CPU。
+#
+# 人类玩家通过本地TCP连接，消息格式见protocol.py：开局和断线重连时发送一次
+# 局面快照，之后只发送事件；每个连接的消息先进入发送队列，由该连接的发送协程
+# 合成一帧写出，客户端跟不上（写缓冲区满）时积压的消息在下一帧一起发送。
+# 人类玩家超时未回复或断开连接时，该座位由电脑策略代打，用入座时得到的令牌
+# 重连后收回座位；桌上的人类玩家全部断开后这一桌暂停，超过重连时限就结束。
+#
+# 用法：python server.py --port 8765 --humans 1 --strategy advanced
+#       压力测试见 client.py
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import random
+import secrets
+import time
+
+import protocol
+from player_class import MahjongGame
+from strategies import available_strategies
+
+DEFAULT_PORT = 8765
+NUM_SEATS = 4
+WRITE_BUFFER_LIMIT = 16 * 1024  # 写缓冲区超过这个大小时等客户端读走，期间的消息合并成一帧
+CLOSE_TIMEOUT = 5.0  # 关闭连接时等待发送队列发完的秒数，超过就直接断开
+
+
+class Connection:
+    """一个客户端连接（一个人类座位）"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.name = None
+        self.table = None
+        self.seat = None
+        self.outbox = []
+        self._ready = asyncio.Event()
+        self.frames = 0
+        self.bytes_sent = 0
+        self._closing = False
+        self._close_timer = None
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_LIMIT)
+        self._sender = asyncio.get_running_loop().create_task(self._send_loop())
+
+    @property
+    def closed(self):
+        return self._closing or self.writer.is_closing()
+
+    def send(self, message):
+        self.outbox.append(message)
+        self._ready.set()
+
+    async def _send_loop(self):
+        writer = self.writer
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                if self.outbox:
+                    frame = protocol.encode_frame(self.outbox)
+                    self.outbox = []
+                    writer.write(frame)
+                    self.frames += 1
+                    self.bytes_sent += len(frame)
+                    # 客户端读得慢时在这里等待，新消息留在outbox中
+                    await writer.drain()
+                if self._closing and not self.outbox:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if self._close_timer is not None:
+                self._close_timer.cancel()
+            writer.close()
+
+    def close(self):
+        """发完发送队列中剩下的消息（例如说明断开原因的错误）后关闭连接，
+        CLOSE_TIMEOUT秒内发不完就直接断开"""
+        if self._closing:
+            return
+        self._closing = True
+        self._ready.set()
+        self._close_timer = asyncio.get_running_loop().call_later(CLOSE_TIMEOUT, self._abort)
+
+    def _abort(self):
+        self.writer.transport.abort()
+        self._sender.cancel()
+
+
+class Table:
+    """一桌对局：前humans个座位是人类，其余是电脑"""
+
+    def __init__(self, server, table_id, humans):
+        self.server = server
+        self.id = table_id
+        self.connections = [None] * humans  # 人类座位的连接，断开后为None
+        self.tokens = [None] * humans       # 各人类座位的重连令牌
+        self.joined = 0
+        self.game = None
+        self.pending = None  # (座位, 决策点, Future)：正在等待的人类决策
+        self._reconnected = asyncio.Event()
+
+    @property
+    def full(self):
+        return self.joined == len(self.connections)
+
+    def seat(self, connection):
+        seat = self.joined
+        self.connections[seat] = connection
+        self.tokens[seat] = secrets.token_hex(8)
+        self.joined += 1
+        connection.table, connection.seat = self, seat
+        connection.send([protocol.MSG_JOINED, self.id, seat, self.tokens[seat]])
+
+    def _broadcast(self, game, event):
+        """引擎的event_sink：把事件发给桌上所有在线的人类玩家，开局时发送局面快照"""
+        for seat, connection in enumerate(self.connections):
+            if connection is not None:
+                if event.kind == 'start':
+                    connection.send(protocol.encode_sync(game, seat))
+                else:
+                    connection.send(protocol.encode_event(event, seat))
+
+    async def play(self):
+        server = self.server
+        humans = len(self.connections)
+        # 人类座位的策略只在超时或断线代打时使用
+        self.game = game = MahjongGame(human_players=humans, ai_players=NUM_SEATS - humans,
+                                       strategies=[server.strategy] * NUM_SEATS,
+                                       event_sink=self._broadcast, seed=server.next_seed())
+        for seat, connection in enumerate(self.connections):
+            game.players[seat].name = connection.name or game.players[seat].name
+
+        engine = game.run()
+        try:
+            decision = next(engine)
+            while True:
+                if not any(self.connections):
+                    # 没有人在线：暂停到有人重连，超过时限就结束这一桌
+                    self._reconnected.clear()
+                    try:
+                        await asyncio.wait_for(self._reconnected.wait(), server.reconnect_timeout)
+                    except asyncio.TimeoutError:
+                        engine.close()
+                        break
+                decision = engine.send(await self._decide(decision))
+        except StopIteration:
+            pass
+        finally:
+            for connection in self.connections:
+                if connection is not None:
+                    connection.table = connection.seat = None
+        return game.winner
+
+    async def _decide(self, decision):
+        seat = decision.seat
+        server = self.server
+        connection = self.connections[seat] if seat < len(self.connections) else None
+        if connection is not None and not connection.closed:
+            future = asyncio.get_running_loop().create_future()
+            self.pending = (seat, decision, future)
+            connection.send(protocol.encode_decision(decision))
+            try:
+                return await asyncio.wait_for(future, server.turn_timeout)
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            finally:
+                self.pending = None
+        # 电脑座位（或代打）：在线程池中调用策略
+        started = time.perf_counter()
+        answer = await asyncio.get_running_loop().run_in_executor(
+            server.executor, self.game.strategies[seat], self.game, decision)
+        server.ai_decisions += 1
+        server.ai_seconds += time.perf_counter() - started
+        return answer
+
+    def submit(self, seat, action, arg):
+        """人类玩家回复决策点，非法的选择返回错误信息"""
+        if self.pending is None or self.pending[0] != seat:
+            return "现在不是你的决策"
+        _, decision, future = self.pending
+        if decision.kind == 'discard':
+            counts = self.game.players[seat].counts
+            if action != 'discard' or not isinstance(arg, int) or not 0 <= arg < len(counts) or not counts[arg]:
+                return "非法的打牌"
+        elif (action, arg) not in decision.options:
+            return "非法的选择"
+        if not future.done():
+            future.set_result((action, arg))
+        return None
+
+    def leave(self, connection):
+        """连接断开：该座位之后由电脑代打，正在等待的决策立即代打"""
+        if self.connections[connection.seat] is not connection:
+            return  # 已经被重连的新连接取代
+        self.connections[connection.seat] = None
+        if self.pending is not None and self.pending[0] == connection.seat and not self.pending[2].done():
+            self.pending[2].set_exception(ConnectionError())
+
+    def resume(self, connection, token):
+        """用令牌回到原来的座位，发送完整的局面快照，成功时返回True"""
+        if self.game is None or token not in self.tokens:
+            return False
+        seat = self.tokens.index(token)
+        old = self.connections[seat]
+        if old is not None:
+            # 服务器还没发现旧连接已经断开
+            self.leave(old)
+            old.table = old.seat = None
+            old.close()
+        self.connections[seat] = connection
+        connection.table, connection.seat = self, seat
+        connection.name = self.game.players[seat].name
+        connection.send(protocol.encode_sync(self.game, seat))
+        self._reconnected.set()
+        return True
+
+
+class GameServer:
+    """
+    Args:
+        humans: 每桌的人类座位数（1-4），人满后开局
+        strategy: 电脑座位（以及代打）使用的策略名
+        turn_timeout: 人类玩家每个决策的等待秒数，None为一直等待
+        reconnect_timeout: 一桌的人类玩家全部断开后等待重连的秒数
+        workers: 执行电脑策略的线程数，默认由concurrent.futures决定
+        seed: 各桌对局种子的起始值，默认随机
+    """
+
+    def __init__(self, humans=1, strategy='advanced', turn_timeout=30.0, reconnect_timeout=60.0, workers=None,
+                 seed=None):
+        if not 1 <= humans <= NUM_SEATS:
+            raise ValueError(f"每桌人类座位数应为1-{NUM_SEATS}: {humans}")
+        self.humans = humans
+        self.strategy = strategy
+        self.turn_timeout = turn_timeout
+        self.reconnect_timeout = reconnect_timeout
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._seeds = itertools.count(seed if seed is not None else random.randrange(2 ** 32))
+        self._table_ids = itertools.count(1)
+        self.waiting = None  # 还没坐满的桌子
+        self.tables = {}     # 正在进行的桌子
+        self.sessions = {}   # 重连令牌 -> 桌子
+        self.games_finished = 0
+        self.ai_decisions = 0
+        self.ai_seconds = 0.0
+
+    def next_seed(self):
+        return next(self._seeds) % 2 ** 32
+
+    def join(self, connection, name):
+        if connection.table is not None:
+            connection.send([protocol.MSG_ERROR, "已经在对局中"])
+            return
+        connection.name = name
+        if self.waiting is None:
+            self.waiting = Table(self, next(self._table_ids), self.humans)
+        table = self.waiting
+        table.seat(connection)
+        if table.full:
+            self.waiting = None
+            self.tables[table.id] = table
+            for token in table.tokens:
+                self.sessions[token] = table
+            asyncio.get_running_loop().create_task(self._run_table(table))
+
+    def resume(self, connection, token):
+        table = self.sessions.get(token)
+        if connection.table is not None or table is None or not table.resume(connection, token):
+            connection.send([protocol.MSG_ERROR, "无法重连"])
+
+    async def _run_table(self, table):
+        try:
+            await table.play()
+        finally:
+            del self.tables[table.id]
+            for token in table.tokens:
+                self.sessions.pop(token, None)
+            self.games_finished += 1
+
+    def _leave(self, connection):
+        table = connection.table
+        if table is None:
+            return
+        if table is self.waiting:
+            # 还没开局：腾出座位，其余的人重新排座
+            others = [c for c in table.connections if c is not None and c is not connection]
+            self.waiting = None
+            for other in others:
+                other.table = None
+                self.join(other, other.name)
+        else:
+            table.leave(connection)
+        connection.table = connection.seat = None
+
+    def _dispatch(self, connection, message):
+        op = message[0]
+        if op == protocol.MSG_JOIN:
+            self.join(connection, message[1] if len(message) > 1 else None)
+        elif op == protocol.MSG_ACT:
+            table = connection.table
+            if table is None:
+                error = "不在对局中"
+            else:
+                error = table.submit(connection.seat, *protocol.decode_action(*message[1:3]))
+            if error:
+                connection.send([protocol.MSG_ERROR, error])
+        elif op == protocol.MSG_RESUME:
+            self.resume(connection, message[1])
+        else:
+            connection.send([protocol.MSG_ERROR, f"未知的消息: {op}"])
+
+    async def handle(self, reader, writer):
+        """一个客户端连接的读循环"""
+        connection = Connection(writer)
+        try:
+            async for line in reader:
+                try:
+                    for message in protocol.decode_frame(line):
+                        self._dispatch(connection, message)
+                except (ValueError, IndexError, TypeError):
+                    connection.send([protocol.MSG_ERROR, "无法解析的消息"])
+        except (ValueError, asyncio.LimitOverrunError):
+            # 一行超过了StreamReader的长度上限，无法再按行读下去，说明原因后断开
+            connection.send([protocol.MSG_ERROR, "消息过长"])
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(connection)
+            connection.close()
+
+    def status(self):
+        average = self.ai_seconds / self.ai_decisions * 1000 if self.ai_decisions else 0.0
+        return (f"进行中 {len(self.tables)} 桌，已结束 {self.games_finished} 局，"
+                f"电脑决策 {self.ai_decisions} 次（平均 {average:.2f} 毫秒）")
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """启动服务器，返回asyncio.Server（port为0时由系统分配端口）"""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def _serve_forever(args):
+    server = GameServer(humans=args.humans, strategy=args.strategy,
+                        turn_timeout=args.timeout if args.timeout > 0 else None,
+                        reconnect_timeout=args.reconnect_timeout, workers=args.workers, seed=args.seed)
+    listener = await server.serve(args.host, args.port)
+    print(f"服务器已启动：{args.host}:{listener.sockets[0].getsockname()[1]}，每桌 {args.humans} 个人类座位")
+    try:
+        async with listener:
+            while True:
+                await asyncio.sleep(args.status_interval)
+                print(server.status())
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多桌对局服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--humans', type=int, default=1, help='每桌的人类座位数')
+    parser.add_argument('--strategy', default='advanced', choices=available_strategies(), help='电脑座位的策略')
+    parser.add_argument('--timeout', type=float, default=30.0, help='人类决策的超时秒数（0为不限）')
+    parser.add_argument('--reconnect-timeout', type=float, default=60.0, help='人类玩家全部断开后等待重连的秒数')
+    parser.add_argument('--workers', type=int, default=None, help='执行电脑策略的线程数')
+    parser.add_argument('--seed', type=int, default=None, help='对局种子的起始值')
+    parser.add_argument('--status-interval', type=float, default=10.0, help='输出状态的间隔秒数')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# 向听数计算（查表法）
+# 手牌按花色拆成四组（条、筒、万、字牌），每组的计数模式对应一个预先
+# 计算好的向量：在该组内恰好组成 m 个面子、p 个雀头时，最多还能有多少个
+# 搭子（两面/坎张/边张/对子）。这些向量按计数模式缓存（有大小上限的LRU，
+# 见decompose.py），计算一手牌的向听数只需要查四次表，再把四个向量合并即可。
+#
+# 一般形的向听数 = 2K - 2*面子数 - min(搭子数, K - 面子数) - 雀头数
+# 其中 K 为还需要在手牌中组成的面子数（4 - 已亮出的面子数）。
+# -1 表示已经和牌，0 表示听牌。
+
+from decompose import memoize
+
+_NONE = -1  # 向量中“无法组成”的标记
+_VECTOR_SIZE = 10  # 下标 = 雀头数 * 5 + 面子数
+
+_EMPTY = (0,) + (_NONE,) * 9  # 空计数模式的向量
+
+
+def _improve(best, vector, dm, dt, dp):
+    """把“去掉一个部件后的向量”平移(dm, dt, dp)后合并进best"""
+    for p in range(2 - dp):
+        base = p * 5
+        shifted = (p + dp) * 5 + dm
+        for m in range(5 - dm):
+            t = vector[base + m]
+            if t >= 0 and t + dt > best[shifted + m]:
+                best[shifted + m] = t + dt
+
+
+# 计数模式 -> 向量，数牌和字牌分开缓存（字牌不能组成顺子和搭子），
+# 缓存由decompose模块统一管理
+@memoize('suit_vector', 65536)
+def suit_vector(pattern):
+    """计算数牌一组计数模式的向量（带缓存）"""
+    if not any(pattern):
+        return _EMPTY
+
+    counts = list(pattern)
+    i = 0
+    while not counts[i]:
+        i += 1
+    best = [_NONE] * _VECTOR_SIZE
+
+    # 把第一张牌当作孤张
+    counts[i] -= 1
+    _improve(best, suit_vector(tuple(counts)), 0, 0, 0)
+    counts[i] += 1
+
+    # 刻子
+    if counts[i] >= 3:
+        counts[i] -= 3
+        _improve(best, suit_vector(tuple(counts)), 1, 0, 0)
+        counts[i] += 3
+
+    # 对子：作为雀头或者作为搭子
+    if counts[i] >= 2:
+        counts[i] -= 2
+        sub = suit_vector(tuple(counts))
+        _improve(best, sub, 0, 0, 1)
+        _improve(best, sub, 0, 1, 0)
+        counts[i] += 2
+
+    # 顺子
+    if i <= 6 and counts[i+1] and counts[i+2]:
+        counts[i] -= 1; counts[i+1] -= 1; counts[i+2] -= 1
+        _improve(best, suit_vector(tuple(counts)), 1, 0, 0)
+        counts[i] += 1; counts[i+1] += 1; counts[i+2] += 1
+
+    # 两面/边张
+    if i <= 7 and counts[i+1]:
+        counts[i] -= 1; counts[i+1] -= 1
+        _improve(best, suit_vector(tuple(counts)), 0, 1, 0)
+        counts[i] += 1; counts[i+1] += 1
+
+    # 坎张
+    if i <= 6 and counts[i+2]:
+        counts[i] -= 1; counts[i+2] -= 1
+        _improve(best, suit_vector(tuple(counts)), 0, 1, 0)
+        counts[i] += 1; counts[i+2] += 1
+
+    return tuple(best)
+
+
+@memoize('honor_vector', 16384)
+def honor_vector(pattern):
+    """计算字牌计数模式的向量（带缓存）"""
+    # 字牌之间互不关联，逐张累加：3张为刻子，2张为雀头或搭子，4张为刻子加孤张
+    best = [_NONE] * _VECTOR_SIZE
+    best[0] = 0
+    for c in pattern:
+        if not c:
+            continue
+        prev = best
+        best = [_NONE] * _VECTOR_SIZE
+        if c >= 3:
+            _improve(best, prev, 1, 0, 0)
+        else:
+            _improve(best, prev, 0, 0, 0)
+        if c == 2:
+            _improve(best, prev, 0, 0, 1)
+            _improve(best, prev, 0, 1, 0)
+
+    return tuple(best)
+
+
+def _merge(a, b):
+    """合并两组向量：面子数、搭子数相加，雀头最多一个"""
+    out = [_NONE] * _VECTOR_SIZE
+    for pa in (0, 1):
+        for ma in range(5):
+            ta = a[pa * 5 + ma]
+            if ta < 0:
+                continue
+            for pb in range(2 - pa):
+                base = (pa + pb) * 5 + ma
+                for mb in range(5 - ma):
+                    tb = b[pb * 5 + mb]
+                    if tb >= 0 and ta + tb > out[base + mb]:
+                        out[base + mb] = ta + tb
+    return out
+
+
+def regular_shanten(counts, meld_count=0):
+    """一般形（4面子1雀头）的向听数，meld_count为已亮出的面子数"""
+    vector = _merge(
+        _merge(suit_vector(tuple(counts[0:9])), suit_vector(tuple(counts[9:18]))),
+        _merge(suit_vector(tuple(counts[18:27])), honor_vector(tuple(counts[27:34]))),
+    )
+    need = 4 - meld_count
+    best = 8
+    for p in (0, 1):
+        for m in range(need + 1):
+            t = vector[p * 5 + m]
+            if t < 0:
+                continue
+            shanten = 2 * need - 2 * m - min(t, need - m) - p
+            if shanten < best:
+                best = shanten
+    return best
+
+
+def seven_pairs_shanten(counts):
+    """七对子的向听数"""
+    pairs = 0
+    kinds = 0
+    for c in counts:
+        if c:
+            kinds += 1
+            if c >= 2:
+                pairs += 1
+    return 6 - pairs + max(0, 7 - kinds)
+
+
+def calculate_shanten(counts, meld_count=0):
+    """计算手牌的向听数（一般形和七对子取较小值）
+
+    Args:
+        counts: 暗手牌的34格计数数组
+        meld_count: 已亮出的面子数（吃、碰、杠）
+
+    Returns:
+        向听数，-1表示已经和牌，0表示听牌
+    """
+    shanten = regular_shanten(counts, meld_count)
+    # 七对子只有在门清时才可能成立
+    if meld_count == 0:
+        shanten = min(shanten, seven_pairs_shanten(counts))
+    return shanten
+
+
+def table_sizes():
+    """返回当前缓存的计数模式数量（数牌, 字牌）"""
+    return suit_vector.cache_info().currsize, honor_vector.cache_info().currsize
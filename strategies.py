@@ -0,0 +1,231 @@
+# 策略接口与注册表
+# 每个座位在对局创建时绑定一个策略对象（Strategy.bind），之后引擎的每个决策点
+# 都直接调用这个对象，策略可以在对象上保存跨回合的状态。策略按名字注册，
+# MahjongGame的strategies参数和锦标赛的 --strategies 选项都可以直接使用名字。
+
+import random
+
+from tiles import NUM_TILE_TYPES, HONOR_START, is_suited
+from ai_strategy import AdvancedAI
+import ismcts
+import rollout
+
+_REGISTRY = {}
+
+
+def register_strategy(name):
+    """类装饰器：以name注册一个Strategy子类"""
+    def decorator(cls):
+        cls.name = name
+        _REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+def available_strategies():
+    return sorted(_REGISTRY)
+
+
+def create_strategy(name, **kwargs):
+    """按名字创建一个新的策略对象"""
+    if name not in _REGISTRY:
+        raise ValueError(f"未知的策略: {name}（可用: {', '.join(available_strategies())}）")
+    return _REGISTRY[name](**kwargs)
+
+
+class Strategy:
+    """策略基类
+
+    子类实现 discard（打哪张牌）、claim（对别人打出的牌吃碰杠和）和
+    self_action（摸牌后自摸、暗杠、加杠）。引擎把策略对象当作回调
+    strategy(game, decision) 调用，由 __call__ 按决策点类型分派。
+    场况（每个座位看不见的牌、对各对手的危险度）可以从 game.table
+    （table_info.TableInfo）直接读取。
+    """
+
+    name = None
+
+    def bind(self, game, seat):
+        """对局创建时调用一次，之后的决策都来自这一局的这个座位"""
+        self.game = game
+        self.seat = seat
+        self.player = game.players[seat]
+
+    def __call__(self, game, decision):
+        if decision.kind == 'discard':
+            return 'discard', self.discard(game, decision)
+        if decision.kind == 'self':
+            return self.self_action(game, decision)
+        return self.claim(game, decision)
+
+    @classmethod
+    def decide_batch(cls, requests):
+        """一次处理多个决策点（来自同时进行的多局），返回与requests一一对应的(动作, 参数)
+
+        requests为[(策略对象, game, decision)]，策略对象都是cls的实例。默认逐个
+        调用，子类可以把同类决策合并成一次批量计算。
+        """
+        return [strategy(game, decision) for strategy, game, decision in requests]
+
+    def discard(self, game, decision):
+        """返回要打出的牌"""
+        raise NotImplementedError
+
+    def claim(self, game, decision):
+        """返回decision.options中的一个(动作, 参数)，默认能和就和，否则跳过"""
+        if ('hu', None) in decision.options:
+            return 'hu', None
+        return 'pass', None
+
+    def self_action(self, game, decision):
+        """返回decision.options中的一个(动作, 参数)，默认能自摸就和，否则跳过"""
+        if ('hu', None) in decision.options:
+            return 'hu', None
+        return 'pass', None
+
+
+@register_strategy('advanced')
+class AdvancedStrategy(Strategy):
+    """牌效打牌（AdvancedAI），按固定概率吃碰杠"""
+
+    def discard(self, game, decision):
+        player = self.player
+        return AdvancedAI.select_discard_tile(player.counts, len(player.melds), game.visible_counts())
+
+    @classmethod
+    def decide_batch(cls, requests):
+        # 所有打牌决策合并成一次NumPy批量牌效计算，其他决策逐个处理
+        answers = [None] * len(requests)
+        discards = []
+        for i, (strategy, game, decision) in enumerate(requests):
+            if decision.kind == 'discard':
+                discards.append(i)
+            else:
+                answers[i] = strategy(game, decision)
+        if discards:
+            players = [requests[i][0].player for i in discards]
+            tiles = AdvancedAI.select_discard_tiles(
+                [p.counts for p in players],
+                [len(p.melds) for p in players],
+                [requests[i][1].visible_counts() for i in discards],
+            )
+            for i, tile in zip(discards, tiles):
+                answers[i] = ('discard', tile)
+        return answers
+
+    def self_action(self, game, decision):
+        # 能自摸就和牌，能杠时有80%概率选择杠
+        options = decision.options
+        if ('hu', None) in options:
+            return 'hu', None
+        gangs = [arg for action, arg in options if action == 'gang']
+        if gangs and game.rng.random() < 0.8:
+            return 'gang', gangs[0]
+        return 'pass', None
+
+    def claim(self, game, decision):
+        options = decision.options
+        chi_options = [arg for action, arg in options if action == 'chi']
+        game_state = {
+            'can_hu': ('hu', None) in options,
+            'can_gang': ('gang', decision.tile) in options,
+            'can_peng': ('peng', decision.tile) in options,
+            'can_chi': bool(chi_options),
+            'gang_tile': decision.tile,
+            'peng_tile': decision.tile,
+            'chi_options': chi_options,
+            'claim': True,
+        }
+        action, arg = AdvancedAI.decide_action(self.player, game_state, game.rng)
+        if (action, arg) in options:
+            return action, arg
+        return 'pass', None
+
+
+@register_strategy('simple')
+class SimpleStrategy(Strategy):
+    """简单策略：先打孤张字牌，再打幺九牌，否则随机打；只和牌，不吃碰杠"""
+
+    def discard(self, game, decision):
+        player = self.player
+        counts = player.counts
+
+        # 寻找孤张字牌
+        for tile in range(HONOR_START, NUM_TILE_TYPES):
+            if counts[tile] == 1:
+                return tile
+
+        # 寻找边张（1和9）
+        for tile in sorted(player.hand):
+            if is_suited(tile) and tile % 9 in (0, 8):
+                return tile
+
+        # 随机丢弃
+        return game.rng.choice(player.hand)
+
+
+@register_strategy('montecarlo')
+class MonteCarloStrategy(AdvancedStrategy):
+    """打牌时对牌效最好的几种打法做蒙特卡洛模拟（rollout），吃碰杠同AdvancedStrategy
+
+    Args:
+        budget: 每次打牌决策的模拟时间（秒）
+        workers: 额外使用的工作进程数，0表示只在当前进程模拟（在守护进程中总是按0处理）
+        candidates: 参与模拟的候选打法数
+    """
+
+    def __init__(self, budget=0.1, workers=0, candidates=4):
+        self.budget = budget
+        self.workers = workers
+        self.candidates = candidates
+
+    def discard(self, game, decision):
+        player = self.player
+        ranked = AdvancedAI.rank_discards(player.counts, len(player.melds), game.visible_counts())
+        candidates = ranked[:self.candidates]
+        if len(candidates) <= 1:
+            return ranked[0]
+        scores = rollout.evaluate_discards(rollout.observe(game, self.seat), candidates,
+                                           self.budget, self.workers, seed=game.rng.getrandbits(64))
+        # 得分相同（或没有完成模拟）时保持牌效顺序
+        return max(candidates, key=lambda tile: (scores.get(tile, float('-inf')), -candidates.index(tile)))
+
+    @classmethod
+    def decide_batch(cls, requests):
+        # 每个打牌决策都要用满自己的时间预算，逐个处理
+        return [strategy(game, decision) for strategy, game, decision in requests]
+
+
+@register_strategy('ismcts')
+class ISMCTSStrategy(Strategy):
+    """打牌、吃碰杠和自摸杠都用信息集蒙特卡洛树搜索（ismcts.py）决定，跨决策复用搜索树
+
+    Args:
+        iterations: 每个决策的最大迭代次数（None表示不限）
+        budget: 每个决策的最长搜索时间（秒，None表示不限）
+        candidates: 打牌时只搜索牌效最好的几种打法
+    """
+
+    def __init__(self, iterations=None, budget=0.1, candidates=4):
+        self.iterations = iterations
+        self.budget = budget
+        self.candidates = candidates
+
+    def bind(self, game, seat):
+        super().bind(game, seat)
+        self.searcher = ismcts.ISMCTS(self.iterations, self.budget, random.Random(game.rng.getrandbits(64)),
+                                      self.candidates)
+
+    def _search(self, game, decision):
+        if decision.options and ('hu', None) in decision.options:
+            return 'hu', None
+        return self.searcher.search(ismcts.observe(game, decision), decision.options)
+
+    def discard(self, game, decision):
+        return self._search(game, decision)[1]
+
+    def claim(self, game, decision):
+        return self._search(game, decision)
+
+    def self_action(self, game, decision):
+        return self._search(game, decision)
@@ -0,0 +1,112 @@
+# 场况统计（增量维护）
+# 每个座位视角下每种牌还有几张没见过（自己的手牌和场上公开的牌以外），以及
+# 每个对手的每种牌的危险度（现物、筋、其他）。统计随引擎事件（摸牌、打牌、
+# 吃碰杠）逐个更新，策略通过game.table直接读取，不需要每次扫描所有牌河和面子。
+#
+# 注意：本规则没有振听，对手打过的牌（现物）也可能被荣和，危险度只是参考。
+
+from collections import namedtuple
+
+from tiles import NUM_TILE_TYPES, is_suited
+
+# 危险度
+GENBUTSU = 0  # 该对手自己打过的牌
+SUJI = 1      # 同花色相隔三的牌被该对手打过（只防两面听）
+UNKNOWN = 2
+
+# 亮出面子时从手牌中拿出的张数（gang按类型区分）
+_MELD_FROM_HAND = {'chi': 2, 'peng': 2, 'open': 3, 'closed': 4, 'added': 1}
+
+TableSnapshot = namedtuple('TableSnapshot', ['visible', 'unseen', 'danger'])
+
+
+class TableInfo:
+    """
+    visible: 场上公开的牌（牌河和面子，被鸣的弃牌只计一次）的34格计数数组
+    unseen:  unseen[seat]为座位seat看不见的牌的34格计数数组
+    danger:  danger[seat]为每种牌对座位seat的危险度（GENBUTSU / SUJI / UNKNOWN）
+    """
+
+    __slots__ = ('visible', 'unseen', 'danger', '_shared')
+
+    def __init__(self, hand_counts):
+        """hand_counts为配牌后每个座位的手牌计数数组"""
+        self.visible = [0] * NUM_TILE_TYPES
+        self.unseen = [[4 - c for c in counts] for counts in hand_counts]
+        self.danger = [[UNKNOWN] * NUM_TILE_TYPES for _ in hand_counts]
+        self._shared = False
+
+    @classmethod
+    def from_state(cls, hand_counts, discards, melds, claimed_counts):
+        """由各座位的手牌计数数组、牌河、面子和被鸣走的弃牌数直接计算"""
+        table = cls(hand_counts)
+        visible = table.visible
+        for seat, river in enumerate(discards):
+            for tile in river:
+                visible[tile] += 1
+                table._mark_safe(seat, tile)
+        for seat_melds in melds:
+            for _, tiles in seat_melds:
+                for tile in tiles:
+                    visible[tile] += 1
+        for tile, n in enumerate(claimed_counts):
+            visible[tile] -= n
+        for seat, counts in enumerate(hand_counts):
+            table.unseen[seat] = [4 - c - v for c, v in zip(counts, visible)]
+        return table
+
+    def _own(self):
+        # 写时复制：数组被快照引用时先复制
+        if self._shared:
+            self.visible = list(self.visible)
+            self.unseen = [list(u) for u in self.unseen]
+            self.danger = [list(d) for d in self.danger]
+            self._shared = False
+
+    def snapshot(self):
+        self._shared = True
+        return TableSnapshot(self.visible, self.unseen, self.danger)
+
+    def restore(self, snapshot):
+        self.visible, self.unseen, self.danger = snapshot
+        self._shared = True
+
+    def _reveal(self, seat, tile, n=1):
+        """座位seat手中的n张tile公开了"""
+        self.visible[tile] += n
+        for other, unseen in enumerate(self.unseen):
+            if other != seat:
+                unseen[tile] -= n
+
+    def _mark_safe(self, seat, tile):
+        danger = self.danger[seat]
+        danger[tile] = GENBUTSU
+        if is_suited(tile):
+            num = tile % 9
+            for suji in (tile - 3 if num >= 3 else None, tile + 3 if num <= 5 else None):
+                if suji is not None and danger[suji] > SUJI:
+                    danger[suji] = SUJI
+
+    def apply(self, event):
+        """按一个引擎事件（GameEvent）更新统计"""
+        kind, seat, tile, info = event
+        if kind == 'draw':
+            self._own()
+            self.unseen[seat][tile] -= 1
+        elif kind == 'discard':
+            self._own()
+            self._reveal(seat, tile)
+            self._mark_safe(seat, tile)
+        elif kind == 'chi':
+            self._own()
+            for t in info:
+                if t != tile:
+                    self._reveal(seat, t)
+        elif kind in ('peng', 'gang'):
+            self._own()
+            self._reveal(seat, tile, _MELD_FROM_HAND[info if kind == 'gang' else kind])
+
+    def safe_tiles(self, seat, level=SUJI):
+        """对座位seat危险度不高于level的牌（编号集合）"""
+        danger = self.danger[seat]
+        return {tile for tile in range(NUM_TILE_TYPES) if danger[tile] <= level}
@@ -0,0 +1,95 @@
+# 麻将牌的紧凑表示
+# 每种牌用 0-33 的整数编号表示，顺序与显示顺序一致（条、筒、万、字牌），
+# 因此对编号直接排序就是理牌顺序。
+#   0-8   : 1条-9条
+#   9-17  : 1筒-9筒
+#   18-26 : 1万-9万
+#   27-33 : 东 南 西 北 中 发 白
+# 手牌在引擎内部用长度为34的计数数组表示，字符串代号（如 "5m"、"e"）
+# 和中文牌名只在输入、显示和记录日志时才进行转换。
+
+NUM_TILE_TYPES = 34
+SUIT_CODES = ('t', 'p', 'm')  # 条、筒、万
+SUIT_NAMES = ('条', '筒', '万')
+HONOR_CODES = ('e', 's', 'w', 'n', 'z', 'f', 'b')
+HONOR_NAMES = ('东', '南', '西', '北', '中', '发', '白')
+HONOR_START = 27
+
+# 编号 -> 代号 / 中文名
+TILE_CODES = tuple(
+    [f"{num}{suit}" for suit in SUIT_CODES for num in range(1, 10)] + list(HONOR_CODES)
+)
+TILE_NAMES = tuple(
+    [f"{num}{name}" for name in SUIT_NAMES for num in range(1, 10)] + list(HONOR_NAMES)
+)
+# 代号 -> 编号
+CODE_TO_ID = {code: i for i, code in enumerate(TILE_CODES)}
+
+# 每种牌所属的分组（0条 1筒 2万 3字牌），用于显示分组
+TILE_GROUP = tuple(min(t // 9, 3) for t in range(NUM_TILE_TYPES))
+GROUP_NAMES = ('条', '筒', '万', '字牌')
+
+# 幺九牌（数牌的1、9以及全部字牌）
+TERMINALS_AND_HONORS = tuple(
+    t for t in range(NUM_TILE_TYPES) if t >= HONOR_START or t % 9 in (0, 8)
+)
+
+
+def tile_id(code):
+    """把牌代号（如 "5m"）转换为编号，代号无效时抛出 KeyError"""
+    return CODE_TO_ID[code]
+
+
+def parse_tile(text):
+    """解析玩家输入的牌代号，无效时返回None"""
+    return CODE_TO_ID.get(text.strip().lower())
+
+
+def tile_code(tile):
+    """编号 -> 牌代号"""
+    return TILE_CODES[tile]
+
+
+def tile_name(tile):
+    """编号 -> 中文牌名"""
+    return TILE_NAMES[tile]
+
+
+def is_suited(tile):
+    """是否为数牌"""
+    return tile < HONOR_START
+
+
+def tile_number(tile):
+    """数牌的点数（1-9）"""
+    return tile % 9 + 1
+
+
+def neighbor_count(counts, tile):
+    """计数数组中与tile同花色、相差2以内的其他牌的张数（字牌为0），衡量一张牌有多孤立"""
+    if tile >= HONOR_START:
+        return 0
+    base = tile - tile % 9
+    return sum(counts[t] for t in range(max(base, tile - 2), min(base + 9, tile + 3)) if t != tile)
+
+
+def counts_of(tiles):
+    """把牌编号列表转换为34格计数数组"""
+    counts = [0] * NUM_TILE_TYPES
+    for t in tiles:
+        counts[t] += 1
+    return counts
+
+
+def tiles_of(counts):
+    """把计数数组展开为排好序的牌编号列表"""
+    tiles = []
+    for t, c in enumerate(counts):
+        if c:
+            tiles.extend([t] * c)
+    return tiles
+
+
+def full_set():
+    """一副完整的136张牌（未洗牌）"""
+    return [t for t in range(NUM_TILE_TYPES) for _ in range(4)]
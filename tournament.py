@@ -0,0 +1,374 @@
+# 电脑自对弈锦标赛
+# 把固定种子的无界面对局分发到进程池中并行运行，逐局取回结果（胜者、和牌
+# 方式、巡数、吃碰杠次数），汇总各座位的胜率及其置信区间。每局结果都会
+# 追加写入检查点文件，中断后用同一个检查点重新运行即可从断点继续。
+# 加 --profile 时各工作进程开启热点计时（instrument.py），结束时输出汇总报告；
+# 加 --record-dir 时每个工作进程把完整对局写入自己的二进制记录分片（records.py）。
+# --strategies 为四个座位指定策略（可以混合），加 --rotate 时每局轮换座位，
+# 按策略汇总的胜率不受座位影响。--tables 让每个工作进程同时推进多桌，
+# 每一步的打牌决策合并成一次批量计算（lockstep.py）。
+#
+# 用法：python tournament.py --hands 100000 --workers 8 --checkpoint results.jsonl
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import instrument
+from player_class import MahjongGame
+from records import ShardWriter, RecordingSink
+from strategies import available_strategies
+from lockstep import run_lockstep
+
+NUM_SEATS = 4
+CLAIM_KINDS = ('chi', 'peng', 'gang')
+DEFAULT_STRATEGIES = ('advanced',) * NUM_SEATS
+# 检查点第一行（对局配置）的格式版本
+CHECKPOINT_VERSION = 1
+
+# 工作进程的记录分片写入器（未开启记录时为None）
+_shard = None
+# 工作进程中各座位的策略名，以及是否每局轮换座位
+_seat_strategies = DEFAULT_STRATEGIES
+_rotate = False
+# 工作进程中同步推进的桌数（1为逐局进行）
+_tables = 1
+
+
+class _HandCounter:
+    """统计一局中的巡数和吃碰杠次数的事件接收方"""
+
+    def __init__(self):
+        self.turns = 0
+        self.claims = dict.fromkeys(CLAIM_KINDS, 0)
+        self.win_type = None
+        self.discarder = None
+
+    def __call__(self, game, event):
+        if event.kind == 'discard':
+            self.turns += 1
+        elif event.kind in ('ron', 'tsumo'):
+            self.win_type = event.kind
+            self.discarder = event.info
+        elif event.kind in CLAIM_KINDS:
+            # 暗杠、加杠不算鸣牌
+            if event.kind != 'gang' or event.info == 'open':
+                self.claims[event.kind] += 1
+
+
+def seat_strategies(strategies, seed, rotate):
+    """这一局各座位的策略名，rotate时按种子轮换"""
+    if not rotate:
+        return list(strategies)
+    shift = seed % NUM_SEATS
+    return list(strategies[shift:]) + list(strategies[:shift])
+
+
+def _new_hand(seed):
+    """创建一局电脑对局，返回(对局, 统计事件接收方)"""
+    counter = _HandCounter()
+    sink = counter if _shard is None else RecordingSink(_shard, counter)
+    strategies = seat_strategies(_seat_strategies, seed, _rotate)
+    game = MahjongGame(human_players=0, ai_players=NUM_SEATS, strategies=strategies, event_sink=sink, seed=seed)
+    game.counter = counter
+    return game
+
+
+def _hand_result(game):
+    counter = game.counter
+    return {
+        'seed': game.seed,
+        'winner': game.players.index(game.winner) if game.winner is not None else None,
+        'win_type': counter.win_type,
+        'discarder': counter.discarder,
+        'turns': counter.turns,
+        'claims': counter.claims,
+        'strategies': [strategy.name for strategy in game.strategies],
+    }
+
+
+def play_hand(seed):
+    """用给定的种子打一局电脑对局，返回结果字典"""
+    game = _new_hand(seed)
+    game.play(save_log=False)
+    result = _hand_result(game)
+    if instrument.is_enabled():
+        # 本局的计时数据随结果一起送回主进程
+        result['profile'] = instrument.snapshot(reset=True)
+    return result
+
+
+def play_hands(seeds):
+    """多桌同步推进（lockstep.py）打完一批对局，返回结果字典列表（与逐局play_hand相同）"""
+    results = [_hand_result(game) for game in run_lockstep((_new_hand(seed) for seed in seeds), _tables)]
+    if results and instrument.is_enabled():
+        results[-1]['profile'] = instrument.snapshot(reset=True)
+    return results
+
+
+def wilson_interval(successes, total, z=1.96):
+    """二项比例的Wilson置信区间（默认95%）"""
+    if total == 0:
+        return 0.0, 0.0
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class TournamentStats:
+    """逐局累加的统计结果，内存占用与局数无关"""
+
+    def __init__(self):
+        self.hands = 0
+        self.wins = [0] * NUM_SEATS
+        self.tsumo = 0
+        self.ron = 0
+        self.deal_ins = [0] * NUM_SEATS
+        self.draws = 0
+        self.turns = 0
+        self.claims = dict.fromkeys(CLAIM_KINDS, 0)
+        self.strategies = {}  # 策略名 -> [座位局数, 和牌, 放铳]
+
+    def add(self, result):
+        self.hands += 1
+        self.turns += result['turns']
+        for kind in CLAIM_KINDS:
+            self.claims[kind] += result['claims'][kind]
+        winner = result['winner']
+        discarder = result['discarder'] if result['win_type'] == 'ron' else None
+        for seat, name in enumerate(result.get('strategies', ['advanced'] * NUM_SEATS)):
+            counts = self.strategies.setdefault(name, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += seat == winner
+            counts[2] += seat == discarder
+        if winner is None:
+            self.draws += 1
+            return
+        self.wins[winner] += 1
+        if discarder is not None:
+            self.ron += 1
+            self.deal_ins[discarder] += 1
+        else:
+            self.tsumo += 1
+
+    def to_dict(self):
+        hands = self.hands or 1
+        seats = []
+        for seat in range(NUM_SEATS):
+            low, high = wilson_interval(self.wins[seat], self.hands)
+            seats.append({
+                'seat': seat,
+                'wins': self.wins[seat],
+                'win_rate': self.wins[seat] / hands,
+                'win_rate_ci95': (low, high),
+                'deal_in_rate': self.deal_ins[seat] / hands,
+            })
+        strategies = {}
+        for name, (games, wins, deal_ins) in sorted(self.strategies.items()):
+            strategies[name] = {
+                'games': games,
+                'win_rate': wins / games,
+                'win_rate_ci95': wilson_interval(wins, games),
+                'deal_in_rate': deal_ins / games,
+            }
+        return {
+            'hands': self.hands,
+            'seats': seats,
+            'strategies': strategies,
+            'tsumo_rate': self.tsumo / hands,
+            'ron_rate': self.ron / hands,
+            'draw_rate': self.draws / hands,
+            'avg_turns': self.turns / hands,
+            'claims_per_hand': {kind: self.claims[kind] / hands for kind in CLAIM_KINDS},
+        }
+
+    def report(self):
+        """生成文字报告"""
+        data = self.to_dict()
+        lines = [f"对局数: {data['hands']}"]
+        for seat in data['seats']:
+            low, high = seat['win_rate_ci95']
+            lines.append(
+                f"座位{seat['seat']}: 胜率 {seat['win_rate']:.2%} (95%CI {low:.2%}-{high:.2%}), "
+                f"放铳率 {seat['deal_in_rate']:.2%}"
+            )
+        if len(data['strategies']) > 1:
+            for name, r in data['strategies'].items():
+                low, high = r['win_rate_ci95']
+                lines.append(
+                    f"策略{name}: {r['games']}座次, 胜率 {r['win_rate']:.2%} (95%CI {low:.2%}-{high:.2%}), "
+                    f"放铳率 {r['deal_in_rate']:.2%}"
+                )
+        lines.append(
+            f"自摸 {data['tsumo_rate']:.2%}, 荣和 {data['ron_rate']:.2%}, 流局 {data['draw_rate']:.2%}, "
+            f"平均巡数 {data['avg_turns']:.1f}"
+        )
+        claims = data['claims_per_hand']
+        lines.append(f"每局鸣牌: 吃 {claims['chi']:.2f}, 碰 {claims['peng']:.2f}, 杠 {claims['gang']:.2f}")
+        return "\n".join(lines)
+
+
+def checkpoint_config(strategies=None, rotate=False):
+    """写在检查点第一行的对局配置，续跑时必须一致
+
+    只包含影响对局结果的设置；--tables只改变计算方式，结果与逐局运行相同，不在其中。
+    """
+    return {'checkpoint': CHECKPOINT_VERSION,
+            'strategies': list(strategies or DEFAULT_STRATEGIES),
+            'rotate': bool(rotate)}
+
+
+def load_checkpoint(path, stats, config=None):
+    """读取检查点中已完成的对局，返回(已完成的种子集合, 文件是否已有配置行)
+
+    config为checkpoint_config()的结果，与文件第一行记录的配置不一致时抛出ValueError；
+    没有配置行却有对局结果的旧检查点同样无法确认，也抛出ValueError。
+    """
+    done = set()
+    if not path or not os.path.exists(path):
+        return done, False
+    if config is None:
+        config = checkpoint_config()
+    header = None
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # 中断时可能留下不完整的最后一行
+                continue
+            if number == 0 and 'checkpoint' in result:
+                header = result
+                if header != config:
+                    raise ValueError(f"检查点{path}的配置与本次运行不一致：{header}，本次为{config}")
+                continue
+            if header is None:
+                raise ValueError(f"检查点{path}没有记录对局配置，无法确认能否续跑，请换一个检查点文件")
+            if result['seed'] in done:
+                continue
+            done.add(result['seed'])
+            stats.add(result)
+    return done, header is not None
+
+
+def _warm_up(profile=False, record_dir=None, strategies=None, rotate=False, tables=1):
+    """工作进程初始化：预先加载和牌表，设置各座位的策略，需要时开启计时、打开记录分片"""
+    global _shard, _seat_strategies, _rotate, _tables
+    import agari  # noqa: F401
+    if strategies:
+        _seat_strategies = tuple(strategies)
+    _rotate = rotate
+    _tables = tables
+    if profile:
+        instrument.enable()
+    if record_dir:
+        _shard = ShardWriter(os.path.join(record_dir, f"shard_{os.getpid()}_{time.time_ns()}.mjr"))
+
+
+def run_tournament(hands, workers=None, base_seed=0, checkpoint=None, chunksize=16, progress=None,
+                   profile=False, record_dir=None, strategies=None, rotate=False, tables=1):
+    """并行运行hands局电脑对局，返回TournamentStats
+
+    Args:
+        hands: 总局数，第i局使用种子 base_seed + i
+        workers: 进程数，默认为CPU核数
+        checkpoint: 检查点文件路径（JSONL），已完成的局会被跳过；第一行记录strategies和rotate，
+            与本次不一致时抛出ValueError
+        chunksize: 每次分发给工作进程的局数
+        progress: 可选的进度回调 progress(已完成局数, 总局数)
+        profile: 为True时各工作进程开启热点计时，数据汇总到instrument.PROFILER
+        record_dir: 记录分片目录，每个工作进程写一个分片
+        strategies: 四个座位的策略名（见strategies.py），默认全部为'advanced'
+        rotate: 为True时每局按种子轮换策略的座位
+        tables: 每个工作进程同步推进的桌数，大于1时每步的打牌决策批量计算
+    """
+    stats = TournamentStats()
+    config = checkpoint_config(strategies, rotate)
+    done, has_header = load_checkpoint(checkpoint, stats, config)
+    seeds = [base_seed + i for i in range(hands) if base_seed + i not in done]
+    if not seeds:
+        return stats
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+
+    # 行缓冲：每局结果写完即落盘，中断时最多丢失正在写的一行
+    out = None
+    if checkpoint:
+        # 没有配置行（新文件，或者只留下不完整的第一行）时重新开始写
+        out = open(checkpoint, 'a' if has_header else 'w', encoding='utf-8', buffering=1)
+        if not has_header:
+            out.write(json.dumps(config, separators=(',', ':')) + "\n")
+    try:
+        with multiprocessing.Pool(workers, initializer=_warm_up,
+                                  initargs=(profile, record_dir, strategies, rotate, tables)) as pool:
+            if tables > 1:
+                # 每次分发一批种子，工作进程中同步推进
+                size = max(chunksize, tables)
+                batches = pool.imap_unordered(play_hands, [seeds[i:i + size] for i in range(0, len(seeds), size)])
+            else:
+                batches = ([result] for result in pool.imap_unordered(play_hand, seeds, chunksize))
+            for batch in batches:
+                for result in batch:
+                    if 'profile' in result:
+                        instrument.PROFILER.merge(result.pop('profile'))
+                    stats.add(result)
+                    if out is not None:
+                        out.write(json.dumps(result, separators=(',', ':')) + "\n")
+                    if progress is not None:
+                        progress(stats.hands, hands)
+    finally:
+        if out is not None:
+            out.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='电脑自对弈锦标赛')
+    parser.add_argument('--hands', type=int, default=1000, help='总局数')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认CPU核数）')
+    parser.add_argument('--seed', type=int, default=0, help='起始种子')
+    parser.add_argument('--checkpoint', default=None, help='检查点文件（JSONL），用于断点续跑')
+    parser.add_argument('--chunksize', type=int, default=16, help='每次分发的局数')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出汇总结果')
+    parser.add_argument('--profile', action='store_true', help='统计热点函数耗时并输出报告')
+    parser.add_argument('--record-dir', default=None, help='把完整对局写入该目录下的二进制记录分片')
+    parser.add_argument('--strategies', nargs=NUM_SEATS, default=None, metavar='STRATEGY',
+                        help=f"四个座位的策略（可用: {', '.join(available_strategies())}）")
+    parser.add_argument('--rotate', action='store_true', help='每局轮换策略的座位')
+    parser.add_argument('--tables', type=int, default=1, help='每个进程同步推进的桌数（批量决策）')
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        if done % 1000 == 0 or done == total:
+            print(f"\r已完成 {done}/{total} 局", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    try:
+        stats = run_tournament(args.hands, args.workers, args.seed, args.checkpoint, args.chunksize, progress,
+                               args.profile, args.record_dir, args.strategies, args.rotate, args.tables)
+    except ValueError as exc:
+        parser.error(str(exc))
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+
+    if args.json:
+        data = stats.to_dict()
+        if args.profile:
+            data['profile'] = instrument.snapshot()
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+    else:
+        print(stats.report())
+        print(f"用时 {elapsed:.1f}秒")
+        if args.profile:
+            print()
+            print(instrument.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# 牌效计算（NumPy批量版）
+# 对一手14张牌，一次性计算“打出每种牌之后的向听数”以及“能让向听数前进
+# 的牌还剩多少张”（有效进张数）。所有候选打法 × 34种摸牌组成一个矩阵，
+# 在一次批量计算中完成：每个花色段编码成整数键，对去重后的键查 shanten.py
+# 中的向量表，再用向量化的 max-plus 合并得到每一行的向听数。
+
+from collections import namedtuple
+
+import numpy as np
+
+from tiles import NUM_TILE_TYPES
+from shanten import suit_vector, honor_vector
+
+_INVALID = -64  # 向量中“无法组成”的标记（多次相加后仍为负数）
+_NO_SHANTEN = 99
+
+_SUIT_POWERS = 5 ** np.arange(9, dtype=np.int64)
+_HONOR_POWERS = 5 ** np.arange(7, dtype=np.int64)
+_IDENTITY = np.eye(NUM_TILE_TYPES, dtype=np.int16)
+
+
+def _merge_plan():
+    """预先算好合并两个向量时，每个输出位置由哪些(i, j)组合取最大值"""
+    pairs = [[] for _ in range(10)]
+    for pa in (0, 1):
+        for ma in range(5):
+            for pb in range(2 - pa):
+                for mb in range(5 - ma):
+                    out = (pa + pb) * 5 + ma + mb
+                    pairs[out].append((pa * 5 + ma) * 10 + pb * 5 + mb)
+    width = max(len(p) for p in pairs)
+    # 不足的位置重复第一个组合补齐，不影响取最大值
+    return np.array([p + [p[0]] * (width - len(p)) for p in pairs], dtype=np.int64)
+
+
+_MERGE_INDEX = _merge_plan()
+
+# 计算向听数时用到的(雀头数, 面子数)组合
+_P = np.repeat(np.array([0, 1]), 5)
+_M = np.tile(np.arange(5), 2)
+
+DiscardAnalysis = namedtuple('DiscardAnalysis', ['tiles', 'shanten', 'ukeire', 'accepts'])
+DiscardAnalysis.__doc__ = """打出每种牌后的牌效
+
+tiles:   候选打出的牌编号 (D,)
+shanten: 打出后的向听数 (D,)
+ukeire:  打出后的有效进张数（只计未见的牌）(D,)
+accepts: 打出后摸到哪些牌能前进 (D, 34) 布尔矩阵
+"""
+
+
+def _lookup(segment, powers, vector_fn):
+    """对一批花色段查向量表，返回(去重后的向量表 (K, 10), 每行对应的表下标 (N,))"""
+    keys = segment @ powers
+    unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    rows = segment[first].tolist()
+    table = np.array([vector_fn(tuple(row)) for row in rows], dtype=np.int16)
+    table[table < 0] = _INVALID
+    return table, inverse.reshape(-1)
+
+
+def _merge(a, b):
+    """批量合并两组向量"""
+    sums = (a[:, :, None] + b[:, None, :]).reshape(len(a), 100)
+    return sums[:, _MERGE_INDEX].max(axis=2)
+
+
+def _merge_unique(a, b):
+    """合并两组(向量表, 下标)，相同的组合只合并一次，返回新的(向量表, 下标)
+
+    同一手牌的各种打法和摸牌通常只改变一两个花色段，大部分行的组合是重复的。
+    """
+    table_a, index_a = a
+    table_b, index_b = b
+    pair = index_a * len(table_b) + index_b
+    unique_pairs, inverse = np.unique(pair, return_inverse=True)
+    merged = _merge(table_a[unique_pairs // len(table_b)], table_b[unique_pairs % len(table_b)])
+    return merged, inverse.reshape(-1)
+
+
+def batch_shanten(hands, meld_counts=0):
+    """批量计算向听数
+
+    Args:
+        hands: (N, 34) 的计数矩阵，每行是一手暗牌
+        meld_counts: 已亮出的面子数，可以是整数或长度为N的数组
+
+    Returns:
+        (N,) 的向听数数组，-1表示和牌
+    """
+    hands = np.minimum(np.asarray(hands, dtype=np.int64), 4)
+    table, index = _merge_unique(
+        _merge_unique(_lookup(hands[:, 0:9], _SUIT_POWERS, suit_vector),
+                      _lookup(hands[:, 9:18], _SUIT_POWERS, suit_vector)),
+        _merge_unique(_lookup(hands[:, 18:27], _SUIT_POWERS, suit_vector),
+                      _lookup(hands[:, 27:34], _HONOR_POWERS, honor_vector)),
+    )
+    vector = table[index]
+
+    meld_counts = np.broadcast_to(np.asarray(meld_counts), (len(hands),))
+    need = (4 - meld_counts)[:, None]
+    shanten = 2 * need - 2 * _M - np.minimum(vector, need - _M) - _P
+    shanten = np.where((vector >= 0) & (_M <= need), shanten, _NO_SHANTEN).min(axis=1)
+
+    # 七对子（仅门清）
+    pairs = (hands >= 2).sum(axis=1)
+    kinds = (hands > 0).sum(axis=1)
+    seven_pairs = 6 - pairs + np.maximum(0, 7 - kinds)
+    return np.where(meld_counts == 0, np.minimum(shanten, seven_pairs), shanten)
+
+
+def unseen_counts(counts, visible=None):
+    """从自己的视角看每种牌还剩几张没见过"""
+    unseen = 4 - np.asarray(counts, dtype=np.int64)
+    if visible is not None:
+        unseen = unseen - np.asarray(visible, dtype=np.int64)
+    return np.maximum(unseen, 0)
+
+
+def analyze_discards(counts, meld_count=0, visible=None):
+    """对一手(3n+2)张的牌，计算打出每种牌后的向听数和有效进张
+
+    Args:
+        counts: 暗手牌的34格计数数组
+        meld_count: 已亮出的面子数
+        visible: 场上已经看得见的牌（牌河和所有面子）的34格计数数组
+
+    Returns:
+        DiscardAnalysis
+    """
+    return batch_analyze_discards([counts], [meld_count], [visible])[0]
+
+
+def _draw_candidates(counts, unseen, meld_count):
+    """可能让向听数前进的摸牌（布尔数组）
+
+    只考虑还有未见张的牌。摸到的牌如果同花色上下两格内没有任何手牌（字牌为手中
+    没有这张），它在一般形中只能是孤张，向听数不会前进；只有七对子还差种类时
+    新的种类才有用。
+    """
+    present = counts > 0
+    suits = np.zeros((3, 13), dtype=bool)
+    suits[:, 2:11] = present[:27].reshape(3, 9)
+    near = np.zeros(NUM_TILE_TYPES, dtype=bool)
+    near[:27] = (suits[:, :9] | suits[:, 1:10] | suits[:, 2:11] | suits[:, 3:12] | suits[:, 4:13]).reshape(-1)
+    near[27:] = present[27:]
+    if meld_count == 0 and present.sum() <= 7:
+        near[:] = True
+    return near & (unseen > 0)
+
+
+def batch_analyze_discards(hands, meld_counts, visibles=None):
+    """对多手牌（可以来自不同的对局）一次完成analyze_discards
+
+    所有手牌的候选打法和摸牌组合拼成一个矩阵，只调用一次batch_shanten。
+
+    Args:
+        hands: 每手暗牌的34格计数数组
+        meld_counts: 每手牌已亮出的面子数
+        visibles: 每手牌对应的场上可见牌计数数组（元素可以为None）
+
+    Returns:
+        与hands一一对应的DiscardAnalysis列表
+    """
+    if visibles is None:
+        visibles = [None] * len(hands)
+    parts = []
+    rows = []
+    row_melds = []
+    for counts, meld_count, visible in zip(hands, meld_counts, visibles):
+        counts = np.asarray(counts, dtype=np.int16)
+        tiles = np.flatnonzero(counts)
+        unseen = unseen_counts(counts, visible)
+        draws = np.flatnonzero(_draw_candidates(counts, unseen, meld_count))
+        # 打出每种牌后的手牌 (D, 34)，以及再摸一张可能有用的牌后的手牌 (D*K, 34)
+        after = counts - _IDENTITY[tiles]
+        drawn = (after[:, None, :] + _IDENTITY[None, draws, :]).reshape(-1, NUM_TILE_TYPES)
+        parts.append((tiles, draws, unseen))
+        rows.append(after)
+        rows.append(drawn)
+        row_melds.append(np.full(len(after) + len(drawn), meld_count))
+
+    shanten = batch_shanten(np.concatenate(rows), np.concatenate(row_melds))
+
+    results = []
+    start = 0
+    for tiles, draws, unseen in parts:
+        count = len(tiles)
+        shanten_after = shanten[start:start + count]
+        start += count
+        shanten_drawn = np.full((count, NUM_TILE_TYPES), _NO_SHANTEN, dtype=shanten.dtype)
+        shanten_drawn[:, draws] = shanten[start:start + count * len(draws)].reshape(count, len(draws))
+        start += count * len(draws)
+
+        accepts = (shanten_drawn < shanten_after[:, None]) & (unseen > 0)
+        ukeire = (accepts * unseen).sum(axis=1)
+        results.append(DiscardAnalysis(tiles, shanten_after, ukeire, accepts))
+    return results
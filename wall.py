@@ -0,0 +1,67 @@
+# 牌山
+# 136张牌洗好后存放在一个紧凑的字节数组中，用游标摸牌（O(1)）。
+# 最后14张为王牌（岭上牌），杠后从王牌补摸，同时牌山末尾的一张牌补入王牌，
+# 使王牌始终保持14张。洗牌使用每局独立的随机数生成器，同一个种子总能
+# 得到完全相同的牌山。
+
+import random
+from array import array
+
+from tiles import full_set
+
+DEAD_WALL_SIZE = 14
+MAX_REPLACEMENT_DRAWS = 4  # 岭上牌最多4张（最多4次杠）
+
+
+class Wall:
+    __slots__ = ('tiles', 'position', 'live_end', 'replacement_draws')
+
+    def __init__(self, rng=None, tiles=None):
+        """
+        Args:
+            rng: 洗牌用的random.Random实例，默认新建一个
+            tiles: 直接指定牌山顺序（用于复盘），此时不洗牌
+        """
+        if tiles is None:
+            tiles = full_set()
+            (rng or random.Random()).shuffle(tiles)
+        self.tiles = array('B', tiles)
+        self.position = 0  # 下一张要摸的牌
+        self.live_end = len(self.tiles) - DEAD_WALL_SIZE  # 可以正常摸到的牌的末尾（不含）
+        self.replacement_draws = 0  # 已经摸过的岭上牌数
+
+    def __len__(self):
+        """牌山剩余可摸的牌数（不含王牌）"""
+        return self.live_end - self.position
+
+    def draw(self):
+        """从牌山摸一张牌，牌山已空时返回None"""
+        if self.position >= self.live_end:
+            return None
+        tile = self.tiles[self.position]
+        self.position += 1
+        return tile
+
+    def draw_replacement(self):
+        """杠后从王牌摸一张岭上牌，不能再摸时返回None"""
+        if self.replacement_draws >= MAX_REPLACEMENT_DRAWS or self.position >= self.live_end:
+            return None
+        # 岭上牌从王牌的最末尾开始摸
+        tile = self.tiles[len(self.tiles) - 1 - self.replacement_draws]
+        self.replacement_draws += 1
+        # 牌山末尾的一张补入王牌
+        self.live_end -= 1
+        return tile
+
+    def snapshot(self):
+        """摸牌的位置（牌山本身不变，不需要复制）"""
+        return self.position, self.live_end, self.replacement_draws
+
+    def restore(self, snapshot):
+        self.position, self.live_end, self.replacement_draws = snapshot
+
+    def deal(self, count):
+        """配牌：连续摸count张牌"""
+        tiles = self.tiles[self.position:self.position + count].tolist()
+        self.position += count
+        return tiles